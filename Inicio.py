@@ -1,5 +1,13 @@
 import streamlit as st  
 import functions as f
+import auth_utils
+import perfil_utils
+import hospitales_utils
+import geocodificacion_utils
+import migraciones
+import perfilado_utils
+import resultados_utils
+from metricas_utils import CursorInstrumentado
 from datetime import date
 import pandas as pd
 
@@ -11,6 +19,7 @@ st.set_page_config(
     page_icon="🏥",
     layout="centered" # "wide" or "centered"
 )
+perfilado_utils.iniciar_rerun("Inicio")
 
 def formatear_direccion(provincia, ciudad, calle, altura):
     if provincia and ciudad and provincia.strip().lower() == ciudad.strip().lower():
@@ -30,6 +39,7 @@ def registrar_usuario(dni, apellido, nombre, fecha_de_nacimiento, sexo, provinci
     Si el DNI ya existe pero los datos son los de un placeholder, actualiza ese registro.
     """
     try:
+        contraseña_hash = auth_utils.hashear_contraseña(contraseña)
         # Valores estándar de placeholder
         placeholder_values = {
             'apellido': '',
@@ -67,15 +77,17 @@ def registrar_usuario(dni, apellido, nombre, fecha_de_nacimiento, sexo, provinci
             if es_placeholder:
                 # Actualizar el registro placeholder con los datos reales
                 query_update = """
-                    UPDATE paciente SET apellido=%s, nombre=%s, fecha_de_nacimiento=%s, sexo=%s, provincia=%s, ciudad=%s, calle=%s, altura=%s, obra_social=%s, email=%s, contraseña=%s
+                    UPDATE paciente SET apellido=%s, nombre=%s, fecha_de_nacimiento=%s, sexo=%s, provincia=%s, ciudad=%s, calle=%s, altura=%s, obra_social=%s, email=%s, contraseña=%s,
+                        latitud=NULL, longitud=NULL
                     WHERE id_paciente=%s
                 """
                 params_update = (
-                    apellido, nombre, fecha_de_nacimiento, sexo, provincia, ciudad, calle, altura, obra_social, correo, contraseña, dni
+                    apellido, nombre, fecha_de_nacimiento, sexo, provincia, ciudad, calle, altura, obra_social, correo, contraseña_hash, dni
                 )
                 resultado = f.execute_query(query_update, params=params_update, is_select=False)
                 if resultado:
                     print(f"Usuario {nombre} {apellido} actualizado exitosamente desde placeholder.")
+                    geocodificacion_utils.encolar_geocodificacion('paciente', dni, provincia, ciudad, calle, altura)
                     return {'success': True}
                 else:
                     print(f"Error al actualizar el usuario {nombre} {apellido}.")
@@ -94,11 +106,13 @@ def registrar_usuario(dni, apellido, nombre, fecha_de_nacimiento, sexo, provinci
         params = (
             dni, apellido, nombre, fecha_de_nacimiento,
             sexo, provincia, ciudad, calle, altura, obra_social,
-            correo, contraseña
+            correo, contraseña_hash
         )
         resultado = f.execute_query(query, params=params, is_select=False)
         if resultado:
             print(f"Usuario {nombre} {apellido} registrado exitosamente.")
+            # La primera búsqueda ya encuentra las coordenadas guardadas
+            geocodificacion_utils.encolar_geocodificacion('paciente', dni, provincia, ciudad, calle, altura)
             return {'success': True}
         else:
             print(f"Error al registrar el usuario {nombre} {apellido}.")
@@ -142,7 +156,7 @@ def registrar_medico(dni, apellido, nombre, sexo, id_hospital=None, telefono=Non
         params = (
             dni, apellido, nombre,
             sexo, id_hospital, telefono,
-            correo, contraseña
+            correo, auth_utils.hashear_contraseña(contraseña) if contraseña else None
         )
         
         resultado = f.execute_query(query, params=params, is_select=False)
@@ -169,22 +183,30 @@ load_dotenv()
 
 # Configuración de la base de datos
 DB_CONFIG = {
-    'host': 'aws-0-us-east-1.pooler.supabase.com',
-    'port': 6543,
-    'database': 'postgres',
-    'user': 'postgres.ihguxvmtprnyhyhstvdp',
-    'password': 'Csdatos2025!'
+    'host': os.getenv("SUPABASE_DB_HOST", 'aws-0-us-east-1.pooler.supabase.com'),
+    'port': int(os.getenv("SUPABASE_DB_PORT", 6543)),
+    'database': os.getenv("SUPABASE_DB_NAME", 'postgres'),
+    'user': os.getenv("SUPABASE_DB_USER", 'postgres.ihguxvmtprnyhyhstvdp'),
+    'password': os.getenv("SUPABASE_DB_PASSWORD", 'Csdatos2025!')
 }
 
 def get_db_connection():
     """Obtiene una conexión a PostgreSQL"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = psycopg2.connect(**DB_CONFIG, cursor_factory=CursorInstrumentado)
         return conn
     except Exception as e:
         print(f"Error conectando a la base de datos: {e}")
         return None
 
+def capacidades_esquema():
+    """
+    Aplica las migraciones pendientes (incluida la secuencia de id_hospital) y
+    retorna las capacidades de la base, por ejemplo si pg_trgm está disponible.
+    Se resuelve una vez por proceso.
+    """
+    return migraciones.obtener_capacidades(get_db_connection, tareas_iniciales=[configurar_secuencia_hospital])
+
 def obtener_hospitales_existentes():
     """
     Obtiene todos los hospitales existentes en la base de datos
@@ -214,6 +236,24 @@ def obtener_hospitales_existentes():
     finally:
         conn.close()
 
+def obtener_directorio_hospitales():
+    """
+    Directorio de hospitales en memoria compartido entre sesiones.
+    Las sugerencias de autocompletado se resuelven sin consultar la base.
+    """
+    return hospitales_utils.obtener_directorio(obtener_hospitales_existentes)
+
+def seleccionar_hospital_existente(hosp):
+    """Marca un hospital existente como el seleccionado en el registro de médico"""
+    st.session_state.hospital_seleccionado = hosp
+    st.session_state.hospital_verificado = True
+    st.session_state.hospital_existe = True
+    st.session_state.mostrar_campos_hospital = False
+    st.session_state.datos_hospital_temp = {
+        'nombre': hosp['desc_hospital'],
+        'datos_existente': hosp
+    }
+
 def buscar_hospital_por_nombre(nombre_hospital):
     """
     Busca un hospital por su nombre exacto (case insensitive)
@@ -225,11 +265,8 @@ def buscar_hospital_por_nombre(nombre_hospital):
     
     try:
         with conn.cursor() as cursor:
-            # Búsqueda case-insensitive
-            cursor.execute(
-                "SELECT * FROM hospital WHERE LOWER(desc_hospital) = LOWER(%s)",
-                (nombre_hospital.strip(),)
-            )
+            # Búsqueda case-insensitive (usa el índice sobre lower(desc_hospital))
+            cursor.execute(hospitales_utils.SQL_POR_NOMBRE, (nombre_hospital.strip(),))
             
             row = cursor.fetchone()
             
@@ -248,30 +285,18 @@ def buscar_hospital_por_nombre(nombre_hospital):
 
 def buscar_hospitales_similares(termino_busqueda, limite=5):
     """
-    Busca hospitales que contengan el término de búsqueda
+    Busca hospitales con nombre parecido al término de búsqueda, ordenados por similitud
     Útil para mostrar sugerencias al usuario
+    Usa pg_trgm si está disponible y si no, búsqueda por prefijo/contenido
     """
+    usar_trigramas = capacidades_esquema().get('pg_trgm', False)
     conn = get_db_connection()
     if not conn:
         return []
     
     try:
         with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT * FROM hospital 
-                WHERE LOWER(desc_hospital) LIKE LOWER(%s) 
-                ORDER BY desc_hospital 
-                LIMIT %s
-            """, (f"%{termino_busqueda.strip()}%", limite))
-            
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            
-            hospitales = []
-            for row in rows:
-                hospitales.append(dict(zip(columns, row)))
-            
-            return hospitales
+            return hospitales_utils.buscar_similares(cursor, termino_busqueda, limite, usar_trigramas)
             
     except Exception as e:
         print(f"Error en buscar_hospitales_similares: {e}")
@@ -284,32 +309,23 @@ def agregar_nuevo_hospital(nombre, provincia, ciudad, calle, altura, telefono):
     Agrega un nuevo hospital a la base de datos
     Retorna el hospital creado con su ID generado automáticamente
     """
+    # La secuencia se configura al iniciar; la capacidad se detecta una vez por proceso
+    tiene_secuencia = capacidades_esquema().get('secuencia_hospital', False)
     conn = get_db_connection()
     if not conn:
         return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
     
     try:
         with conn.cursor() as cursor:
-            # Primero verificar si necesitamos configurar la secuencia
-            cursor.execute("""
-                SELECT column_default 
-                FROM information_schema.columns 
-                WHERE table_name = 'hospital' AND column_name = 'id_hospital'
-            """)
-            
-            default_info = cursor.fetchone()
-            
-            # Si no tiene secuencia autoincremental, obtener el próximo ID manualmente
-            if not default_info or not default_info[0] or 'nextval' not in str(default_info[0]):
-                cursor.execute("SELECT COALESCE(MAX(id_hospital), 0) + 1 FROM hospital")
-                next_id = cursor.fetchone()[0]
-                
-                # Insertar con ID específico
+            if not tiene_secuencia:
+                # Sin secuencia (no se pudo crear): calcular el ID en la misma sentencia,
+                # bloqueando la tabla para que dos altas simultáneas no tomen el mismo ID
+                cursor.execute("LOCK TABLE hospital IN SHARE ROW EXCLUSIVE MODE")
                 cursor.execute("""
                     INSERT INTO hospital (id_hospital, desc_hospital, provincia, ciudad, calle, altura, telefono) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s) 
+                    SELECT COALESCE(MAX(id_hospital), 0) + 1, %s, %s, %s, %s, %s, %s FROM hospital
                     RETURNING *
-                """, (next_id, nombre.strip(), provincia.strip(), ciudad.strip(), calle.strip(), altura.strip(), telefono.strip()))
+                """, (nombre.strip(), provincia.strip(), ciudad.strip(), calle.strip(), altura.strip(), telefono.strip()))
             else:
                 # La tabla tiene secuencia, insertar normalmente
                 cursor.execute("""
@@ -324,6 +340,12 @@ def agregar_nuevo_hospital(nombre, provincia, ciudad, calle, altura, telefono):
             hospital = dict(zip(columns, row))
             
             conn.commit()
+            hospitales_utils.invalidar_directorio()
+            resultados_utils.invalidar()
+            geocodificacion_utils.encolar_geocodificacion(
+                'hospital', hospital['id_hospital'],
+                hospital['provincia'], hospital['ciudad'], hospital['calle'], hospital['altura']
+            )
             
             return {
                 'success': True,
@@ -386,64 +408,120 @@ def registrar_medico_con_hospital(dni, apellido, nombre, sexo, nombre_hospital,
                                 telefono_medico=None, correo=None, contraseña=None):
     """
     Registra un médico y maneja la lógica del hospital (crear o usar existente)
+    Todo el flujo corre en una sola conexión y una sola transacción, con una
+    única sentencia (CTE): si el alta del médico falla no queda un hospital huérfano.
     """
-    try:
-        # Paso 1: Obtener o crear el hospital
-        resultado_hospital = obtener_o_crear_hospital(
-            nombre=nombre_hospital,
-            provincia=provincia_hospital,
-            ciudad=ciudad_hospital,
-            calle=calle_hospital,
-            altura=altura_hospital,
-            telefono=telefono_hospital
-        )
-        
-        if not resultado_hospital['success']:
-            return {
-                'success': False,
-                'mensaje': f"Error con el hospital: {resultado_hospital['error']}"
-            }
-        
-        hospital = resultado_hospital['hospital']
-        id_hospital = hospital['id_hospital']
-        
-        # Paso 2: Registrar el médico usando la función con validación
-        resultado_medico = registrar_medico(
-            dni=dni,
-            apellido=apellido,
-            nombre=nombre,
-            sexo=sexo,
-            id_hospital=id_hospital,
-            telefono=telefono_medico,
-            correo=correo,
-            contraseña=contraseña
+    datos_hospital = [provincia_hospital, ciudad_hospital, calle_hospital, altura_hospital, telefono_hospital]
+    puede_crear_hospital = all(datos_hospital)
+    tiene_secuencia = capacidades_esquema().get('secuencia_hospital', False)
+
+    # Sin secuencia el ID del hospital se calcula dentro de la misma sentencia
+    columna_id = "" if tiene_secuencia else "id_hospital, "
+    valor_id = "" if tiene_secuencia else "(SELECT COALESCE(MAX(id_hospital), 0) + 1 FROM hospital), "
+    query = f"""
+        WITH existente AS (
+            SELECT h.*, false AS es_nuevo
+            FROM hospital h
+            WHERE lower(h.desc_hospital) = lower(%(nombre_hospital)s)
+            LIMIT 1
+        ), nuevo AS (
+            INSERT INTO hospital ({columna_id}desc_hospital, provincia, ciudad, calle, altura, telefono)
+            SELECT {valor_id}%(nombre_hospital)s, %(provincia)s, %(ciudad)s, %(calle)s, %(altura)s, %(telefono)s
+            WHERE %(puede_crear)s AND NOT EXISTS (SELECT 1 FROM existente)
+            RETURNING *
+        ), h AS (
+            SELECT * FROM existente
+            UNION ALL
+            SELECT n.*, true AS es_nuevo FROM nuevo n
+        ), m AS (
+            INSERT INTO medico (id_medico, apellido, nombre, sexo, id_hospital, telefono, email, contraseña)
+            SELECT %(dni)s, %(apellido)s, %(nombre)s, %(sexo)s, h.id_hospital, %(telefono_medico)s, %(correo)s, %(clave)s
+            FROM h
+            ON CONFLICT (id_medico) DO NOTHING
+            RETURNING id_medico
         )
-        if resultado_medico['success']:
-            return {
-                'success': True,
-                'medico': {
-                    'id_medico': dni,
-                    'apellido': apellido,
-                    'nombre': nombre,
-                    'sexo': sexo,
-                    'id_hospital': id_hospital,
-                    'telefono': telefono_medico,
-                    'email': correo
-                },
-                'datos_hospital': hospital,
-                'hospital_nuevo': resultado_hospital['es_nuevo']
-            }
-        else:
+        SELECT (SELECT to_jsonb(h) FROM h LIMIT 1) AS hospital,
+               (SELECT id_medico FROM m) AS id_medico,
+               EXISTS (SELECT 1 FROM medico WHERE id_medico = %(dni)s) AS medico_existia
+    """
+    params = {
+        'nombre_hospital': (nombre_hospital or '').strip(),
+        'provincia': (provincia_hospital or '').strip(),
+        'ciudad': (ciudad_hospital or '').strip(),
+        'calle': (calle_hospital or '').strip(),
+        'altura': (altura_hospital or '').strip(),
+        'telefono': (telefono_hospital or '').strip(),
+        'puede_crear': puede_crear_hospital,
+        'dni': dni,
+        'apellido': apellido,
+        'nombre': nombre,
+        'sexo': sexo,
+        'telefono_medico': telefono_medico,
+        'correo': correo,
+        'clave': auth_utils.hashear_contraseña(contraseña) if contraseña else None
+    }
+
+    conn = get_db_connection()
+    if not conn:
+        return {'success': False, 'mensaje': 'No se pudo conectar a la base de datos'}
+
+    try:
+        with conn.cursor() as cursor:
+            if puede_crear_hospital:
+                # Serializa altas simultáneas del mismo hospital nuevo
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(lower(%s)))", (params['nombre_hospital'],))
+            if not tiene_secuencia:
+                cursor.execute("LOCK TABLE hospital IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute(query, params)
+            hospital, id_medico, medico_existia = cursor.fetchone()
+
+        if id_medico is None:
+            conn.rollback()
+            if medico_existia:
+                mensaje = 'Ya existe una cuenta con este DNI, revise sus datos'
+            elif hospital is None:
+                mensaje = "Error con el hospital: Se requieren provincia, ciudad, calle, altura y teléfono para crear un nuevo hospital"
+            else:
+                mensaje = 'Error al registrar el usuario'
             return {
                 'success': False,
-                'mensaje': resultado_medico.get('error', 'Error desconocido')
+                'mensaje': mensaje
             }
+
+        conn.commit()
+        hospital_nuevo = hospital.pop('es_nuevo')
+        if hospital_nuevo:
+            hospitales_utils.invalidar_directorio()
+            resultados_utils.invalidar()
+            geocodificacion_utils.encolar_geocodificacion(
+                'hospital', hospital['id_hospital'],
+                hospital['provincia'], hospital['ciudad'], hospital['calle'], hospital['altura']
+            )
+        print(f"Usuario {nombre} {apellido} registrado exitosamente.")
+
+        return {
+            'success': True,
+            'medico': {
+                'id_medico': dni,
+                'apellido': apellido,
+                'nombre': nombre,
+                'sexo': sexo,
+                'id_hospital': hospital['id_hospital'],
+                'telefono': telefono_medico,
+                'email': correo
+            },
+            'datos_hospital': hospital,
+            'hospital_nuevo': hospital_nuevo
+        }
     except Exception as e:
+        conn.rollback()
         print(f"Error en registrar_medico_con_hospital: {e}")
         return {
             'success': False,
             'mensaje': str(e)
         }
+    finally:
+        conn.close()
 
 def configurar_secuencia_hospital():
     """
@@ -545,6 +623,21 @@ def verificar_configuracion_hospital():
     finally:
         conn.close()
 
+def migrar_hash_contraseña(tipo_usuario, id_usuario, contraseña):
+    """
+    Reemplaza la contraseña almacenada (texto plano heredado o hash con
+    parámetros viejos) por un hash con los parámetros de costo actuales.
+    Retorna el nuevo hash.
+    """
+    nuevo_hash = auth_utils.hashear_contraseña(contraseña)
+    if tipo_usuario == "paciente":
+        query = "UPDATE paciente SET contraseña = %s WHERE id_paciente = %s"
+    else:
+        query = "UPDATE medico SET contraseña = %s WHERE id_medico = %s"
+    if not f.execute_query(query, params=(nuevo_hash, id_usuario), is_select=False):
+        print(f"No se pudo migrar el hash de contraseña del {tipo_usuario} {id_usuario}")
+    return nuevo_hash
+
 def autenticar_paciente(email, contraseña):
     """
     Autentica un paciente usando email y contraseña
@@ -563,15 +656,15 @@ def autenticar_paciente(email, contraseña):
             # Buscar el usuario específico
             cursor.execute("""
                 SELECT * FROM paciente 
-                WHERE email = %s AND contraseña = %s
-            """, (email, contraseña))
+                WHERE email = %s
+            """, (email,))
             
             row = cursor.fetchone()
+            paciente = dict(zip([desc[0] for desc in cursor.description], row)) if row else None
             
-            if row:
-                # Obtener nombres de columnas
-                columns = [desc[0] for desc in cursor.description]
-                paciente = dict(zip(columns, row))
+            if paciente and auth_utils.verificar_contraseña_en_pool(contraseña, paciente['contraseña']):
+                if auth_utils.necesita_rehash(paciente['contraseña']):
+                    paciente['contraseña'] = migrar_hash_contraseña('paciente', paciente['id_paciente'], contraseña)
                 print(f"Paciente autenticado exitosamente: {paciente['nombre']} {paciente['apellido']}")
                 
                 return {
@@ -615,15 +708,15 @@ def autenticar_medico(email, contraseña):
                 SELECT m.*, h.desc_hospital 
                 FROM medico m 
                 LEFT JOIN hospital h ON m.id_hospital = h.id_hospital
-                WHERE m.email = %s AND m.contraseña = %s
-            """, (email, contraseña))
+                WHERE m.email = %s
+            """, (email,))
             
             row = cursor.fetchone()
+            medico = dict(zip([desc[0] for desc in cursor.description], row)) if row else None
             
-            if row:
-                # Obtener nombres de columnas
-                columns = [desc[0] for desc in cursor.description]
-                medico = dict(zip(columns, row))
+            if medico and auth_utils.verificar_contraseña_en_pool(contraseña, medico['contraseña']):
+                if auth_utils.necesita_rehash(medico['contraseña']):
+                    medico['contraseña'] = migrar_hash_contraseña('medico', medico['id_medico'], contraseña)
                 print(f"Médico autenticado exitosamente: {medico['nombre']} {medico['apellido']}")
                 
                 return {
@@ -723,36 +816,98 @@ def verificar_usuario_existente(email):
 
 def autenticar_usuario_con_verificacion(email, contraseña, tipo_usuario):
     """
-    Autentica un usuario verificando primero si existe como otro tipo
+    Autentica un usuario verificando primero si existe como otro tipo.
+    Resuelve el conflicto de roles y la validación de credenciales en una sola
+    consulta (UNION ALL sobre paciente y medico) y una sola conexión.
     """
-    # Primero verificar si el usuario existe como otro tipo
-    verificacion = verificar_usuario_existente(email)
-    
-    if not verificacion['success']:
-        return verificacion
-    
-    if verificacion['existe']:
-        tipo_existente = verificacion['tipo_existente']
-        
-        # Si existe como ambos tipos, mostrar error
-        if tipo_existente == 'ambos':
-            return {
-                'success': False,
-                'error': verificacion['mensaje'],
-                'tipo_conflicto': 'ambos'
-            }
-        
-        # Si existe como un tipo diferente al que está intentando autenticar
-        if tipo_existente != tipo_usuario:
-            return {
-                'success': False,
-                'error': f"❌ {verificacion['mensaje']} Si intentas acceder como {'paciente' if tipo_usuario == 'medico' else 'médico'}, por favor selecciona el tipo correcto.",
-                'tipo_conflicto': tipo_existente,
-                'usuario_existente': verificacion['usuario']
-            }
-    
-    # Si no hay conflicto, proceder con la autenticación normal
-    return autenticar_usuario(email, contraseña, tipo_usuario)
+    if tipo_usuario not in ("paciente", "medico"):
+        return {
+            'success': False,
+            'error': 'Tipo de usuario no válido'
+        }
+
+    conn = get_db_connection()
+    if not conn:
+        return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
+
+    try:
+        with conn.cursor() as cursor:
+            # La contraseña se verifica en Python contra el hash almacenado
+            cursor.execute(auth_utils.SQL_CUENTAS_POR_EMAIL, (email, email))
+
+            cuentas, duplicadas = {}, set()
+            for tipo, nombre, apellido, datos in cursor.fetchall():
+                if tipo in cuentas:
+                    duplicadas.add(tipo)
+                cuentas[tipo] = {
+                    'usuario': {'nombre': nombre, 'apellido': apellido},
+                    'datos': datos
+                }
+    except Exception as e:
+        print(f"Error en autenticar_usuario_con_verificacion: {e}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+    finally:
+        conn.close()
+
+    # Varias cuentas del mismo tipo con el email: no se sabe contra cuál verificar
+    if duplicadas:
+        tipo_duplicado = 'paciente' if 'paciente' in duplicadas else 'médico'
+        return {
+            'success': False,
+            'error': f'El email {email} está registrado en más de una cuenta de {tipo_duplicado}. Contacta al administrador.',
+            'tipo_conflicto': 'duplicado'
+        }
+
+    # Si existe como ambos tipos, mostrar error
+    if 'paciente' in cuentas and 'medico' in cuentas:
+        return {
+            'success': False,
+            'error': f'El email {email} está registrado tanto como paciente como médico. Contacta al administrador.',
+            'tipo_conflicto': 'ambos'
+        }
+
+    # Si existe como un tipo diferente al que está intentando autenticar
+    tipo_existente = next(iter(cuentas), None)
+    if tipo_existente and tipo_existente != tipo_usuario:
+        return {
+            'success': False,
+            'error': f"❌ El email {email} ya está registrado como {'paciente' if tipo_existente == 'paciente' else 'médico'}. Si intentas acceder como {'paciente' if tipo_usuario == 'medico' else 'médico'}, por favor selecciona el tipo correcto.",
+            'tipo_conflicto': tipo_existente,
+            'usuario_existente': cuentas[tipo_existente]['usuario']
+        }
+
+    cuenta = cuentas.get(tipo_usuario)
+    almacenada = cuenta['datos'].get('contraseña') if cuenta else None
+    try:
+        valida = bool(cuenta) and auth_utils.verificar_contraseña_en_pool(contraseña, almacenada)
+    except auth_utils.VerificacionNoDisponible as e:
+        # Con el pool saturado no se sabe si la contraseña es correcta: pedir que reintente
+        return {'success': False, 'error': str(e)}
+    if not valida:
+        print(f"Autenticación fallida para email: {email}")
+        return {
+            'success': False,
+            'error': 'Email o contraseña incorrectos'
+        }
+
+    usuario = cuenta['datos']
+    # Migración transparente de contraseñas en texto plano o con parámetros viejos
+    if auth_utils.necesita_rehash(almacenada):
+        id_usuario = usuario['id_paciente'] if tipo_usuario == 'paciente' else usuario['id_medico']
+        usuario['contraseña'] = migrar_hash_contraseña(tipo_usuario, id_usuario, contraseña)
+    # to_jsonb serializa las fechas como texto ISO
+    if usuario.get('fecha_de_nacimiento'):
+        usuario['fecha_de_nacimiento'] = date.fromisoformat(str(usuario['fecha_de_nacimiento'])[:10])
+    print(f"{'Paciente' if tipo_usuario == 'paciente' else 'Médico'} autenticado exitosamente: {usuario['nombre']} {usuario['apellido']}")
+
+    return {
+        'success': True,
+        'usuario': usuario,
+        'tipo': tipo_usuario
+    }
 
 def verificar_autenticacion():
     """
@@ -790,8 +945,10 @@ def mostrar_menu_navegacion():
 
 def actualizar_paciente(dni, apellido, nombre, fecha_de_nacimiento, sexo, provincia, ciudad, calle, altura, obra_social, correo, contraseña):
     """
-    Actualiza la información de un paciente en la base de datos
+    Actualiza la información de un paciente en la base de datos.
+    Si contraseña es None se mantiene la contraseña actual.
     """
+    contraseña_hash = auth_utils.hashear_contraseña(contraseña) if contraseña else None
     conn = get_db_connection()
     if not conn:
         return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
@@ -802,10 +959,16 @@ def actualizar_paciente(dni, apellido, nombre, fecha_de_nacimiento, sexo, provin
                 UPDATE paciente 
                 SET apellido = %s, nombre = %s, fecha_de_nacimiento = %s,
                     sexo = %s, provincia = %s, ciudad = %s, calle = %s, altura = %s,
-                    obra_social = %s, email = %s, contraseña = %s
+                    obra_social = %s, email = %s, contraseña = COALESCE(%s, contraseña),
+                    -- Las coordenadas de la dirección anterior dejan de valer
+                    latitud = CASE WHEN (provincia, ciudad, calle, altura) IS DISTINCT FROM (%s, %s, %s, %s)
+                                   THEN NULL ELSE latitud END,
+                    longitud = CASE WHEN (provincia, ciudad, calle, altura) IS DISTINCT FROM (%s, %s, %s, %s)
+                                    THEN NULL ELSE longitud END
                 WHERE id_paciente = %s
                 RETURNING *
-            """, (apellido, nombre, fecha_de_nacimiento, sexo, provincia, ciudad, calle, altura, obra_social, correo, contraseña, dni))
+            """, (apellido, nombre, fecha_de_nacimiento, sexo, provincia, ciudad, calle, altura, obra_social, correo, contraseña_hash,
+                  provincia, ciudad, calle, altura, provincia, ciudad, calle, altura, dni))
             
             row = cursor.fetchone()
             
@@ -815,6 +978,10 @@ def actualizar_paciente(dni, apellido, nombre, fecha_de_nacimiento, sexo, provin
                 paciente_actualizado = dict(zip(columns, row))
                 
                 conn.commit()
+                # Write-through del perfil en sesión
+                perfil_utils.actualizar_perfil(paciente_actualizado)
+                if paciente_actualizado.get('latitud') is None or paciente_actualizado.get('longitud') is None:
+                    geocodificacion_utils.encolar_geocodificacion('paciente', dni, provincia, ciudad, calle, altura)
                 
                 return {
                     'success': True,
@@ -839,8 +1006,10 @@ def actualizar_paciente(dni, apellido, nombre, fecha_de_nacimiento, sexo, provin
 
 def actualizar_medico(dni, apellido, nombre, sexo, id_hospital, telefono, correo, contraseña):
     """
-    Actualiza la información de un médico en la base de datos
+    Actualiza la información de un médico en la base de datos.
+    Si contraseña es None se mantiene la contraseña actual.
     """
+    contraseña_hash = auth_utils.hashear_contraseña(contraseña) if contraseña else None
     conn = get_db_connection()
     if not conn:
         return {'success': False, 'error': 'No se pudo conectar a la base de datos'}
@@ -850,10 +1019,10 @@ def actualizar_medico(dni, apellido, nombre, sexo, id_hospital, telefono, correo
             cursor.execute("""
                 UPDATE medico 
                 SET apellido = %s, nombre = %s, sexo = %s, id_hospital = %s,
-                    telefono = %s, email = %s, contraseña = %s
+                    telefono = %s, email = %s, contraseña = COALESCE(%s, contraseña)
                 WHERE id_medico = %s
                 RETURNING *
-            """, (apellido, nombre, sexo, id_hospital, telefono, correo, contraseña, dni))
+            """, (apellido, nombre, sexo, id_hospital, telefono, correo, contraseña_hash, dni))
             
             row = cursor.fetchone()
             
@@ -863,6 +1032,10 @@ def actualizar_medico(dni, apellido, nombre, sexo, id_hospital, telefono, correo
                 medico_actualizado = dict(zip(columns, row))
                 
                 conn.commit()
+                # Write-through del perfil en sesión
+                perfil = perfil_utils.actualizar_perfil(medico_actualizado)
+                if perfil is not None:
+                    medico_actualizado['desc_hospital'] = perfil.desc_hospital
                 
                 return {
                     'success': True,
@@ -912,6 +1085,10 @@ def obtener_hospital_por_id(id_hospital):
 
 ################################## aca empieza la UI
 
+# Migraciones pendientes y capacidades de la base (una vez por proceso)
+with perfilado_utils.fase("capacidades del esquema"):
+    capacidades_esquema()
+
 
 
 
@@ -1043,12 +1220,14 @@ elif st.session_state.pantalla == "login":
                 tipo_usuario_login = "paciente" if tipo_login == "Paciente" else "medico"
                 
                 # Intentar autenticar
-                resultado = autenticar_usuario_con_verificacion(email_login, contraseña_login, tipo_usuario_login)
+                with perfilado_utils.fase("autenticación"):
+                    resultado = autenticar_usuario_con_verificacion(email_login, contraseña_login, tipo_usuario_login)
                 
                 if resultado['success']:
                     # Login exitoso
                     st.session_state.usuario_autenticado = resultado['usuario']
                     st.session_state.tipo_usuario = resultado['tipo']
+                    perfil_utils.guardar_perfil(resultado['tipo'], resultado['usuario'])
                     st.session_state.nombre_usuario = f"{resultado['usuario']['nombre']} {resultado['usuario']['apellido']}"
                     st.session_state.pantalla = "perfil"
                     st.success(f"¡Bienvenido, {st.session_state.nombre_usuario}!")
@@ -1094,8 +1273,9 @@ elif st.session_state.pantalla == "registro":
         
 
             # Opcional: Mostrar hospitales existentes como ayuda
+        directorio_hospitales = obtener_directorio_hospitales()
         with st.expander("📋 Seleccionar Hospital Existente", expanded=False):
-            hospitales_existentes = obtener_hospitales_existentes()
+            hospitales_existentes = directorio_hospitales.listar()
             if hospitales_existentes:
                 st.info("**Hospitales ya registrados:**")
                 for i, hosp in enumerate(hospitales_existentes):
@@ -1105,14 +1285,7 @@ elif st.session_state.pantalla == "registro":
                         key=f"hospital_{i}_{hosp['id_hospital']}"
                     ):
                         # Seleccionar este hospital
-                        st.session_state.hospital_seleccionado = hosp
-                        st.session_state.hospital_verificado = True
-                        st.session_state.hospital_existe = True
-                        st.session_state.mostrar_campos_hospital = False
-                        st.session_state.datos_hospital_temp = {
-                            'nombre': hosp['desc_hospital'],
-                            'datos_existente': hosp
-                        }
+                        seleccionar_hospital_existente(hosp)
                         st.rerun()
                 
 
@@ -1126,12 +1299,19 @@ elif st.session_state.pantalla == "registro":
         with col1:
             hospital = st.text_input("¿No encuentra el Hospital donde trabaja? ¡Regístrelo!", 
                                    value=st.session_state.datos_hospital_temp.get('nombre', ''))
+
+            # Sugerencias en memoria mientras se escribe (no consultan la base)
+            if hospital and not st.session_state.hospital_existe:
+                for hosp in directorio_hospitales.sugerir(hospital):
+                    if st.button(f"💡 {hosp['desc_hospital']}", key=f"sugerencia_{hosp['id_hospital']}"):
+                        seleccionar_hospital_existente(hosp)
+                        st.rerun()
         
         
             if st.button("🔍 Verificar", disabled=not hospital):
                 if hospital:
-                    # Buscar el hospital en la base de datos
-                    hospital_encontrado = buscar_hospital_por_nombre(hospital)
+                    # Buscar primero en el directorio en memoria y luego en la base
+                    hospital_encontrado = directorio_hospitales.buscar_exacto(hospital) or buscar_hospital_por_nombre(hospital)
                     
                     if hospital_encontrado:
                         direccion = formatear_direccion(hospital_encontrado.get('provincia', ''), hospital_encontrado.get('ciudad', ''), hospital_encontrado.get('calle', ''), hospital_encontrado.get('altura', ''))
@@ -1356,6 +1536,7 @@ elif st.session_state.pantalla == "perfil":
             st.session_state.usuario_autenticado = None
             st.session_state.tipo_usuario = None
             st.session_state.nombre_usuario = "Usuario"
+            perfil_utils.limpiar_perfil()
             st.session_state.pantalla = None
             st.success("✅ Sesión cerrada exitosamente")
             st.rerun()
@@ -1410,7 +1591,7 @@ elif st.session_state.pantalla == "editar_perfil":
                 obra_social = st.selectbox("🏥 Obra social", OBRAS_SOCIALES, index=OBRAS_SOCIALES.index(usuario.get('obra_social')) if usuario.get('obra_social') in OBRAS_SOCIALES else 0)
         else:
             st.subheader("🏥 Información del Hospital")
-            hospital_info = obtener_hospital_por_id(usuario.get('id_hospital'))
+            hospital_info = perfil_utils.obtener_hospital_perfil(obtener_hospital_por_id)
             if hospital_info:
                 direccion = formatear_direccion(hospital_info.get('provincia', ''), hospital_info.get('ciudad', ''), hospital_info.get('calle', ''), hospital_info.get('altura', ''))
                 st.info(f"🏥 **Hospital:** {hospital_info.get('desc_hospital', 'N/A')}")
@@ -1445,8 +1626,8 @@ elif st.session_state.pantalla == "editar_perfil":
                     campos_obligatorios.append(telefono)
                 
                 if all(campos_obligatorios):
-                    # Usar contraseña actual si no se proporciona una nueva
-                    contraseña_final = contraseña if contraseña else usuario.get('contraseña', '')
+                    # Sin contraseña nueva se conserva el hash actual
+                    contraseña_final = contraseña if contraseña else None
                     
                     if tipo == "paciente":
                         resultado = actualizar_paciente(
@@ -1528,3 +1709,4 @@ def solo_paciente_autenticado():
             st.switch_page("Inicio.py")
         st.stop()
 
+perfilado_utils.mostrar_perfil()
@@ -0,0 +1,99 @@
+import os
+import pathlib
+import threading
+import time
+
+# Backend de almacenamiento de archivos: "supabase" (por defecto) o "local" para pruebas sin red
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+STORAGE_BUCKET = os.getenv("STORAGE_BUCKET", "estudios")
+# Directorio y latencia simulada del backend "local"
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", "almacenamiento_local")
+STORAGE_LATENCIA_MS = float(os.getenv("STORAGE_LATENCIA_MS", 0))
+
+
+class BucketSupabase:
+    """Bucket de Supabase Storage"""
+
+    def __init__(self, bucket=STORAGE_BUCKET):
+        from supabase import create_client
+        self.bucket = bucket
+        self._cliente = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+    def subir(self, nombre_archivo, data, content_type):
+        self._cliente.storage.from_(self.bucket).upload(nombre_archivo, data, {"content-type": content_type})
+
+    def url_publica(self, nombre_archivo):
+        return self._cliente.storage.from_(self.bucket).get_public_url(nombre_archivo)
+
+
+class BucketLocal:
+    """
+    Bucket en el sistema de archivos para pruebas de rendimiento, con una
+    latencia configurable. Como Supabase, no sobrescribe archivos existentes.
+    """
+
+    def __init__(self, bucket=STORAGE_BUCKET, directorio=STORAGE_LOCAL_DIR, latencia_ms=0.0):
+        self.bucket = bucket
+        self.latencia_ms = latencia_ms
+        self.directorio = pathlib.Path(directorio, bucket).resolve()
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+    def _ruta(self, nombre_archivo):
+        ruta = (self.directorio / nombre_archivo).resolve()
+        if ruta.parent != self.directorio:
+            raise ValueError(f"Nombre de archivo no válido: {nombre_archivo}")
+        return ruta
+
+    def subir(self, nombre_archivo, data, content_type):
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms / 1000)
+        with open(self._ruta(nombre_archivo), "xb") as archivo:
+            archivo.write(data)
+
+    def url_publica(self, nombre_archivo):
+        return self._ruta(nombre_archivo).as_uri()
+
+
+# Fábricas de backends por nombre; se pueden registrar otros con registrar_backend
+_BACKENDS = {
+    'supabase': lambda: BucketSupabase(),
+    'local': lambda: BucketLocal(latencia_ms=STORAGE_LATENCIA_MS),
+}
+
+_bucket = None
+_lock = threading.Lock()
+
+
+def registrar_backend(nombre, fabrica):
+    """Agrega un backend que se puede elegir con STORAGE_BACKEND"""
+    _BACKENDS[nombre] = fabrica
+
+
+def configurar_bucket(bucket):
+    """Reemplaza el bucket del proceso (por ejemplo, desde un benchmark)"""
+    global _bucket
+    with _lock:
+        _bucket = bucket
+
+
+def obtener_bucket():
+    """Bucket compartido por el proceso, creado según STORAGE_BACKEND"""
+    global _bucket
+    with _lock:
+        if _bucket is None:
+            if STORAGE_BACKEND not in _BACKENDS:
+                raise ValueError(f"STORAGE_BACKEND desconocido: {STORAGE_BACKEND}")
+            _bucket = _BACKENDS[STORAGE_BACKEND]()
+        return _bucket
+
+
+def subir_archivo(nombre_archivo, data, content_type):
+    """
+    Sube un archivo al bucket configurado.
+
+    Returns:
+        str: URL pública del archivo
+    """
+    bucket = obtener_bucket()
+    bucket.subir(nombre_archivo, data, content_type)
+    return bucket.url_publica(nombre_archivo)
@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Parámetros de costo de scrypt, configurables por despliegue
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", 8))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", 1))
+
+# Cantidad máxima de verificaciones simultáneas y tiempo máximo de espera
+VERIFICACION_WORKERS = int(os.getenv("PASSWORD_VERIFY_WORKERS", os.cpu_count() or 2))
+VERIFICACION_TIMEOUT = float(os.getenv("PASSWORD_VERIFY_TIMEOUT", 10))
+
+# Las verificaciones exitosas se recuerdan unos minutos para no repetir el KDF
+CACHE_TTL = float(os.getenv("PASSWORD_CACHE_TTL", 300))
+CACHE_MAX = 4096
+
+PREFIJO_HASH = "scrypt"
+
+# Cuentas de paciente y médico con un email, en una sola consulta. La contraseña
+# se verifica en Python contra el hash almacenado. Parámetros: email, email
+SQL_CUENTAS_POR_EMAIL = """
+    SELECT 'paciente' AS tipo, p.nombre, p.apellido, to_jsonb(p) AS datos
+    FROM paciente p
+    WHERE p.email = %s
+    UNION ALL
+    SELECT 'medico' AS tipo, m.nombre, m.apellido,
+           to_jsonb(m) || jsonb_build_object('desc_hospital', h.desc_hospital) AS datos
+    FROM medico m
+    LEFT JOIN hospital h ON m.id_hospital = h.id_hospital
+    WHERE m.email = %s
+"""
+
+class VerificacionNoDisponible(Exception):
+    """El pool de verificación no respondió a tiempo: no indica que la contraseña sea incorrecta"""
+
+
+_executor = ThreadPoolExecutor(max_workers=VERIFICACION_WORKERS, thread_name_prefix="verificacion")
+_clave_cache = secrets.token_bytes(32)
+_cache_verificaciones = {}
+_cache_lock = threading.Lock()
+
+
+def _b64(datos):
+    return base64.b64encode(datos).decode("ascii")
+
+
+def _derivar(contraseña, salt, n, r, p):
+    return hashlib.scrypt(
+        contraseña.encode("utf-8"),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=256 * n * r + 128 * r * p + 2 ** 20,
+        dklen=32,
+    )
+
+
+def hashear_contraseña(contraseña, n=None, r=None, p=None):
+    """
+    Genera el hash salado de una contraseña con el formato
+    scrypt$n$r$p$salt$hash (salt y hash en base64)
+    """
+    n = n or SCRYPT_N
+    r = r or SCRYPT_R
+    p = p or SCRYPT_P
+    salt = secrets.token_bytes(16)
+    derivada = _derivar(contraseña, salt, n, r, p)
+    return f"{PREFIJO_HASH}${n}${r}${p}${_b64(salt)}${_b64(derivada)}"
+
+
+def es_hash_contraseña(valor):
+    """Indica si el valor almacenado ya es un hash y no una contraseña en texto plano"""
+    return isinstance(valor, str) and valor.startswith(PREFIJO_HASH + "$") and valor.count("$") == 5
+
+
+def necesita_rehash(almacenado):
+    """
+    Indica si el valor almacenado debe regenerarse: contraseñas en texto plano
+    heredadas o hashes generados con parámetros de costo distintos a los actuales
+    """
+    if not es_hash_contraseña(almacenado):
+        return True
+    _, n, r, p, _, _ = almacenado.split("$")
+    return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def verificar_contraseña(contraseña, almacenado):
+    """
+    Compara una contraseña con el valor almacenado.
+    Acepta tanto hashes scrypt como contraseñas heredadas en texto plano.
+    """
+    if almacenado is None or contraseña is None:
+        return False
+    if not es_hash_contraseña(almacenado):
+        return hmac.compare_digest(str(almacenado).encode("utf-8"), contraseña.encode("utf-8"))
+    try:
+        _, n, r, p, salt, esperado = almacenado.split("$")
+        derivada = _derivar(contraseña, base64.b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(derivada, base64.b64decode(esperado))
+    except (ValueError, TypeError) as e:
+        print(f"Error verificando contraseña: {e}")
+        return False
+
+
+def _clave_verificacion(contraseña, almacenado):
+    mensaje = f"{almacenado}\0{contraseña}".encode("utf-8")
+    return hmac.new(_clave_cache, mensaje, hashlib.sha256).digest()
+
+
+def verificar_contraseña_en_pool(contraseña, almacenado):
+    """
+    Verifica la contraseña en el pool acotado de workers.
+    Un pico de logins se encola en lugar de saturar todos los núcleos, y las
+    verificaciones exitosas recientes se resuelven desde el cache sin recalcular.
+
+    Raises:
+        VerificacionNoDisponible: si la verificación no terminó en VERIFICACION_TIMEOUT
+            segundos o el pool falló
+    """
+    if almacenado is None or contraseña is None:
+        return False
+
+    clave = _clave_verificacion(contraseña, almacenado)
+    ahora = time.monotonic()
+    with _cache_lock:
+        expira = _cache_verificaciones.get(clave)
+        if expira is not None:
+            if expira > ahora:
+                return True
+            del _cache_verificaciones[clave]
+
+    try:
+        valida = _executor.submit(verificar_contraseña, contraseña, almacenado).result(timeout=VERIFICACION_TIMEOUT)
+    except Exception as e:
+        print(f"Error en verificar_contraseña_en_pool: {type(e).__name__} {e}")
+        raise VerificacionNoDisponible(
+            "El servicio está ocupado en este momento. Intentá iniciar sesión de nuevo en unos segundos."
+        ) from e
+
+    if valida:
+        with _cache_lock:
+            if len(_cache_verificaciones) >= CACHE_MAX:
+                # Descartar primero las entradas más antiguas
+                for vieja in sorted(_cache_verificaciones, key=_cache_verificaciones.get)[:CACHE_MAX // 4]:
+                    del _cache_verificaciones[vieja]
+            _cache_verificaciones[clave] = ahora + CACHE_TTL
+    return valida
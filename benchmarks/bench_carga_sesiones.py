@@ -0,0 +1,221 @@
+"""
+Generador de carga headless para la aplicación de Streamlit.
+
+Simula N sesiones concurrentes de pacientes con AppTest. Cada sesión inicia
+sesión en Inicio.py, busca hospitales por especialidad en "Buscar Atención
+Médica" y abre "Ver mis Estudios", con tiempos de espera entre pasos. Reporta
+throughput, percentiles de latencia por paso, conexiones abiertas en la base
+y memoria por sesión.
+
+Las páginas usan la base configurada con SUPABASE_DB_*; para usar los datos de
+benchmarks/bench_rutas_principales.py (ejecutado con --conservar) apunte esas
+variables a la base de pruebas y agregue
+PGOPTIONS="-c search_path=bench_rutas_principales,public".
+
+Uso:
+    GEOCODER_BACKEND=fixture python benchmarks/bench_carga_sesiones.py \\
+        --sesiones 20 --pacientes 10000 --salida carga.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import psycopg2
+from streamlit.testing.v1 import AppTest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(RAIZ)
+
+PAGINA_INICIO = os.path.join(RAIZ, "Inicio.py")
+PAGINA_BUSCAR = "pages/Buscar Atención Médica.py"
+PAGINA_ESTUDIOS = "pages/Ver mis Estudios.py"
+PASOS = ('inicio', 'login', 'busqueda_especialidad', 'ver_estudios')
+
+
+def memoria_rss_mb():
+    """Memoria residente actual del proceso (pico si /proc no está disponible)"""
+    try:
+        with open("/proc/self/statm") as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _conectar():
+    return psycopg2.connect(
+        host=os.getenv("SUPABASE_DB_HOST"),
+        port=os.getenv("SUPABASE_DB_PORT"),
+        dbname=os.getenv("SUPABASE_DB_NAME"),
+        user=os.getenv("SUPABASE_DB_USER"),
+        password=os.getenv("SUPABASE_DB_PASSWORD"),
+    )
+
+
+class MuestreoConexiones(threading.Thread):
+    """Cuenta periódicamente las conexiones a la base en pg_stat_activity"""
+
+    def __init__(self, intervalo=0.5):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.muestras = []
+        self.error = None
+        self._detener = threading.Event()
+
+    def run(self):
+        try:
+            conn = _conectar()
+        except Exception as e:
+            self.error = str(e).strip()
+            return
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                while not self._detener.is_set():
+                    # Se descuenta la conexión del propio muestreo
+                    cursor.execute("SELECT count(*) - 1 FROM pg_stat_activity WHERE datname = current_database()")
+                    self.muestras.append(cursor.fetchone()[0])
+                    self._detener.wait(self.intervalo)
+        finally:
+            conn.close()
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+    def resumen(self):
+        if not self.muestras:
+            return {'error': self.error or 'sin muestras'}
+        return {'max': max(self.muestras), 'media': round(statistics.fmean(self.muestras), 2)}
+
+
+def _ejecutar(at, paso, tiempos):
+    inicio = time.perf_counter()
+    at.run()
+    tiempos[paso].append((time.perf_counter() - inicio) * 1000)
+    if at.exception:
+        raise RuntimeError(f"{paso}: {at.exception[0].message}")
+
+
+def sesion(numero, args, tiempos, errores):
+    """Recorrido de un paciente: login, búsqueda por especialidad y estudios"""
+    azar = random.Random(args.semilla + numero)
+
+    def pensar():
+        time.sleep(azar.uniform(args.pensar_min, args.pensar_max))
+
+    try:
+        at = AppTest.from_file(PAGINA_INICIO, default_timeout=args.timeout)
+        _ejecutar(at, 'inicio', tiempos)
+        pensar()
+
+        next(b for b in at.button if b.label == "🔐 Iniciar sesión").click()
+        at.run()
+        email = args.email.format(n=azar.randint(1, args.pacientes))
+        at.selectbox[0].select("Paciente")
+        at.text_input[0].input(email)
+        at.text_input[1].input(args.contraseña)
+        next(b for b in at.button if b.label == "✅ Iniciar Sesión").click()
+        _ejecutar(at, 'login', tiempos)
+        if "usuario_autenticado" not in at.session_state or not at.session_state.usuario_autenticado:
+            raise RuntimeError(f"login: no se pudo iniciar sesión como {email}")
+        pensar()
+
+        at.switch_page(PAGINA_BUSCAR)
+        at.run()
+        at.button(key="btn_especialidad").click()
+        at.run()
+        especialidades = at.selectbox(key="especialidad_select").options
+        at.selectbox(key="especialidad_select").select_index(azar.randint(1, len(especialidades) - 1))
+        _ejecutar(at, 'busqueda_especialidad', tiempos)
+        pensar()
+
+        at.switch_page(PAGINA_ESTUDIOS)
+        _ejecutar(at, 'ver_estudios', tiempos)
+    except Exception as e:
+        errores.append(str(e))
+
+
+def _estadisticas(valores):
+    if not valores:
+        return {'muestras': 0}
+    ordenados = sorted(valores)
+    return {
+        'muestras': len(ordenados),
+        'p50_ms': round(statistics.median(ordenados), 1),
+        'p95_ms': round(ordenados[max(0, int(len(ordenados) * 0.95) - 1)], 1),
+        'p99_ms': round(ordenados[max(0, int(len(ordenados) * 0.99) - 1)], 1),
+        'max_ms': round(ordenados[-1], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de carga de sesiones de InfoMed")
+    parser.add_argument("--sesiones", type=int, default=10, help="Sesiones concurrentes")
+    parser.add_argument("--rondas", type=int, default=1, help="Recorridos por sesión concurrente")
+    parser.add_argument("--pacientes", type=int, default=1000, help="Pacientes de prueba disponibles")
+    parser.add_argument("--email", default="paciente{n}@bench.test", help="Plantilla del email, con {n}")
+    parser.add_argument("--contraseña", default="bench-1234")
+    parser.add_argument("--pensar-min", type=float, default=0.5, help="Espera mínima entre pasos (s)")
+    parser.add_argument("--pensar-max", type=float, default=2.0, help="Espera máxima entre pasos (s)")
+    parser.add_argument("--timeout", type=float, default=60, help="Tiempo máximo por rerun (s)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte (además de stdout)")
+    args = parser.parse_args()
+
+    # Las páginas leen recursos (imágenes) con rutas relativas a la raíz del repo
+    os.chdir(RAIZ)
+    tiempos = {paso: [] for paso in PASOS}
+    errores = []
+    muestreo = MuestreoConexiones()
+    muestreo.start()
+    memoria_inicial = memoria_rss_mb()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sesiones) as executor:
+        for numero in range(args.sesiones * args.rondas):
+            executor.submit(sesion, numero, args, tiempos, errores)
+    duracion = time.perf_counter() - inicio
+
+    memoria_final = memoria_rss_mb()
+    muestreo.detener()
+
+    recorridos = args.sesiones * args.rondas
+    completos = recorridos - len(errores)
+    reruns = sum(len(v) for v in tiempos.values())
+    reporte = {
+        'fecha': datetime.now().isoformat(timespec="seconds"),
+        'sesiones_concurrentes': args.sesiones,
+        'recorridos': recorridos,
+        'recorridos_completos': completos,
+        'duracion_s': round(duracion, 2),
+        'throughput': {
+            'recorridos_por_s': round(completos / duracion, 3),
+            'reruns_medidos_por_s': round(reruns / duracion, 3),
+        },
+        'latencia_por_paso': {paso: _estadisticas(valores) for paso, valores in tiempos.items()},
+        'conexiones_db': muestreo.resumen(),
+        'memoria': {
+            'rss_inicial_mb': round(memoria_inicial, 1),
+            'rss_final_mb': round(memoria_final, 1),
+            'por_sesion_mb': round((memoria_final - memoria_inicial) / max(recorridos, 1), 2),
+        },
+        'errores': errores[:20],
+    }
+
+    salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(salida)
+    print(salida)
+
+
+if __name__ == "__main__":
+    main()
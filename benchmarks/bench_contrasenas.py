@@ -0,0 +1,59 @@
+"""
+Benchmark de verificación de contraseñas.
+
+Mide cuántos logins por segundo y por núcleo soporta la verificación scrypt
+con los parámetros de costo configurados (PASSWORD_SCRYPT_N/R/P) y el pool de
+workers (PASSWORD_VERIFY_WORKERS).
+
+Uso:
+    python benchmarks/bench_contrasenas.py --logins 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import auth_utils
+
+
+def medir(logins, concurrencia):
+    almacenados = [auth_utils.hashear_contraseña(f"clave-{i}") for i in range(min(logins, 50))]
+    # Se mide el KDF: cada login llama a verificar_contraseña (sin el cache de
+    # verificaciones) con una de hasta 50 contraseñas, repetidas en ciclo
+
+    def un_login(i):
+        almacenado = almacenados[i % len(almacenados)]
+        return auth_utils.verificar_contraseña(f"clave-{i % len(almacenados)}", almacenado)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as sesiones:
+        resultados = list(sesiones.map(lambda i: auth_utils._executor.submit(un_login, i).result(), range(logins)))
+    duracion = time.perf_counter() - inicio
+
+    nucleos = min(auth_utils.VERIFICACION_WORKERS, os.cpu_count() or 1)
+    return {
+        'logins': logins,
+        'sesiones_concurrentes': concurrencia,
+        'workers': auth_utils.VERIFICACION_WORKERS,
+        'nucleos_usados': nucleos,
+        'scrypt': {'n': auth_utils.SCRYPT_N, 'r': auth_utils.SCRYPT_R, 'p': auth_utils.SCRYPT_P},
+        'duracion_s': round(duracion, 3),
+        'logins_por_segundo': round(logins / duracion, 2),
+        'logins_por_segundo_por_nucleo': round(logins / duracion / nucleos, 2),
+        'todos_validos': all(resultados),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de verificación de contraseñas")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=64, help="Sesiones simultáneas simuladas")
+    args = parser.parse_args()
+    print(json.dumps(medir(args.logins, args.concurrencia), indent=2))
+
+
+if __name__ == "__main__":
+    main()
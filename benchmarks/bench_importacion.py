@@ -0,0 +1,121 @@
+"""
+Reporte de tiempo de importación de las páginas (estilo python -X importtime).
+
+Para cada página toma los imports de primer nivel del archivo (sin ejecutar
+la UI) y los importa en un intérprete nuevo con -X importtime. Reporta el
+tiempo acumulado por módulo, el total y los módulos pesados que se cargaron
+al inicio; los que deben cargarse bajo demanda (folium, pydeck,
+geopy) se miden aparte para ver el costo que se evita.
+
+Uso:
+    python benchmarks/bench_importacion.py --repeticiones 5 --salida importacion.json
+    python benchmarks/bench_importacion.py --max-ms 1500   # falla si alguna página lo supera
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINAS = [
+    "Inicio.py",
+    "pages/Buscar Atención Médica.py",
+    "pages/Ver mis Estudios.py",
+    "pages/Cargar Nuevo Estudio.py",
+]
+# Dependencias que solo deben importarse cuando se usan
+BAJO_DEMANDA = ["folium", "pydeck", "geopy"]
+
+
+def imports_de_primer_nivel(ruta):
+    """Sentencias import del nivel superior del archivo, en orden"""
+    with open(ruta, encoding="utf-8") as archivo:
+        arbol = ast.parse(archivo.read())
+    return [ast.unparse(nodo) for nodo in arbol.body if isinstance(nodo, (ast.Import, ast.ImportFrom))]
+
+
+def medir_importacion(sentencias, ignorar=frozenset()):
+    """
+    Ejecuta las sentencias en un intérprete nuevo con -X importtime.
+    Los módulos de ignorar (los del arranque del intérprete) no se cuentan.
+
+    Returns:
+        dict: {módulo de primer nivel: ms acumulados} y el conjunto de módulos cargados
+    """
+    codigo = f"import sys; sys.path.insert(0, {RAIZ!r})\n" + "\n".join(sentencias)
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1])
+
+    por_modulo, cargados = {}, set()
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        cargados.add(nombre.strip())
+        # Los módulos importados directamente no tienen sangría
+        if not nombre.startswith("   ") and nombre.strip() not in ignorar:
+            por_modulo[nombre.strip()] = int(acumulado) / 1000
+    return por_modulo, cargados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación de las páginas de InfoMed")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="Termina con error si alguna página supera este total")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte (además de stdout)")
+    args = parser.parse_args()
+
+    reporte = {
+        'fecha': datetime.now().isoformat(timespec="seconds"),
+        'python': sys.version.split()[0],
+        'repeticiones': args.repeticiones,
+        'paginas': {},
+        'bajo_demanda': {},
+    }
+
+    arranque = frozenset(medir_importacion([])[0])
+    for pagina in PAGINAS:
+        sentencias = imports_de_primer_nivel(os.path.join(RAIZ, pagina))
+        totales, modulos, cargados = [], {}, set()
+        for _ in range(args.repeticiones):
+            por_modulo, cargados = medir_importacion(sentencias, arranque)
+            totales.append(sum(por_modulo.values()))
+            for nombre, ms in por_modulo.items():
+                modulos.setdefault(nombre, []).append(ms)
+        mas_lentos = sorted(((statistics.median(v), n) for n, v in modulos.items()), reverse=True)[:15]
+        reporte['paginas'][pagina] = {
+            'total_ms': round(statistics.median(totales), 1),
+            'modulos_mas_lentos': {nombre: round(ms, 1) for ms, nombre in mas_lentos},
+            'bajo_demanda_cargados': sorted(m for m in BAJO_DEMANDA if m in cargados),
+        }
+
+    for modulo in BAJO_DEMANDA:
+        try:
+            tiempos = [sum(medir_importacion([f"import {modulo}"], arranque)[0].values()) for _ in range(args.repeticiones)]
+            reporte['bajo_demanda'][modulo] = round(statistics.median(tiempos), 1)
+        except RuntimeError as e:
+            reporte['bajo_demanda'][modulo] = {'error': str(e)}
+
+    salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(salida)
+    print(salida)
+
+    if args.max_ms is not None:
+        excedidas = [p for p, r in reporte['paginas'].items() if r['total_ms'] > args.max_ms]
+        if excedidas:
+            print(f"Páginas sobre {args.max_ms} ms: {', '.join(excedidas)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
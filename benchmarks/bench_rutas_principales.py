@@ -0,0 +1,342 @@
+"""
+Benchmark de las rutas principales de la aplicación sobre datos sintéticos.
+
+Carga el esquema de benchmarks/esquema.sql en un esquema temporal, aplica las
+migraciones de la aplicación, genera datos a escala (10.000 a 10.000.000 de
+estudios) y mide con las mismas consultas que usan las páginas:
+
+    login                  cuentas por email + verificación de la contraseña
+    busqueda_especialidad  hospitales de una especialidad ordenados por distancia en la base
+    precalculo_cercanos    listas de hospitales cercanos de un paciente (una vez por sesión)
+    busqueda_precalculada  hospitales de una especialidad desde la lista precalculada
+    indice_sintomas        construcción del índice de bitmaps de síntomas (una vez por proceso)
+    busqueda_sintomas      especialidades y hospitales para 2 a 4 síntomas (índice + una consulta)
+    listado_estudios       estudios de un paciente
+    alta_estudio           siguiente id + INSERT de un estudio
+
+La geocodificación no se mide: los datos sintéticos ya tienen coordenadas.
+
+Si BENCH_DATABASE_URL no está configurada y initdb/pg_ctl están en el PATH,
+se levanta un PostgreSQL local descartable en un directorio temporal.
+
+Uso:
+    python benchmarks/bench_rutas_principales.py --estudios 1000000 --salida reporte.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import psycopg2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import auth_utils
+import busqueda_utils
+import estudios_utils
+import migraciones
+import sintomas_utils
+
+ESQUEMA = "bench_rutas_principales"
+ARCHIVO_ESQUEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "esquema.sql")
+CONTRASEÑA = "bench-1234"
+LOTE_ESTUDIOS = 1_000_000
+
+ESPECIALIDADES = 60
+SINTOMAS = 150
+PATOLOGIAS = 600
+
+
+def escala(estudios):
+    """Cantidad de filas por tabla para una cantidad de estudios"""
+    return {
+        'estudios': estudios,
+        'pacientes': max(1_000, estudios // 10),
+        'medicos': max(100, estudios // 500),
+        'hospitales': max(50, estudios // 2_000),
+        'especialidades': ESPECIALIDADES,
+        'sintomas': SINTOMAS,
+        'patologias': PATOLOGIAS,
+    }
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_postgres_local():
+    """
+    Crea y arranca un cluster de PostgreSQL en un directorio temporal.
+
+    Returns:
+        tuple: (dsn, función para detenerlo y borrar el directorio)
+    """
+    initdb, pg_ctl = shutil.which("initdb"), shutil.which("pg_ctl")
+    if not initdb or not pg_ctl:
+        return None, None
+    directorio = tempfile.mkdtemp(prefix="infomed_bench_")
+    datos = os.path.join(directorio, "datos")
+    puerto = _puerto_libre()
+    subprocess.run([initdb, "-D", datos, "-U", "bench", "--auth=trust", "-E", "UTF8"],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([pg_ctl, "-D", datos, "-l", os.path.join(directorio, "postgres.log"), "-w",
+                    "-o", f"-p {puerto} -k {directorio} -c listen_addresses=127.0.0.1", "start"],
+                   check=True, stdout=subprocess.DEVNULL)
+
+    def detener():
+        subprocess.run([pg_ctl, "-D", datos, "-m", "fast", "-w", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return f"postgresql://bench@127.0.0.1:{puerto}/postgres", detener
+
+
+def crear_esquema(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {ESQUEMA}")
+        cursor.execute(f"SET search_path TO {ESQUEMA}, public")
+        with open(ARCHIVO_ESQUEMA, encoding="utf-8") as archivo:
+            cursor.execute(archivo.read())
+    conn.commit()
+
+
+def cargar_datos(conn, filas):
+    """Genera los datos sintéticos con generate_series, de forma determinística"""
+    hash_contraseña = auth_utils.hashear_contraseña(CONTRASEÑA)
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO hospital (desc_hospital, provincia, ciudad, calle, altura, telefono, latitud, longitud)
+            SELECT 'Hospital ' || i, 'Buenos Aires', 'Ciudad ' || (i %% 200), 'Calle ' || (i %% 2000),
+                   (i %% 9000)::text, '011-' || i,
+                   -34.9 + ((i * 7919) %% 1000) / 1000.0 * 0.6,
+                   -58.8 + ((i * 104729) %% 1000) / 1000.0 * 0.6
+            FROM generate_series(1, %(hospitales)s) AS i
+        """, filas)
+        cursor.execute("""
+            INSERT INTO especialidades (desc_especialidad)
+            SELECT 'Especialidad ' || lpad(i::text, 3, '0') FROM generate_series(1, %(especialidades)s) AS i
+        """, filas)
+        cursor.execute("""
+            INSERT INTO sintoma (desc_sintoma)
+            SELECT 'Síntoma ' || lpad(i::text, 3, '0') FROM generate_series(1, %(sintomas)s) AS i
+        """, filas)
+        cursor.execute("""
+            INSERT INTO patologia (desc_patologia, id_sintoma_1, id_sintoma_2)
+            SELECT 'Patología ' || i, 1 + (i * 7) %% %(sintomas)s, 1 + (i * 7 + 1 + i %% 5) %% %(sintomas)s
+            FROM generate_series(1, %(patologias)s) AS i
+        """, filas)
+        cursor.execute("""
+            INSERT INTO hospital_especialidades (id_hospital, id_especialidad)
+            SELECT h, e
+            FROM generate_series(1, %(hospitales)s) AS h, generate_series(1, %(especialidades)s) AS e
+            WHERE (h * 31 + e * 17) %% 4 = 0
+        """, filas)
+        cursor.execute("""
+            INSERT INTO patologia_especialidades (id_patologia, id_especialidad)
+            SELECT DISTINCT p, 1 + (p * k * 13) %% %(especialidades)s
+            FROM generate_series(1, %(patologias)s) AS p, generate_series(1, 2) AS k
+        """, filas)
+        cursor.execute("""
+            INSERT INTO patologia_hospital (id_patologia, id_hospital)
+            SELECT DISTINCT p, 1 + (p * k * 37) %% %(hospitales)s
+            FROM generate_series(1, %(patologias)s) AS p, generate_series(1, 3) AS k
+        """, filas)
+        cursor.execute("""
+            INSERT INTO paciente (id_paciente, apellido, nombre, fecha_de_nacimiento, sexo, provincia, ciudad,
+                                  calle, altura, obra_social, email, contraseña, latitud, longitud)
+            SELECT 10000000 + i, 'Apellido ' || i, 'Nombre ' || i, date '1950-01-01' + (i %% 20000),
+                   (ARRAY['M', 'F'])[1 + i %% 2], 'Buenos Aires', 'Ciudad ' || (i %% 200),
+                   'Calle ' || (i %% 2000), (i %% 9000)::text, 'OSDE',
+                   'paciente' || i || '@bench.test', %(hash)s,
+                   -34.9 + ((i * 6151) %% 1000) / 1000.0 * 0.6,
+                   -58.8 + ((i * 3079) %% 1000) / 1000.0 * 0.6
+            FROM generate_series(1, %(pacientes)s) AS i
+        """, dict(filas, hash=hash_contraseña))
+        cursor.execute("""
+            INSERT INTO medico (id_medico, apellido, nombre, sexo, id_hospital, telefono, email, contraseña)
+            SELECT 20000000 + i, 'Apellido ' || i, 'Nombre ' || i, (ARRAY['M', 'F'])[1 + i %% 2],
+                   1 + i %% %(hospitales)s, '011-' || i, 'medico' || i || '@bench.test', %(hash)s
+            FROM generate_series(1, %(medicos)s) AS i
+        """, dict(filas, hash=hash_contraseña))
+        conn.commit()
+
+        # Los estudios se cargan por lotes para no sostener una transacción enorme
+        for desde in range(1, filas['estudios'] + 1, LOTE_ESTUDIOS):
+            hasta = min(desde + LOTE_ESTUDIOS - 1, filas['estudios'])
+            cursor.execute("""
+                INSERT INTO estudio_medico (id_estudio, id_paciente, id_medico, desc_estudio,
+                                            fecha_estudio, resultado, archivo_url)
+                SELECT i, 10000001 + (i * 7919) %% %(pacientes)s, 20000001 + (i * 104729) %% %(medicos)s,
+                       'Estudio ' || i, date '2015-01-01' + (i %% 3650), 'Resultado del estudio ' || i, NULL
+                FROM generate_series(%(desde)s, %(hasta)s) AS i
+            """, dict(filas, desde=desde, hasta=hasta))
+            conn.commit()
+            print(f"Estudios cargados: {hasta}/{filas['estudios']}", file=sys.stderr)
+
+        cursor.execute("ANALYZE")
+    conn.commit()
+
+
+def _estadisticas(valores):
+    ordenados = sorted(valores)
+    return {
+        'muestras': len(ordenados),
+        'p50_ms': round(statistics.median(ordenados), 3),
+        'p95_ms': round(ordenados[max(0, int(len(ordenados) * 0.95) - 1)], 3),
+        'p99_ms': round(ordenados[max(0, int(len(ordenados) * 0.99) - 1)], 3),
+        'media_ms': round(statistics.fmean(ordenados), 3),
+        'max_ms': round(ordenados[-1], 3),
+    }
+
+
+def medir_rutas(conn, filas, repeticiones, semilla):
+    azar = random.Random(semilla)
+    tiempos = {ruta: [] for ruta in (
+        'login', 'busqueda_especialidad', 'precalculo_cercanos', 'busqueda_precalculada',
+        'indice_sintomas', 'busqueda_sintomas', 'listado_estudios', 'alta_estudio'
+    )}
+
+    with conn.cursor() as cursor:
+        inicio = time.perf_counter()
+        cursor.execute(busqueda_utils.SQL_INDICE_SINTOMAS)
+        sintomas = cursor.fetchall()
+        cursor.execute(busqueda_utils.SQL_INDICE_PATOLOGIAS)
+        indice = sintomas_utils.IndiceSintomas(sintomas, cursor.fetchall())
+        tiempos['indice_sintomas'].append((time.perf_counter() - inicio) * 1000)
+        descripciones = [desc for _, desc in sintomas]
+
+        for _ in range(repeticiones):
+            n = azar.randint(1, filas['pacientes'])
+            id_paciente = 10000000 + n
+
+            inicio = time.perf_counter()
+            email = f"paciente{n}@bench.test"
+            cursor.execute(auth_utils.SQL_CUENTAS_POR_EMAIL, (email, email))
+            for _, _, _, datos in cursor.fetchall():
+                auth_utils.verificar_contraseña(CONTRASEÑA, datos['contraseña'])
+            tiempos['login'].append((time.perf_counter() - inicio) * 1000)
+
+            inicio = time.perf_counter()
+            cursor.execute("SELECT latitud, longitud FROM paciente WHERE id_paciente = %s", (id_paciente,))
+            lat_pac, lon_pac = cursor.fetchone()
+            cursor.execute(busqueda_utils.SQL_ESPECIALIDADES)
+            cursor.fetchall()
+            cursor.execute(busqueda_utils.SQL_HOSPITALES_CERCANOS_POR_ESPECIALIDAD, busqueda_utils.parametros_cercania(
+                azar.randint(1, filas['especialidades']), lat_pac, lon_pac,
+                busqueda_utils.BUSQUEDA_RADIO_KM, busqueda_utils.BUSQUEDA_LIMITE
+            ))
+            cursor.fetchall()
+            tiempos['busqueda_especialidad'].append((time.perf_counter() - inicio) * 1000)
+
+            inicio = time.perf_counter()
+            cursor.execute(busqueda_utils.SQL_ASEGURAR_CERCANOS_PACIENTE, busqueda_utils.parametros_cercanos_paciente(id_paciente))
+            conn.commit()
+            tiempos['precalculo_cercanos'].append((time.perf_counter() - inicio) * 1000)
+
+            inicio = time.perf_counter()
+            cursor.execute(busqueda_utils.SQL_HOSPITALES_CERCANOS_PRECALCULADOS, {
+                'id_paciente': id_paciente,
+                'id_especialidad': azar.randint(1, filas['especialidades']),
+                'radio_km': busqueda_utils.BUSQUEDA_RADIO_KM,
+                'limite': busqueda_utils.BUSQUEDA_LIMITE,
+                'limite_sin_coordenadas': 5,
+            })
+            cursor.fetchall()
+            tiempos['busqueda_precalculada'].append((time.perf_counter() - inicio) * 1000)
+
+            elegidos = azar.sample(descripciones, azar.randint(2, 4))
+            inicio = time.perf_counter()
+            ids_patologia, _, _ = indice.coincidencias(elegidos)
+            cursor.execute(busqueda_utils.SQL_HOSPITALES_POR_PATOLOGIAS, {'patologias': [int(i) for i in ids_patologia]})
+            cursor.fetchall()
+            tiempos['busqueda_sintomas'].append((time.perf_counter() - inicio) * 1000)
+
+            inicio = time.perf_counter()
+            cursor.execute(estudios_utils.SQL_ESTUDIOS_PACIENTE, (id_paciente,))
+            cursor.fetchall()
+            tiempos['listado_estudios'].append((time.perf_counter() - inicio) * 1000)
+
+            inicio = time.perf_counter()
+            cursor.execute(estudios_utils.SQL_SIGUIENTE_ID_ESTUDIO)
+            siguiente_id = cursor.fetchone()[0]
+            cursor.execute(estudios_utils.SQL_INSERTAR_ESTUDIO, (
+                siguiente_id, id_paciente, 20000000 + azar.randint(1, filas['medicos']),
+                "Estudio de benchmark", date.today(), "Sin observaciones", None
+            ))
+            conn.commit()
+            tiempos['alta_estudio'].append((time.perf_counter() - inicio) * 1000)
+
+    return {ruta: _estadisticas(valores) for ruta, valores in tiempos.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las rutas principales de InfoMed")
+    parser.add_argument("--estudios", type=int, default=100_000, help="Cantidad de estudios (10.000 a 10.000.000)")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte (además de stdout)")
+    parser.add_argument("--conservar", action="store_true", help="No borrar el esquema al terminar")
+    args = parser.parse_args()
+
+    if not 10_000 <= args.estudios <= 10_000_000:
+        print("Error: --estudios debe estar entre 10.000 y 10.000.000.")
+        sys.exit(1)
+
+    dsn, detener = os.getenv("BENCH_DATABASE_URL"), None
+    if not dsn:
+        dsn, detener = iniciar_postgres_local()
+    if not dsn:
+        print("Error: configure BENCH_DATABASE_URL o instale PostgreSQL (initdb y pg_ctl en el PATH).")
+        sys.exit(1)
+
+    filas = escala(args.estudios)
+    reporte = {
+        'fecha': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'postgres_local': detener is not None,
+        'repeticiones': args.repeticiones,
+        'semilla': args.semilla,
+        'escala': filas,
+    }
+    try:
+        conn = psycopg2.connect(dsn)
+        try:
+            reporte['postgres'] = conn.server_version
+            crear_esquema(conn)
+            reporte['migraciones'] = migraciones.aplicar_migraciones(conn)
+
+            inicio = time.perf_counter()
+            cargar_datos(conn, filas)
+            reporte['carga_s'] = round(time.perf_counter() - inicio, 2)
+
+            reporte['rutas'] = medir_rutas(conn, filas, args.repeticiones, args.semilla)
+
+            if not args.conservar:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"DROP SCHEMA {ESQUEMA} CASCADE")
+                conn.commit()
+        finally:
+            conn.close()
+    finally:
+        if detener:
+            detener()
+
+    salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(salida)
+    print(salida)
+
+
+if __name__ == "__main__":
+    main()
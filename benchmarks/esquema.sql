@@ -0,0 +1,88 @@
+-- Esquema de la base de InfoMed usado por el benchmark de rutas principales.
+-- Reproduce las tablas y columnas que consulta la aplicación; las claves de
+-- paciente y médico son el DNI, como en la base productiva.
+
+CREATE TABLE hospital (
+    id_hospital serial PRIMARY KEY,
+    desc_hospital text NOT NULL,
+    provincia text,
+    ciudad text,
+    calle text,
+    altura text,
+    telefono text,
+    latitud double precision,
+    longitud double precision
+);
+
+CREATE TABLE especialidades (
+    id_especialidad serial PRIMARY KEY,
+    desc_especialidad text NOT NULL
+);
+
+CREATE TABLE sintoma (
+    id_sintoma serial PRIMARY KEY,
+    desc_sintoma text NOT NULL
+);
+
+CREATE TABLE patologia (
+    id_patologia serial PRIMARY KEY,
+    desc_patologia text NOT NULL,
+    id_sintoma_1 integer REFERENCES sintoma (id_sintoma),
+    id_sintoma_2 integer REFERENCES sintoma (id_sintoma)
+);
+
+CREATE TABLE hospital_especialidades (
+    id_hospital integer NOT NULL REFERENCES hospital (id_hospital),
+    id_especialidad integer NOT NULL REFERENCES especialidades (id_especialidad),
+    PRIMARY KEY (id_hospital, id_especialidad)
+);
+
+CREATE TABLE patologia_especialidades (
+    id_patologia integer NOT NULL REFERENCES patologia (id_patologia),
+    id_especialidad integer NOT NULL REFERENCES especialidades (id_especialidad),
+    PRIMARY KEY (id_patologia, id_especialidad)
+);
+
+CREATE TABLE patologia_hospital (
+    id_patologia integer NOT NULL REFERENCES patologia (id_patologia),
+    id_hospital integer NOT NULL REFERENCES hospital (id_hospital),
+    PRIMARY KEY (id_patologia, id_hospital)
+);
+
+CREATE TABLE paciente (
+    id_paciente bigint PRIMARY KEY,
+    apellido text,
+    nombre text,
+    fecha_de_nacimiento date,
+    sexo text,
+    provincia text,
+    ciudad text,
+    calle text,
+    altura text,
+    obra_social text,
+    email text,
+    contraseña text,
+    latitud double precision,
+    longitud double precision
+);
+
+CREATE TABLE medico (
+    id_medico bigint PRIMARY KEY,
+    apellido text,
+    nombre text,
+    sexo text,
+    id_hospital integer REFERENCES hospital (id_hospital),
+    telefono text,
+    email text,
+    contraseña text
+);
+
+CREATE TABLE estudio_medico (
+    id_estudio bigint PRIMARY KEY,
+    id_paciente bigint NOT NULL REFERENCES paciente (id_paciente),
+    id_medico bigint NOT NULL REFERENCES medico (id_medico),
+    desc_estudio text,
+    fecha_estudio date,
+    resultado text,
+    archivo_url text
+);
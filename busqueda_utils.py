@@ -0,0 +1,208 @@
+# Consultas de búsqueda de atención médica, compartidas entre la página
+# "Buscar Atención Médica" y los benchmarks
+import math
+import os
+
+# Radio por defecto (km) y cantidad máxima de hospitales de la búsqueda por especialidad
+BUSQUEDA_RADIO_KM = float(os.getenv("BUSQUEDA_RADIO_KM", 50))
+BUSQUEDA_LIMITE = int(os.getenv("BUSQUEDA_LIMITE", 50))
+# Radios (km) que se pueden elegir en la búsqueda por especialidad
+BUSQUEDA_RADIOS_KM = sorted({BUSQUEDA_RADIO_KM, 5, 10, 25, 50, 100, 250, 500, 1000})
+# Hospitales sin coordenadas que la búsqueda por síntomas geocodifica antes de
+# mostrar los resultados; el resto se geocodifica en segundo plano
+BUSQUEDA_GEOCODIFICAR_EN_LINEA = int(os.getenv("BUSQUEDA_GEOCODIFICAR_EN_LINEA", 5))
+# Hospitales más cercanos que se precalculan por paciente y especialidad (migración 004).
+# Al menos BUSQUEDA_LIMITE: así la lista tiene todo lo que mostraría la búsqueda por radio
+CERCANOS_K = max(int(os.getenv("CERCANOS_K", BUSQUEDA_LIMITE)), BUSQUEDA_LIMITE)
+# Las listas guardan solo hospitales hasta el radio más grande de la búsqueda
+# (migración 006), para que un cambio de un hospital no recalcule las de todo el país
+CERCANOS_RADIO_KM = max(BUSQUEDA_RADIOS_KM)
+
+SQL_ESPECIALIDADES = """
+    SELECT id_especialidad, desc_especialidad
+    FROM especialidades
+    ORDER BY desc_especialidad
+"""
+
+SQL_HOSPITALES_POR_ESPECIALIDAD = """
+    SELECT DISTINCT h.id_hospital, h.desc_hospital, h.provincia, h.ciudad, h.calle, h.altura, h.telefono, h.latitud, h.longitud
+    FROM hospital h
+    INNER JOIN hospital_especialidades he ON h.id_hospital = he.id_hospital
+    WHERE he.id_especialidad = %s
+    ORDER BY h.desc_hospital
+"""
+
+SQL_SINTOMAS = "SELECT desc_sintoma FROM sintoma ORDER BY desc_sintoma;"
+
+# Versión de los datos de las búsquedas, para el cache de resultados (migración 005),
+# y la del índice de síntomas, que solo cambia con sintoma y patologia (migración 007)
+SQL_VERSION_DATOS_BUSQUEDA = "SELECT version, version_sintomas FROM version_datos_busqueda"
+
+# Datos del índice de síntomas en memoria (sintomas_utils.IndiceSintomas)
+SQL_INDICE_SINTOMAS = "SELECT id_sintoma, desc_sintoma FROM sintoma ORDER BY id_sintoma"
+SQL_INDICE_PATOLOGIAS = "SELECT id_patologia, id_sintoma_1, id_sintoma_2 FROM patologia ORDER BY id_patologia"
+
+# Hospitales de las patologías que coinciden con los síntomas, por especialidad
+# y por atención directa, en una sola consulta. Trae una fila por patología para
+# sumar los síntomas que cubre cada resultado. Parámetros: patologias (lista de ids)
+SQL_HOSPITALES_POR_PATOLOGIAS = """
+    SELECT
+        pe.id_patologia,
+        e.desc_especialidad as especialidad,
+        h.desc_hospital as hospital,
+        h.provincia,
+        h.ciudad,
+        h.calle,
+        h.altura,
+        h.telefono,
+        h.id_hospital,
+        h.latitud,
+        h.longitud,
+        'Por Especialidad' as tipo_atencion
+    FROM patologia_especialidades pe
+    INNER JOIN especialidades e ON pe.id_especialidad = e.id_especialidad
+    INNER JOIN hospital_especialidades he ON e.id_especialidad = he.id_especialidad
+    INNER JOIN hospital h ON he.id_hospital = h.id_hospital
+    WHERE pe.id_patologia = ANY(%(patologias)s)
+
+    UNION ALL
+
+    SELECT
+        ph.id_patologia,
+        CONCAT('Atención directa: ', p.desc_patologia) as especialidad,
+        h.desc_hospital as hospital,
+        h.provincia,
+        h.ciudad,
+        h.calle,
+        h.altura,
+        h.telefono,
+        h.id_hospital,
+        h.latitud,
+        h.longitud,
+        'Por Patología' as tipo_atencion
+    FROM patologia_hospital ph
+    INNER JOIN patologia p ON ph.id_patologia = p.id_patologia
+    INNER JOIN hospital h ON ph.id_hospital = h.id_hospital
+    WHERE ph.id_patologia = ANY(%(patologias)s)
+
+    ORDER BY especialidad, hospital
+"""
+
+# Hospitales de una especialidad dentro de un radio, ordenados por distancia.
+# La caja envolvente usa el índice (latitud, longitud) de la migración 003 y la
+# distancia de gran círculo (haversine) se calcula en la base. Los hospitales
+# sin coordenadas se agregan al final, hasta limite_sin_coordenadas, para
+# geocodificarlos en la página. Parámetros: ver parametros_cercania
+SQL_HOSPITALES_CERCANOS_POR_ESPECIALIDAD = """
+    WITH candidatos AS (
+        SELECT h.id_hospital, h.desc_hospital, h.provincia, h.ciudad, h.calle, h.altura, h.telefono, h.latitud, h.longitud,
+               2 * 6371 * asin(least(1, sqrt(
+                   power(sin(radians(h.latitud - %(latitud)s) / 2), 2) +
+                   cos(radians(%(latitud)s)) * cos(radians(h.latitud)) *
+                   power(sin(radians(h.longitud - %(longitud)s) / 2), 2)
+               ))) AS distancia_km
+        FROM hospital h
+        WHERE h.latitud BETWEEN %(lat_min)s AND %(lat_max)s
+          AND h.longitud BETWEEN %(lon_min)s AND %(lon_max)s
+          AND EXISTS (
+              SELECT 1 FROM hospital_especialidades he
+              WHERE he.id_hospital = h.id_hospital AND he.id_especialidad = %(id_especialidad)s
+          )
+    )
+    (
+        SELECT * FROM candidatos
+        WHERE distancia_km <= %(radio_km)s
+        ORDER BY distancia_km
+        LIMIT %(limite)s
+    )
+    UNION ALL
+    (
+        SELECT h.id_hospital, h.desc_hospital, h.provincia, h.ciudad, h.calle, h.altura, h.telefono, h.latitud, h.longitud,
+               NULL AS distancia_km
+        FROM hospital h
+        INNER JOIN hospital_especialidades he ON h.id_hospital = he.id_hospital
+        WHERE he.id_especialidad = %(id_especialidad)s
+          AND (h.latitud IS NULL OR h.longitud IS NULL)
+        LIMIT %(limite_sin_coordenadas)s
+    )
+"""
+
+
+def caja_envolvente(latitud, longitud, radio_km):
+    """Límites (lat_min, lat_max, lon_min, lon_max) que contienen el círculo del radio dado"""
+    delta_lat = radio_km / 111.045
+    # Cerca de los polos la caja abarca todas las longitudes
+    cos_lat = math.cos(math.radians(latitud))
+    delta_lon = 180.0 if cos_lat < 1e-6 else min(180.0, radio_km / (111.045 * cos_lat))
+    return latitud - delta_lat, latitud + delta_lat, longitud - delta_lon, longitud + delta_lon
+
+
+def parametros_cercania(id_especialidad, latitud, longitud, radio_km, limite, limite_sin_coordenadas=5):
+    """Parámetros de SQL_HOSPITALES_CERCANOS_POR_ESPECIALIDAD"""
+    latitud, longitud = float(latitud), float(longitud)
+    lat_min, lat_max, lon_min, lon_max = caja_envolvente(latitud, longitud, radio_km)
+    return {
+        'id_especialidad': int(id_especialidad),
+        'latitud': latitud,
+        'longitud': longitud,
+        'lat_min': lat_min,
+        'lat_max': lat_max,
+        'lon_min': lon_min,
+        'lon_max': lon_max,
+        'radio_km': radio_km,
+        'limite': limite,
+        'limite_sin_coordenadas': limite_sin_coordenadas,
+    }
+
+
+# Calcula las listas precalculadas del paciente si faltan o si son de otras
+# coordenadas, de otro k o de otro radio. Parámetros: ver parametros_cercanos_paciente
+SQL_ASEGURAR_CERCANOS_PACIENTE = """
+    SELECT refrescar_cercanos_paciente(p.id_paciente, %(k)s, NULL, %(radio_km)s)
+    FROM paciente p
+    WHERE p.id_paciente = %(id_paciente)s
+      AND p.latitud IS NOT NULL AND p.longitud IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM paciente_cercanos_calculado c
+          WHERE c.id_paciente = p.id_paciente
+            AND c.latitud = p.latitud AND c.longitud = p.longitud
+            AND c.k = %(k)s AND c.radio_km = %(radio_km)s
+      )
+"""
+
+# Recalcula las listas del paciente. Parámetros: ver parametros_cercanos_paciente
+SQL_REFRESCAR_CERCANOS_PACIENTE = "SELECT refrescar_cercanos_paciente(%(id_paciente)s, %(k)s, NULL, %(radio_km)s)"
+
+
+def parametros_cercanos_paciente(id_paciente):
+    """Parámetros de SQL_ASEGURAR_CERCANOS_PACIENTE y SQL_REFRESCAR_CERCANOS_PACIENTE"""
+    return {'id_paciente': int(id_paciente), 'k': CERCANOS_K, 'radio_km': float(CERCANOS_RADIO_KM)}
+
+# Hospitales precalculados de una especialidad para el paciente, dentro del
+# radio: una lectura por la clave primaria. Como en la búsqueda por radio, se
+# agregan al final hasta limite_sin_coordenadas hospitales sin coordenadas (no
+# están en las listas) para geocodificarlos en la página.
+# Parámetros: id_paciente, id_especialidad, radio_km, limite, limite_sin_coordenadas
+SQL_HOSPITALES_CERCANOS_PRECALCULADOS = """
+    (
+        SELECT h.id_hospital, h.desc_hospital, h.provincia, h.ciudad, h.calle, h.altura, h.telefono, h.latitud, h.longitud,
+               c.distancia_km
+        FROM paciente_hospitales_cercanos c
+        INNER JOIN hospital h ON h.id_hospital = c.id_hospital
+        WHERE c.id_paciente = %(id_paciente)s
+          AND c.id_especialidad = %(id_especialidad)s
+          AND c.distancia_km <= %(radio_km)s
+        ORDER BY c.orden
+        LIMIT %(limite)s
+    )
+    UNION ALL
+    (
+        SELECT h.id_hospital, h.desc_hospital, h.provincia, h.ciudad, h.calle, h.altura, h.telefono, h.latitud, h.longitud,
+               NULL AS distancia_km
+        FROM hospital h
+        INNER JOIN hospital_especialidades he ON h.id_hospital = he.id_hospital
+        WHERE he.id_especialidad = %(id_especialidad)s
+          AND (h.latitud IS NULL OR h.longitud IS NULL)
+        LIMIT %(limite_sin_coordenadas)s
+    )
+"""
@@ -0,0 +1,68 @@
+import threading
+
+
+class _Vuelo:
+    """Una ejecución en curso y quienes esperan su resultado"""
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.compartidos = 0
+
+
+class Coalescedor:
+    """
+    Single-flight: mientras una función con cierta clave está en ejecución, las
+    llamadas con la misma clave esperan ese resultado en lugar de repetirla.
+    No es un cache: al terminar, la próxima llamada vuelve a ejecutar.
+    """
+
+    def __init__(self):
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self.ejecutadas = 0
+        self.compartidas = 0
+
+    def ejecutar(self, clave, funcion, copiar=lambda resultado: resultado):
+        """
+        Ejecuta funcion() o se suma a una ejecución en curso con la misma clave.
+
+        Args:
+            copiar (callable): copia el resultado para cada llamada cuando se comparte,
+                así ninguna sesión modifica el objeto que recibió otra
+
+        Returns:
+            el resultado de funcion(); si falla, todas las llamadas reciben la excepción
+        """
+        with self._lock:
+            vuelo = self._en_curso.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._en_curso[clave] = _Vuelo()
+                self.ejecutadas += 1
+            else:
+                vuelo.compartidos += 1
+                self.compartidas += 1
+
+        if not lider:
+            vuelo.listo.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return copiar(vuelo.resultado)
+
+        try:
+            vuelo.resultado = funcion()
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            # Se quita antes de avisar: las llamadas nuevas ya no se suman a este vuelo
+            with self._lock:
+                del self._en_curso[clave]
+            vuelo.listo.set()
+        return copiar(vuelo.resultado) if vuelo.compartidos else vuelo.resultado
+
+    def estadisticas(self):
+        with self._lock:
+            return {'ejecutadas': self.ejecutadas, 'compartidas': self.compartidas, 'en_curso': len(self._en_curso)}
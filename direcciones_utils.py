@@ -0,0 +1,118 @@
+import re
+import unicodedata
+
+# Abreviaturas frecuentes en nombres de calles, por palabra ya normalizada
+ABREVIATURAS = {
+    'av': 'avenida', 'avda': 'avenida', 'avd': 'avenida', 'avds': 'avenida',
+    'bv': 'bulevar', 'bvd': 'bulevar', 'bvard': 'bulevar', 'blvd': 'bulevar', 'boulevard': 'bulevar',
+    'pje': 'pasaje', 'psje': 'pasaje', 'diag': 'diagonal', 'cno': 'camino', 'ctda': 'cortada',
+    'gral': 'general', 'gdor': 'gobernador', 'pte': 'presidente', 'pres': 'presidente',
+    'dr': 'doctor', 'dra': 'doctora', 'ing': 'ingeniero', 'tte': 'teniente', 'cnel': 'coronel',
+    'cap': 'capitan', 'cmte': 'comandante', 'sgto': 'sargento', 'alte': 'almirante', 'mtro': 'maestro',
+    'sta': 'santa', 'sto': 'santo', 'sn': 'san', 'pto': 'puerto', 'prof': 'profesor',
+}
+
+# Variantes de las provincias (sin tildes ni puntuación) y su nombre canónico
+_PROVINCIAS = {
+    'ciudad autonoma de buenos aires': [
+        'caba', 'c a b a', 'capital federal', 'cap fed', 'cdad autonoma de buenos aires',
+        'ciudad de buenos aires', 'cdad de buenos aires', 'cdad de bs as', 'ciudad de bs as',
+    ],
+    'buenos aires': ['bs as', 'bsas', 'pba', 'pcia de buenos aires', 'provincia de buenos aires', 'pcia bs as', 'prov de buenos aires'],
+    'cordoba': ['cba', 'cordoba', 'pcia de cordoba', 'provincia de cordoba'],
+    'santa fe': ['sta fe', 'santa fe', 'provincia de santa fe'],
+    'santiago del estero': ['sgo del estero', 'stgo del estero', 'santiago del estero'],
+    'tierra del fuego': ['tdf', 'tierra del fuego', 'tierra del fuego antartida e islas del atlantico sur'],
+    'entre rios': ['e rios', 'entre rios'],
+    'mendoza': ['mza', 'mendoza'],
+    'tucuman': ['tuc', 'tucuman'],
+}
+ALIAS_PROVINCIAS = {alias: nombre for nombre, alias_ in _PROVINCIAS.items() for alias in alias_ + [nombre]}
+
+# Alturas "sin número"
+_SIN_NUMERO = {'sn', 's n', 'sin numero', 'sin nro', 'sin num', '0'}
+_PREFIJO_NUMERO = re.compile(r'^(n|nro|num|numero|no)\s+(?=\d)')
+# El mismo marcador dentro de una dirección en una línea ("corrientes n 1234")
+_MARCADOR_NUMERO = re.compile(r'\b(n|nro|num|numero|no)\s+(?=\d)')
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes, sin puntuación y con espacios simples"""
+    # Antes de NFKD, que convierte º en o
+    texto = str(texto or '').replace('°', ' ').replace('º', ' ')
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    # Separadores de miles: 1.234 -> 1234
+    texto = re.sub(r'(?<=\d)\.(?=\d{3}\b)', '', texto)
+    texto = re.sub(r'[^\w\s]', ' ', texto)
+    return ' '.join(texto.split())
+
+
+def expandir_abreviaturas(texto):
+    """Reemplaza las abreviaturas de ABREVIATURAS en un texto ya normalizado"""
+    return ' '.join(ABREVIATURAS.get(palabra, palabra) for palabra in texto.split())
+
+
+def normalizar_provincia(provincia):
+    texto = normalizar_texto(provincia)
+    return ALIAS_PROVINCIAS.get(texto, texto)
+
+
+def normalizar_altura(altura):
+    """
+    Número de la calle como texto de dígitos, o "" si no tiene.
+    Acepta "1.234", "N° 1234", "1234 piso 3" y "s/n".
+    """
+    texto = normalizar_texto(altura)
+    if texto in _SIN_NUMERO:
+        return ""
+    texto = _PREFIJO_NUMERO.sub('', texto)
+    numero = re.match(r'\d+', texto)
+    return str(int(numero.group())) if numero else ""
+
+
+def normalizar_direccion(provincia, ciudad, calle, altura):
+    """
+    Forma canónica de una dirección. Como en formatear_direccion, si la ciudad
+    repite la provincia (por ejemplo en CABA) se descarta.
+
+    Returns:
+        dict: provincia, ciudad, calle y altura normalizadas
+    """
+    provincia_n = normalizar_provincia(provincia)
+    ciudad_n = normalizar_texto(ciudad)
+    if ALIAS_PROVINCIAS.get(ciudad_n, ciudad_n) == provincia_n:
+        ciudad_n = ""
+    else:
+        ciudad_n = expandir_abreviaturas(ciudad_n)
+    return {
+        'provincia': provincia_n,
+        'ciudad': ciudad_n,
+        'calle': expandir_abreviaturas(normalizar_texto(calle)),
+        'altura': normalizar_altura(altura),
+    }
+
+
+def clave_direccion(provincia, ciudad, calle, altura):
+    """
+    Dirección canónica: la misma para variantes de escritura de una dirección.
+    Es la que se envía al geocodificador y la clave de sus caches.
+    """
+    d = normalizar_direccion(provincia, ciudad, calle, altura)
+    partes = [f"{d['calle']} {d['altura']}".strip(), d['ciudad'], d['provincia'], 'argentina']
+    return ', '.join(p for p in partes if p)
+
+
+def normalizar_direccion_libre(texto):
+    """
+    Forma canónica de una dirección escrita en una sola línea ("calle altura,
+    ciudad, provincia, país"): normaliza cada parte, quita el "N°" antes de la
+    altura y las partes repetidas.
+    """
+    partes = []
+    for parte in str(texto or '').split(','):
+        parte = _MARCADOR_NUMERO.sub('', normalizar_texto(parte))
+        parte = ALIAS_PROVINCIAS.get(parte) or expandir_abreviaturas(parte)
+        if parte and parte not in partes:
+            partes.append(parte)
+    return ', '.join(partes)
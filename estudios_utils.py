@@ -0,0 +1,27 @@
+# Consultas de estudios médicos, compartidas entre las páginas
+# "Ver mis Estudios" y "Cargar Nuevo Estudio" y los benchmarks
+
+SQL_ESTUDIOS_PACIENTE = """
+    SELECT
+        e.id_estudio,
+        e.desc_estudio,
+        e.fecha_estudio,
+        e.resultado,
+        e.archivo_url,
+        m.nombre || ' ' || m.apellido as nombre_medico,
+        h.desc_hospital as hospital,
+        p.nombre || ' ' || p.apellido as nombre_paciente
+    FROM estudio_medico e
+    JOIN medico m ON e.id_medico = m.id_medico
+    JOIN hospital h ON m.id_hospital = h.id_hospital
+    JOIN paciente p ON e.id_paciente = p.id_paciente
+    WHERE e.id_paciente = %s
+    ORDER BY e.fecha_estudio DESC
+"""
+
+SQL_SIGUIENTE_ID_ESTUDIO = "SELECT COALESCE(MAX(id_estudio), 0) + 1 as siguiente_id FROM estudio_medico"
+
+SQL_INSERTAR_ESTUDIO = """
+    INSERT INTO estudio_medico (id_estudio, id_paciente, id_medico, desc_estudio, fecha_estudio, resultado, archivo_url)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
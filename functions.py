@@ -2,10 +2,16 @@ import psycopg2
 import os
 from dotenv import load_dotenv
 import pandas as pd
+from metricas_utils import CursorInstrumentado
+from coalescencia_utils import Coalescedor
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Identical SELECTs running at the same time share one database round trip
+COALESCE_READS = os.getenv("COALESCE_READS", "1") == "1"
+_lecturas = Coalescedor()
+
 def connect_to_supabase():
     """
     Connects to the Supabase PostgreSQL database using transaction pooler details
@@ -32,6 +38,7 @@ def connect_to_supabase():
             dbname=dbname,
             user=user,
             password=password,
+            cursor_factory=CursorInstrumentado,
         )
         print("Successfully connected to Supabase database.")
         return conn
@@ -39,10 +46,9 @@ def connect_to_supabase():
         print(f"Error connecting to Supabase database: {e}")
         return None
 
-connect_to_supabase()
 
 
-def execute_query(query, params= None, conn=None, is_select=True):
+def execute_query(query, params= None, conn=None, is_select=True, coalesce=True):
     """
     Executes a SQL query and returns the results as a pandas DataFrame for SELECT queries,
     or executes DML operations (INSERT, UPDATE, DELETE) and returns success status.
@@ -53,11 +59,31 @@ def execute_query(query, params= None, conn=None, is_select=True):
             If None, a new connection will be established.
         is_select (bool, optional): Whether the query is a SELECT query (True) or 
             a DML operation like INSERT/UPDATE/DELETE (False). Default is True.
+        coalesce (bool, optional): Whether a SELECT may share an identical read already
+            in flight. That read may have started before a write this caller just
+            committed, so pass False to read your own writes. Default is True.
             
     Returns:
         pandas.DataFrame or bool: A DataFrame containing the query results for SELECT queries,
             or True for successful DML operations, False otherwise.
     """
+    if is_select and conn is None and coalesce and COALESCE_READS:
+        # Concurrent callers with the same query and parameters wait for the one
+        # already in flight; each gets its own copy of the DataFrame
+        return _lecturas.ejecutar(
+            (query, repr(params)),
+            lambda: _execute_query(query, params, None, True),
+            copiar=lambda df: df.copy()
+        )
+    return _execute_query(query, params, conn, is_select)
+
+
+def coalesced_reads_stats():
+    """Counters of the read coalescing layer (executed, shared, in flight)"""
+    return _lecturas.estadisticas()
+
+
+def _execute_query(query, params, conn, is_select):
     try:
         # Create a new connection if one wasn't provided
         close_conn = False
@@ -1,14 +1,340 @@
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from math import radians, cos, sin, asin, sqrt
 
-def geocode_address(address):
-    geolocator = Nominatim(user_agent="infomed-app")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
-    location = geocode(address)
-    if location:
-        return location.latitude, location.longitude
-    return None, None
+import direcciones_utils
+import limitador_utils
+
+# Backend de geocodificación: "nominatim" (por defecto) o "fixture" para pruebas sin red
+GEOCODER_BACKEND = os.getenv("GEOCODER_BACKEND", "nominatim")
+# Archivo JSON {dirección: [latitud, longitud]} y latencia simulada del backend "fixture"
+GEOCODER_FIXTURES = os.getenv("GEOCODER_FIXTURES")
+GEOCODER_LATENCIA_MS = float(os.getenv("GEOCODER_LATENCIA_MS", 0))
+# Resultados que se recuerdan por proceso, por dirección normalizada
+GEOCODER_CACHE_MAX = int(os.getenv("GEOCODER_CACHE_MAX", 10000))
+
+# Backend "cadena": proveedores en orden de consulta, tiempo máximo por proveedor
+# (GEOCODER_TIMEOUT_<NOMBRE> para uno en particular) y latencia por encima de la
+# cual un proveedor pasa al final de la cadena
+GEOCODER_CADENA = os.getenv("GEOCODER_CADENA", "gazetteer,nominatim,photon")
+GEOCODER_TIMEOUT = float(os.getenv("GEOCODER_TIMEOUT", 5))
+GEOCODER_LATENCIA_OBJETIVO_MS = float(os.getenv("GEOCODER_LATENCIA_OBJETIVO_MS", 1500))
+# Segundos sin consultas tras los cuales un proveedor lento vuelve a su lugar
+# para una consulta de prueba, que reinicia su promedio de latencia
+GEOCODER_SONDEO = float(os.getenv("GEOCODER_SONDEO", 30))
+# Fallas seguidas que suspenden a un proveedor, y por cuántos segundos
+GEOCODER_FALLAS_SUSPENSION = int(os.getenv("GEOCODER_FALLAS_SUSPENSION", 3))
+GEOCODER_SUSPENSION = float(os.getenv("GEOCODER_SUSPENSION", 60))
+# Gazetteer offline: archivo JSON {dirección: [latitud, longitud]} sin red ni límite
+GEOCODER_GAZETTEER = os.getenv("GEOCODER_GAZETTEER")
+# Servidores de los proveedores remotos (por ejemplo, un Nominatim propio)
+GEOCODER_NOMINATIM_DOMINIO = os.getenv("GEOCODER_NOMINATIM_DOMINIO", "nominatim.openstreetmap.org")
+GEOCODER_PHOTON_DOMINIO = os.getenv("GEOCODER_PHOTON_DOMINIO", "photon.komoot.io")
+
+
+class GeocodificacionNoDisponible(Exception):
+    """Ningún proveedor pudo responder (error o timeout): el resultado no se guarda en el cache"""
+
+
+class GeocodificadorNominatim:
+    """
+    Geocodificador de OpenStreetMap. El límite de una consulta por segundo se
+    aplica con el token bucket de limitador_utils, compartido entre procesos.
+    """
+
+    def __init__(self, user_agent="infomed-app", limitador=None, dominio=GEOCODER_NOMINATIM_DOMINIO, timeout=GEOCODER_TIMEOUT):
+        from geopy.geocoders import Nominatim
+        self._geolocator = Nominatim(user_agent=user_agent, domain=dominio, timeout=timeout)
+        self._limitador = limitador or limitador_utils.limitador_geocoder()
+
+    def adquirir_turno(self, prioridad=limitador_utils.INTERACTIVA, espera_maxima=None):
+        """Espera un turno del limitador; True si se obtuvo dentro de espera_maxima"""
+        return self._limitador.adquirir(prioridad, espera_maxima)
+
+    def consultar(self, address):
+        """Consulta a Nominatim con el turno ya tomado"""
+        location = self._geolocator.geocode(address)
+        if location:
+            return location.latitude, location.longitude
+        return None, None
+
+    def geocodificar(self, address, prioridad=limitador_utils.INTERACTIVA, espera_maxima=None):
+        if not self.adquirir_turno(prioridad, espera_maxima):
+            raise limitador_utils.EsperaExcedida(f"Sin turno para geocodificar en {espera_maxima} s")
+        return self.consultar(address)
+
+
+class GeocodificadorPhoton:
+    """Geocodificador Photon (komoot o un servidor propio), sin límite de consultas por segundo"""
+
+    def __init__(self, user_agent="infomed-app", dominio=GEOCODER_PHOTON_DOMINIO, timeout=GEOCODER_TIMEOUT):
+        from geopy.geocoders import Photon
+        self._geolocator = Photon(user_agent=user_agent, domain=dominio, timeout=timeout)
+
+    def geocodificar(self, address, prioridad=limitador_utils.INTERACTIVA, espera_maxima=None):
+        location = self._geolocator.geocode(address)
+        if location:
+            return location.latitude, location.longitude
+        return None, None
+
+
+class GeocodificadorFixture:
+    """
+    Geocodificador local para pruebas de rendimiento: responde desde un archivo
+    de fixtures con una latencia configurable. Las direcciones que no están en
+    el archivo reciben coordenadas determinísticas dentro del AMBA, salvo que
+    generar_faltantes sea False. Con tasa_error falla al azar esa fracción de
+    las consultas, para probar la cadena de proveedores.
+    """
+
+    def __init__(self, ruta=None, latencia_ms=0.0, generar_faltantes=True, tasa_error=0.0, semilla=None):
+        self.latencia_ms = latencia_ms
+        self.generar_faltantes = generar_faltantes
+        self.tasa_error = tasa_error
+        self._azar = random.Random(semilla)
+        self.consultas = 0
+        self.fixtures = {}
+        if ruta:
+            with open(ruta, encoding="utf-8") as archivo:
+                self.fixtures = {
+                    direcciones_utils.normalizar_direccion_libre(direccion): tuple(coords)
+                    for direccion, coords in json.load(archivo).items()
+                }
+
+    def geocodificar(self, address, prioridad=limitador_utils.INTERACTIVA, espera_maxima=None):
+        self.consultas += 1
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms / 1000)
+        if self.tasa_error and self._azar.random() < self.tasa_error:
+            raise ConnectionError("Error simulado del geocodificador de prueba")
+        address = direcciones_utils.normalizar_direccion_libre(address)
+        if address in self.fixtures:
+            return self.fixtures[address]
+        if not self.generar_faltantes:
+            return None, None
+        resumen = hashlib.sha256(address.encode("utf-8")).digest()
+        lat = -34.9 + int.from_bytes(resumen[:4], "big") / 2 ** 32 * 0.6
+        lon = -58.8 + int.from_bytes(resumen[4:8], "big") / 2 ** 32 * 0.6
+        return lat, lon
+
+
+class Proveedor:
+    """Un geocodificador de la cadena con su timeout y su estado de salud"""
+
+    def __init__(self, nombre, geocodificador, timeout=GEOCODER_TIMEOUT):
+        self.nombre = nombre
+        self.geocodificador = geocodificador
+        self.timeout = timeout
+        self.llamadas = 0
+        self.fallas = 0
+        self.fallas_seguidas = 0
+        self.latencia_ms = None
+        self.ultima_llamada = 0.0
+        self.suspendido_hasta = 0.0
+
+    def lento(self, latencia_objetivo_ms, ahora):
+        """True si supera la latencia objetivo y se lo consultó hace menos de GEOCODER_SONDEO segundos"""
+        return (self.latencia_ms or 0) > latencia_objetivo_ms and ahora - self.ultima_llamada < GEOCODER_SONDEO
+
+    def registrar(self, duracion_ms, exito):
+        ahora = time.monotonic()
+        self.llamadas += 1
+        # Promedio móvil exponencial de la latencia; una consulta después de
+        # GEOCODER_SONDEO segundos sin llamadas lo reinicia
+        if self.latencia_ms is None or ahora - self.ultima_llamada >= GEOCODER_SONDEO:
+            self.latencia_ms = duracion_ms
+        else:
+            self.latencia_ms = 0.8 * self.latencia_ms + 0.2 * duracion_ms
+        self.ultima_llamada = ahora
+        if exito:
+            self.fallas_seguidas = 0
+            return
+        self.fallas += 1
+        self.fallas_seguidas += 1
+        if self.fallas_seguidas >= GEOCODER_FALLAS_SUSPENSION:
+            self.suspendido_hasta = ahora + GEOCODER_SUSPENSION
+
+    def estado(self):
+        return {
+            'llamadas': self.llamadas,
+            'fallas': self.fallas,
+            'latencia_ms': None if self.latencia_ms is None else round(self.latencia_ms, 1),
+            'suspendido': self.suspendido_hasta > time.monotonic(),
+        }
+
+
+class CadenaGeocodificadores:
+    """
+    Consulta los proveedores en orden hasta que uno encuentra la dirección.
+    Los proveedores con varias fallas seguidas se saltean por GEOCODER_SUSPENSION
+    segundos y los que superan GEOCODER_LATENCIA_OBJETIVO_MS pasan al final,
+    hasta que pasan GEOCODER_SONDEO segundos sin consultarlos y se los vuelve a probar.
+    Cada consulta corre con el timeout de su proveedor. Si el proveedor tiene
+    límite de consultas (adquirir_turno), el turno se espera antes y no cuenta
+    dentro del timeout ni como falla.
+    """
+
+    def __init__(self, proveedores, latencia_objetivo_ms=GEOCODER_LATENCIA_OBJETIVO_MS, hilos=8):
+        self.proveedores = list(proveedores)
+        self.latencia_objetivo_ms = latencia_objetivo_ms
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="geocodificador")
+
+    def _en_orden(self):
+        ahora = time.monotonic()
+        with self._lock:
+            disponibles = [p for p in self.proveedores if p.suspendido_hasta <= ahora]
+            # sorted es estable: se mantiene el orden configurado dentro de cada grupo
+            return sorted(disponibles, key=lambda p: p.lento(self.latencia_objetivo_ms, ahora))
+
+    def geocodificar(self, address, prioridad=limitador_utils.INTERACTIVA, espera_maxima=None):
+        proveedores = self._en_orden()
+        if not proveedores:
+            # Todos suspendidos: no es "dirección no encontrada" y no se guarda en el cache
+            raise GeocodificacionNoDisponible("Todos los proveedores están suspendidos")
+        sin_respuesta = []
+        for proveedor in proveedores:
+            geocodificador = proveedor.geocodificador
+            if hasattr(geocodificador, 'adquirir_turno'):
+                if not geocodificador.adquirir_turno(prioridad, espera_maxima):
+                    # Sin turno no es una falla del proveedor
+                    sin_respuesta.append(proveedor.nombre)
+                    continue
+                consulta = partial(geocodificador.consultar, address)
+            else:
+                consulta = partial(geocodificador.geocodificar, address, prioridad=prioridad, espera_maxima=espera_maxima)
+            # El timeout corre desde que el proveedor tiene turno
+            inicio = time.perf_counter()
+            futuro = self._executor.submit(consulta)
+            try:
+                lat, lon = futuro.result(timeout=proveedor.timeout)
+            except limitador_utils.EsperaExcedida:
+                # Sin turno no es una falla del proveedor
+                sin_respuesta.append(proveedor.nombre)
+                continue
+            except Exception as e:
+                with self._lock:
+                    proveedor.registrar((time.perf_counter() - inicio) * 1000, exito=False)
+                print(f"Geocodificador {proveedor.nombre} falló: {type(e).__name__} {e}")
+                sin_respuesta.append(proveedor.nombre)
+                continue
+            with self._lock:
+                proveedor.registrar((time.perf_counter() - inicio) * 1000, exito=True)
+            if lat and lon:
+                return lat, lon
+        if sin_respuesta:
+            raise GeocodificacionNoDisponible(f"Sin respuesta de: {', '.join(sin_respuesta)}")
+        return None, None
+
+    def estado(self):
+        with self._lock:
+            return {p.nombre: p.estado() for p in self.proveedores}
+
+
+def crear_cadena(nombres=GEOCODER_CADENA):
+    """Cadena con los backends registrados, en el orden de una lista separada por comas"""
+    proveedores = []
+    for nombre in (n.strip() for n in nombres.split(",") if n.strip()):
+        if nombre not in _GEOCODIFICADORES or nombre == 'cadena':
+            raise ValueError(f"Geocodificador desconocido en GEOCODER_CADENA: {nombre}")
+        timeout = float(os.getenv(f"GEOCODER_TIMEOUT_{nombre.upper()}", GEOCODER_TIMEOUT))
+        proveedores.append(Proveedor(nombre, _GEOCODIFICADORES[nombre](), timeout))
+    return CadenaGeocodificadores(proveedores)
+
+
+# Fábricas de backends por nombre; se pueden registrar otros con registrar_geocodificador
+_GEOCODIFICADORES = {
+    'nominatim': lambda: GeocodificadorNominatim(),
+    'photon': lambda: GeocodificadorPhoton(),
+    'gazetteer': lambda: GeocodificadorFixture(GEOCODER_GAZETTEER, generar_faltantes=False),
+    'fixture': lambda: GeocodificadorFixture(GEOCODER_FIXTURES, GEOCODER_LATENCIA_MS),
+    'cadena': lambda: crear_cadena(),
+}
+
+_geocodificador = None
+_lock = threading.Lock()
+_cache = OrderedDict()
+_lock_cache = threading.Lock()
+
+
+def registrar_geocodificador(nombre, fabrica):
+    """
+    Agrega un backend que se puede elegir con GEOCODER_BACKEND. El backend
+    implementa geocodificar(address, prioridad, espera_maxima); si tiene límite
+    de consultas, también adquirir_turno(prioridad, espera_maxima) y
+    consultar(address), para que la cadena no cuente la espera en su timeout.
+    """
+    _GEOCODIFICADORES[nombre] = fabrica
+
+
+def configurar_geocodificador(geocodificador):
+    """Reemplaza el geocodificador del proceso (por ejemplo, desde un benchmark)"""
+    global _geocodificador
+    with _lock:
+        _geocodificador = geocodificador
+    limpiar_cache()
+
+
+def obtener_geocodificador():
+    """Geocodificador compartido por el proceso, creado según GEOCODER_BACKEND"""
+    global _geocodificador
+    with _lock:
+        if _geocodificador is None:
+            if GEOCODER_BACKEND not in _GEOCODIFICADORES:
+                raise ValueError(f"GEOCODER_BACKEND desconocido: {GEOCODER_BACKEND}")
+            _geocodificador = _GEOCODIFICADORES[GEOCODER_BACKEND]()
+        return _geocodificador
+
+
+def estado_proveedores():
+    """Salud y latencia de cada proveedor, si el backend es una cadena"""
+    geocodificador = obtener_geocodificador()
+    return geocodificador.estado() if isinstance(geocodificador, CadenaGeocodificadores) else {}
+
+
+def limpiar_cache():
+    with _lock_cache:
+        _cache.clear()
+
+
+def geocode_address(address, prioridad=limitador_utils.INTERACTIVA,
+                    espera_maxima=limitador_utils.GEOCODER_ESPERA_MAXIMA, omitir_fallas=True):
+    """
+    Coordenadas (latitud, longitud) de una dirección, o (None, None).
+    Variantes de escritura de la misma dirección comparten la entrada del cache
+    y una sola consulta al geocodificador.
+
+    Args:
+        prioridad (str): limitador_utils.INTERACTIVA (búsquedas) o LOTE (backfill)
+        espera_maxima (float): segundos máximos esperando turno; None espera sin límite
+        omitir_fallas (bool): False propaga las fallas transitorias (sin turno o sin
+            respuesta de los proveedores) en lugar de retornar (None, None)
+    """
+    clave = direcciones_utils.normalizar_direccion_libre(address)
+    with _lock_cache:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+    try:
+        coords = obtener_geocodificador().geocodificar(clave, prioridad=prioridad, espera_maxima=espera_maxima)
+    except (limitador_utils.EsperaExcedida, GeocodificacionNoDisponible) as e:
+        # No se guarda en el cache: se reintenta en la próxima búsqueda
+        if not omitir_fallas:
+            raise
+        print(f"Geocodificación omitida para '{clave}': {e}")
+        return None, None
+    with _lock_cache:
+        _cache[clave] = coords
+        while len(_cache) > GEOCODER_CACHE_MAX:
+            _cache.popitem(last=False)
+    return coords
 
 def haversine(lat1, lon1, lat2, lon2):
     # Convertir grados a radianes
@@ -19,4 +345,4 @@ def haversine(lat1, lon1, lat2, lon2):
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * asin(sqrt(a))
     r = 6371  # Radio de la Tierra en km
-    return c * r 
\ No newline at end of file
+    return c * r
@@ -0,0 +1,105 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import busqueda_utils
+import direcciones_utils
+import functions as f
+import geo_utils
+
+# Hilos que geocodifican en segundo plano las direcciones recién guardadas.
+# Uno alcanza: Nominatim admite una consulta por segundo
+GEOCODIFICACION_HILOS = int(os.getenv("GEOCODIFICACION_HILOS", 1))
+# Segundos que una búsqueda espera una geocodificación encolada antes de hacerla ella misma
+GEOCODIFICACION_ESPERA = float(os.getenv("GEOCODIFICACION_ESPERA", 5))
+
+# Tablas con dirección y coordenadas, y su clave primaria
+TABLAS_GEOCODIFICABLES = {'paciente': 'id_paciente', 'hospital': 'id_hospital'}
+
+_executor = ThreadPoolExecutor(max_workers=GEOCODIFICACION_HILOS, thread_name_prefix="geocodificacion")
+_pendientes = {}
+_lock = threading.Lock()
+
+
+def direccion_geocodificable(provincia, ciudad, calle, altura):
+    """Dirección normalizada que se envía al geocodificador (ver direcciones_utils)"""
+    return direcciones_utils.clave_direccion(provincia, ciudad, calle, altura)
+
+
+def _geocodificar_y_guardar(tabla, id_fila, direccion):
+    try:
+        lat, lon = geo_utils.geocode_address(direccion_geocodificable(**direccion))
+        if lat and lon:
+            # Solo si la dirección no cambió mientras se geocodificaba
+            query = f"""
+                UPDATE {tabla} SET latitud = %(latitud)s, longitud = %(longitud)s
+                WHERE {TABLAS_GEOCODIFICABLES[tabla]} = %(id)s
+                  AND provincia = %(provincia)s AND ciudad = %(ciudad)s
+                  AND calle = %(calle)s AND altura = %(altura)s
+            """
+            guardado = f.execute_query(query, params=dict(direccion, id=id_fila, latitud=lat, longitud=lon), is_select=False)
+            if guardado and tabla == 'paciente':
+                # Listas de hospitales cercanos listas para la primera búsqueda
+                f.execute_query(busqueda_utils.SQL_REFRESCAR_CERCANOS_PACIENTE,
+                                params=busqueda_utils.parametros_cercanos_paciente(id_fila), is_select=False)
+            return lat, lon
+    except Exception as e:
+        print(f"Error en la geocodificación de {tabla} {id_fila}: {e}")
+    return None, None
+
+
+def _clave(tabla, id_fila):
+    """Clave de _pendientes: el id llega como int desde la base o como str desde un formulario"""
+    return tabla, int(id_fila)
+
+
+def geocodificacion_pendiente(tabla, id_fila):
+    """True si la fila ya tiene una geocodificación encolada o en curso"""
+    with _lock:
+        return _clave(tabla, id_fila) in _pendientes
+
+
+def encolar_geocodificacion(tabla, id_fila, provincia, ciudad, calle, altura):
+    """
+    Geocodifica en segundo plano la dirección de un paciente u hospital y guarda
+    las coordenadas en la base. Si la fila ya tenía una geocodificación pendiente,
+    la nueva la reemplaza para las esperas (la anterior no escribe si la dirección cambió).
+
+    Returns:
+        Future con (latitud, longitud), o None si la dirección está incompleta
+    """
+    if tabla not in TABLAS_GEOCODIFICABLES:
+        raise ValueError(f"Tabla sin coordenadas: {tabla}")
+    direccion = {'provincia': provincia, 'ciudad': ciudad, 'calle': calle, 'altura': altura}
+    if not all(str(v or '').strip() for v in direccion.values()):
+        return None
+    clave = _clave(tabla, id_fila)
+    with _lock:
+        futuro = _executor.submit(_geocodificar_y_guardar, tabla, clave[1], direccion)
+        _pendientes[clave] = futuro
+
+    def _terminar(terminado):
+        with _lock:
+            if _pendientes.get(clave) is terminado:
+                del _pendientes[clave]
+
+    futuro.add_done_callback(_terminar)
+    return futuro
+
+
+def esperar_coordenadas(tabla, id_fila, timeout=GEOCODIFICACION_ESPERA):
+    """
+    Espera la geocodificación encolada de una fila.
+
+    Returns:
+        tuple: (latitud, longitud), o None si no hay una pendiente o no terminó a tiempo
+    """
+    with _lock:
+        futuro = _pendientes.get(_clave(tabla, id_fila))
+    if futuro is None:
+        return None
+    try:
+        lat, lon = futuro.result(timeout=timeout)
+    except TimeoutError:
+        return None
+    return (lat, lon) if lat and lon else None
@@ -0,0 +1,212 @@
+"""
+Geocodifica en lote los hospitales y pacientes que todavía no tienen coordenadas.
+
+Recorre las filas con latitud/longitud NULL con un cursor del servidor (sin
+traerlas todas a memoria), geocodifica una sola vez cada dirección repetida y
+guarda las coordenadas con UPDATE en lotes (execute_values). Al terminar cada
+lote escribe un archivo de checkpoint con el último id procesado por tabla,
+así el proceso se puede interrumpir y retomar. Las filas cuya geocodificación
+falló (timeout, sin turno, proveedores caídos) quedan en el checkpoint y se
+reintentan al comienzo de la ejecución siguiente; las que el geocodificador no
+encontró no se reintentan. Tras --fallas-seguidas fallas consecutivas la
+ejecución se detiene.
+
+Las consultas a Nominatim usan el limitador compartido con la aplicación
+(limitador_utils) con prioridad de lote: ceden el turno a las búsquedas y
+esperan sin límite. --intervalo agrega una pausa mínima propia entre consultas.
+Con GEOCODER_BACKEND=fixture no se usa la red.
+
+Uso:
+    python geocodificar_pendientes.py --tablas hospital paciente --lote 500
+    GEOCODER_BACKEND=fixture python geocodificar_pendientes.py --reiniciar
+"""
+import argparse
+import json
+import os
+import time
+from contextlib import closing
+
+from psycopg2.extras import execute_values
+
+import functions as f
+import geo_utils
+import geocodificacion_utils
+import limitador_utils
+
+ARCHIVO_CHECKPOINT = "geocodificacion_checkpoint.json"
+
+
+def leer_checkpoint(ruta):
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def guardar_checkpoint(ruta, checkpoint):
+    # Se escribe en un temporal y se reemplaza: un corte no deja el archivo a medias
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(checkpoint, archivo, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+def guardar_lote(conn, tabla, lote):
+    """
+    Guarda las coordenadas de un lote de filas en una sola sentencia. Una fila
+    cuya dirección cambió desde que se leyó no se actualiza.
+
+    Returns:
+        int: filas actualizadas
+    """
+    if not lote:
+        return 0
+    clave = geocodificacion_utils.TABLAS_GEOCODIFICABLES[tabla]
+    with conn.cursor() as cursor:
+        execute_values(cursor, f"""
+            UPDATE {tabla} AS t
+            SET latitud = v.latitud, longitud = v.longitud
+            FROM (VALUES %s) AS v(id, provincia, ciudad, calle, altura, latitud, longitud)
+            WHERE t.{clave} = v.id
+              AND t.provincia = v.provincia AND t.ciudad = v.ciudad
+              AND t.calle = v.calle AND t.altura = v.altura
+              AND (t.latitud IS NULL OR t.longitud IS NULL)
+        """, lote, page_size=len(lote))
+        actualizadas = cursor.rowcount
+    conn.commit()
+    return actualizadas
+
+
+def geocodificar_tabla(tabla, args, checkpoint, resueltas):
+    """
+    Geocodifica las filas sin coordenadas de una tabla: primero las que fallaron
+    en la ejecución anterior y después las siguientes al checkpoint.
+
+    Args:
+        resueltas (dict): {dirección: (latitud, longitud)}, compartido entre tablas
+    """
+    clave = geocodificacion_utils.TABLAS_GEOCODIFICABLES[tabla]
+    estado = checkpoint.setdefault(tabla, {'ultimo_id': None, 'filas': 0, 'actualizadas': 0, 'sin_resultado': 0})
+    # Ids a reintentar, en orden y sin repetir
+    reintentar = dict.fromkeys(estado.get('reintentar', []))
+    estado['reintentar'] = list(reintentar)
+    lectura, escritura = f.connect_to_supabase(), f.connect_to_supabase()
+    if not lectura or not escritura:
+        raise RuntimeError("No se pudo conectar a la base de datos")
+
+    columnas = f"{clave}, provincia, ciudad, calle, altura"
+
+    def filas():
+        """(es_reintento, fila): las fallas anteriores y después el recorrido por id"""
+        if reintentar:
+            with lectura.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {columnas} FROM {tabla}
+                    WHERE {clave} = ANY(%(ids)s) AND (latitud IS NULL OR longitud IS NULL)
+                    ORDER BY {clave}
+                """, {'ids': list(reintentar)})
+                pendientes = cursor.fetchall()
+            # Las que ya tienen coordenadas o no existen no necesitan reintento
+            reintentar.clear()
+            reintentar.update(dict.fromkeys(fila[0] for fila in pendientes))
+            for fila in pendientes:
+                yield True, fila
+        # Cursor con nombre: las filas llegan de a --lote desde el servidor
+        with lectura.cursor(name=f"geocodificar_{tabla}") as cursor:
+            cursor.itersize = args.lote
+            cursor.execute(f"""
+                SELECT {columnas}
+                FROM {tabla}
+                WHERE (latitud IS NULL OR longitud IS NULL)
+                  AND (%(desde)s::bigint IS NULL OR {clave} > %(desde)s::bigint)
+                ORDER BY {clave}
+            """, {'desde': estado['ultimo_id']})
+            for fila in cursor:
+                yield False, fila
+
+    def guardar(lote):
+        estado['actualizadas'] += guardar_lote(escritura, tabla, lote)
+        estado['reintentar'] = list(reintentar)
+        guardar_checkpoint(args.checkpoint, checkpoint)
+
+    ultima_consulta = 0.0
+    try:
+        with closing(filas()) as recorrido:
+            lote, procesadas, fallas_seguidas = [], 0, 0
+            for es_reintento, (id_fila, provincia, ciudad, calle, altura) in recorrido:
+                direccion = geocodificacion_utils.direccion_geocodificable(provincia, ciudad, calle, altura)
+                coords = resueltas.get(direccion)
+                if coords is None:
+                    espera = args.intervalo - (time.monotonic() - ultima_consulta)
+                    if espera > 0:
+                        time.sleep(espera)
+                    ultima_consulta = time.monotonic()
+                    try:
+                        coords = resueltas[direccion] = geo_utils.geocode_address(
+                            direccion, prioridad=limitador_utils.LOTE, espera_maxima=None, omitir_fallas=False
+                        )
+                        fallas_seguidas = 0
+                    except Exception as e:
+                        # Falla transitoria: no se recuerda la dirección y la fila se reintenta
+                        print(f"Error geocodificando '{direccion}': {e}")
+                        fallas_seguidas += 1
+                lat, lon = coords or (None, None)
+                if coords is None:
+                    reintentar[id_fila] = None
+                else:
+                    reintentar.pop(id_fila, None)
+                    if lat and lon:
+                        lote.append((id_fila, provincia, ciudad, calle, altura, lat, lon))
+                    else:
+                        estado['sin_resultado'] += 1
+                if not es_reintento:
+                    estado['filas'] += 1
+                    estado['ultimo_id'] = id_fila
+                procesadas += 1
+
+                if procesadas % args.lote == 0:
+                    guardar(lote)
+                    lote = []
+                    print(f"{tabla}: {estado['filas']} filas, {estado['actualizadas']} actualizadas, "
+                          f"{len(reintentar)} para reintentar, {len(resueltas)} direcciones distintas")
+                if args.fallas_seguidas and fallas_seguidas >= args.fallas_seguidas:
+                    print(f"{tabla}: {fallas_seguidas} fallas seguidas del geocodificador, se detiene la ejecución")
+                    break
+                if args.limite and procesadas >= args.limite:
+                    break
+
+            guardar(lote)
+    finally:
+        lectura.close()
+        escritura.close()
+    return estado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geocodificación en lote de hospitales y pacientes sin coordenadas")
+    parser.add_argument("--tablas", nargs="+", choices=list(geocodificacion_utils.TABLAS_GEOCODIFICABLES),
+                        default=['hospital', 'paciente'])
+    parser.add_argument("--lote", type=int, default=500, help="Filas por lectura y por UPDATE")
+    parser.add_argument("--intervalo", type=float, default=0.0,
+                        help="Pausa mínima propia entre consultas al geocodificador (s)")
+    parser.add_argument("--limite", type=int, help="Filas máximas a procesar por tabla en esta ejecución")
+    parser.add_argument("--fallas-seguidas", type=int, default=20,
+                        help="Fallas consecutivas del geocodificador tras las que se detiene (0: no se detiene)")
+    parser.add_argument("--checkpoint", default=ARCHIVO_CHECKPOINT)
+    parser.add_argument("--reiniciar", action="store_true", help="Ignora el checkpoint y empieza desde el principio")
+    args = parser.parse_args()
+
+    checkpoint = {} if args.reiniciar else leer_checkpoint(args.checkpoint)
+    if args.reiniciar:
+        guardar_checkpoint(args.checkpoint, checkpoint)
+    resueltas = {}
+    inicio = time.perf_counter()
+    for tabla in args.tablas:
+        estado = geocodificar_tabla(tabla, args, checkpoint, resueltas)
+        print(f"{tabla}: {estado['filas']} filas procesadas, {estado['actualizadas']} actualizadas, "
+              f"{estado['sin_resultado']} sin resultado, {len(estado['reintentar'])} para reintentar")
+    print(f"{len(resueltas)} direcciones geocodificadas en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
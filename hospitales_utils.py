@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+import unicodedata
+
+# Segundos que el directorio compartido se considera vigente antes de recargarlo.
+# Los cambios hechos desde este proceso lo invalidan de inmediato.
+DIRECTORIO_TTL = float(os.getenv("HOSPITALES_DIRECTORIO_TTL", 300))
+TAMAÑO_NGRAMA = 3
+SIMILITUD_MINIMA = 0.5
+
+
+def normalizar_nombre(texto):
+    """Minúsculas, sin tildes y con espacios simples"""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def ngramas(texto, n=TAMAÑO_NGRAMA):
+    """N-gramas de caracteres con relleno, como pg_trgm"""
+    ngr = set()
+    for palabra in texto.split():
+        relleno = f"  {palabra} "
+        for i in range(len(relleno) - n + 1):
+            ngr.add(relleno[i:i + n])
+    return ngr
+
+
+class DirectorioHospitales:
+    """
+    Directorio en memoria de hospitales para autocompletar sin consultar Postgres.
+    Usa un trie de prefijos por palabra y un índice de n-gramas para tolerar errores de tipeo.
+    """
+
+    def __init__(self, hospitales):
+        self.hospitales = {h['id_hospital']: h for h in hospitales}
+        self._ordenados = sorted(hospitales, key=lambda h: normalizar_nombre(h['desc_hospital']))
+        self._por_nombre = {}
+        self._trie = {}
+        self._ngramas = {}
+        self._ngramas_por_id = {}
+        for h in hospitales:
+            self._indexar(h)
+
+    def _indexar(self, hospital):
+        id_hospital = hospital['id_hospital']
+        nombre = normalizar_nombre(hospital['desc_hospital'])
+        self._por_nombre.setdefault(nombre, hospital)
+
+        # Trie: cada nodo guarda los ids de los hospitales con alguna palabra con ese prefijo
+        palabras = nombre.split()
+        for inicio in range(len(palabras)):
+            nodo = self._trie
+            for caracter in ' '.join(palabras[inicio:]):
+                nodo = nodo.setdefault(caracter, {'ids': set()})
+                nodo['ids'].add(id_hospital)
+
+        ngr = ngramas(nombre)
+        self._ngramas_por_id[id_hospital] = ngr
+        for g in ngr:
+            self._ngramas.setdefault(g, set()).add(id_hospital)
+
+    def listar(self):
+        """Todos los hospitales ordenados por nombre"""
+        return list(self._ordenados)
+
+    def buscar_exacto(self, nombre):
+        """Hospital con ese nombre exacto (sin distinguir mayúsculas ni tildes) o None"""
+        return self._por_nombre.get(normalizar_nombre(nombre))
+
+    def _por_prefijo(self, termino):
+        nodo = self._trie
+        for caracter in termino:
+            nodo = nodo.get(caracter)
+            if nodo is None:
+                return set()
+        return nodo['ids']
+
+    def _similares(self, termino, excluir):
+        ngr_termino = ngramas(termino)
+        if not ngr_termino:
+            return []
+        coincidencias = {}
+        for g in ngr_termino:
+            for id_hospital in self._ngramas.get(g, ()):
+                if id_hospital not in excluir:
+                    coincidencias[id_hospital] = coincidencias.get(id_hospital, 0) + 1
+        puntajes = []
+        for id_hospital, comunes in coincidencias.items():
+            # Fracción de los n-gramas del término presentes en el nombre (como word_similarity)
+            similitud = comunes / len(ngr_termino)
+            if similitud >= SIMILITUD_MINIMA:
+                puntajes.append((similitud, id_hospital))
+        puntajes.sort(key=lambda p: (-p[0], normalizar_nombre(self.hospitales[p[1]]['desc_hospital'])))
+        return [id_hospital for _, id_hospital in puntajes]
+
+    def sugerir(self, termino, limite=5):
+        """
+        Sugerencias para autocompletar: primero coincidencias por prefijo,
+        después nombres parecidos por n-gramas
+        """
+        termino = normalizar_nombre(termino)
+        if not termino:
+            return []
+        prefijo = sorted(self._por_prefijo(termino), key=lambda i: normalizar_nombre(self.hospitales[i]['desc_hospital']))
+        ids = prefijo[:limite]
+        if len(ids) < limite:
+            ids += self._similares(termino, set(ids))[:limite - len(ids)]
+        return [self.hospitales[i] for i in ids]
+
+
+# Búsqueda en la base con pg_trgm: usa el índice GIN sobre lower(desc_hospital)
+# y ordena por similitud. El operador % se escribe %% por los parámetros de psycopg2.
+SQL_SIMILARES_TRIGRAMAS = """
+    SELECT h.*, similarity(lower(h.desc_hospital), lower(%(termino)s)) AS similitud
+    FROM hospital h
+    WHERE lower(h.desc_hospital) %% lower(%(termino)s)
+       OR lower(h.desc_hospital) LIKE lower(%(contiene)s)
+    ORDER BY similitud DESC, h.desc_hospital
+    LIMIT %(limite)s
+"""
+
+# Modo sin pg_trgm: primero los nombres que empiezan con el término
+# (índice text_pattern_ops) y después los que lo contienen
+SQL_SIMILARES_SIN_TRIGRAMAS = """
+    SELECT h.*, (lower(h.desc_hospital) LIKE lower(%(prefijo)s))::int AS similitud
+    FROM hospital h
+    WHERE lower(h.desc_hospital) LIKE lower(%(contiene)s)
+    ORDER BY similitud DESC, h.desc_hospital
+    LIMIT %(limite)s
+"""
+
+SQL_POR_NOMBRE = "SELECT * FROM hospital WHERE lower(desc_hospital) = lower(%s) LIMIT 1"
+
+
+def _escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def buscar_similares(cursor, termino, limite=5, usar_trigramas=False):
+    """
+    Busca hospitales por nombre aproximado ordenados por similitud.
+
+    Returns:
+        list: hospitales (dicts) con la columna adicional 'similitud'
+    """
+    termino = termino.strip()
+    escapado = _escapar_like(termino)
+    params = {
+        'termino': termino,
+        'prefijo': f"{escapado}%",
+        'contiene': f"%{escapado}%",
+        'limite': limite,
+    }
+    cursor.execute(SQL_SIMILARES_TRIGRAMAS if usar_trigramas else SQL_SIMILARES_SIN_TRIGRAMAS, params)
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+_directorio = None
+_cargado_en = 0.0
+_lock = threading.Lock()
+
+
+def obtener_directorio(cargar_hospitales):
+    """
+    Retorna el directorio compartido por todas las sesiones del proceso.
+
+    Args:
+        cargar_hospitales (callable): función que retorna la lista de hospitales (dicts)
+    """
+    global _directorio, _cargado_en
+    with _lock:
+        if _directorio is None or time.monotonic() - _cargado_en > DIRECTORIO_TTL:
+            hospitales = cargar_hospitales()
+            if not hospitales:
+                # No guardar un directorio vacío por un error de conexión
+                return DirectorioHospitales([])
+            _directorio = DirectorioHospitales(hospitales)
+            _cargado_en = time.monotonic()
+        return _directorio
+
+
+def invalidar_directorio():
+    """Fuerza la recarga del directorio en el próximo acceso (alta o cambio de hospital)"""
+    global _directorio
+    with _lock:
+        _directorio = None
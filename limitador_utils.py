@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock el límite solo es exacto dentro del proceso
+    fcntl = None
+
+# Prioridades: las consultas interactivas (búsquedas) pasan antes que las de lote (backfill)
+INTERACTIVA = "interactiva"
+LOTE = "lote"
+
+
+class EsperaExcedida(Exception):
+    """No hubo un token disponible dentro de la espera máxima"""
+
+
+class LimitadorTokens:
+    """
+    Token bucket compartido por todos los hilos y procesos de la máquina. El
+    estado vive en un archivo JSON protegido con un lock de archivo (flock).
+
+    Mientras haya una consulta interactiva esperando, las de lote no toman
+    tokens: así el backfill no agrega demora a las búsquedas.
+    """
+
+    def __init__(self, ruta, tasa=1.0, capacidad=1.0, sondeo=0.05):
+        self.ruta = ruta
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.sondeo = sondeo
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _estado(self):
+        """Lee el estado con el lock tomado y lo guarda al salir"""
+        with self._lock, open(f"{self.ruta}.lock", "a") as archivo_lock:
+            if fcntl:
+                fcntl.flock(archivo_lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.ruta, encoding="utf-8") as archivo:
+                        estado = json.load(archivo)
+                except (OSError, ValueError):
+                    estado = {'tokens': self.capacidad, 'actualizado': time.time(), 'esperando': {}}
+                ahora = time.time()
+                estado['tokens'] = min(self.capacidad, estado['tokens'] + max(0.0, ahora - estado['actualizado']) * self.tasa)
+                estado['actualizado'] = ahora
+                # Esperas de procesos que terminaron o se rindieron
+                estado['esperando'] = {k: v for k, v in estado['esperando'].items() if v > ahora}
+                yield estado
+                with open(self.ruta, "w", encoding="utf-8") as archivo:
+                    json.dump(estado, archivo)
+            finally:
+                if fcntl:
+                    fcntl.flock(archivo_lock, fcntl.LOCK_UN)
+
+    def adquirir(self, prioridad=INTERACTIVA, espera_maxima=None):
+        """
+        Toma un token, esperando hasta espera_maxima segundos (None: sin límite).
+
+        Returns:
+            bool: True si se obtuvo el token a tiempo
+        """
+        vence = None if espera_maxima is None else time.time() + espera_maxima
+        id_espera = uuid.uuid4().hex
+        while True:
+            with self._estado() as estado:
+                puede_tomar = prioridad == INTERACTIVA or not estado['esperando']
+                if puede_tomar and estado['tokens'] >= 1:
+                    estado['tokens'] -= 1
+                    estado['esperando'].pop(id_espera, None)
+                    return True
+                if prioridad == INTERACTIVA:
+                    espera = (1 - estado['tokens']) / self.tasa
+                    # Se renueva en cada vuelta; si el proceso muere, vence solo
+                    estado['esperando'][id_espera] = time.time() + espera + 1
+                else:
+                    espera = max((1 - estado['tokens']) / self.tasa, self.sondeo)
+            if vence is not None and time.time() + espera > vence:
+                with self._estado() as estado:
+                    estado['esperando'].pop(id_espera, None)
+                return False
+            time.sleep(max(espera, 0.001))
+
+
+# Límite de Nominatim: una consulta por segundo entre todos los procesos
+GEOCODER_TASA = float(os.getenv("GEOCODER_TASA", 1))
+GEOCODER_RAFAGA = float(os.getenv("GEOCODER_RAFAGA", 1))
+GEOCODER_LIMITE_ARCHIVO = os.getenv(
+    "GEOCODER_LIMITE_ARCHIVO", os.path.join(tempfile.gettempdir(), "infomed_geocoder_limite.json")
+)
+# Espera máxima por defecto de una consulta interactiva
+GEOCODER_ESPERA_MAXIMA = float(os.getenv("GEOCODER_ESPERA_MAXIMA", 10))
+
+_limitador_geocoder = None
+_lock = threading.Lock()
+
+
+def limitador_geocoder():
+    """Limitador del geocodificador, compartido por el proceso"""
+    global _limitador_geocoder
+    with _lock:
+        if _limitador_geocoder is None:
+            _limitador_geocoder = LimitadorTokens(GEOCODER_LIMITE_ARCHIVO, GEOCODER_TASA, GEOCODER_RAFAGA)
+        return _limitador_geocoder
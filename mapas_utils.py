@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+# folium y pydeck se importan recién cuando hay un mapa para dibujar,
+# así los reruns que no muestran mapas no pagan su carga
+
+# "folium" dibuja el mapa interactivo de siempre; "liviano" usa st.pydeck_chart
+# con una capa de puntos, mucho más chica para el caso de mostrar pocos marcadores
+MAPA_MODO = os.getenv("MAPA_MODO", "folium")
+# Mapas ya renderizados que se guardan por proceso, compartidos entre sesiones
+MAPAS_CACHE_MAX = int(os.getenv("MAPAS_CACHE_MAX", 256))
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def construir_mapa(lat_pac, lon_pac, marcadores, zoom_start=13):
+    """
+    Mapa con la ubicación del paciente y un marcador por hospital.
+
+    Args:
+        marcadores (list): dicts con 'latitud', 'longitud', 'tooltip' y 'popup'
+    """
+    import folium
+    m = folium.Map(location=[lat_pac, lon_pac], zoom_start=zoom_start)
+    folium.Marker([lat_pac, lon_pac], tooltip="Tu casa", icon=folium.Icon(color="blue")).add_to(m)
+    for marcador in marcadores:
+        folium.Marker(
+            [marcador['latitud'], marcador['longitud']],
+            tooltip=marcador['tooltip'],
+            popup=folium.Popup(marcador['popup'], max_width=400),
+            icon=folium.Icon(color="red")
+        ).add_to(m)
+    return m
+
+
+def construir_mapa_liviano(lat_pac, lon_pac, marcadores, zoom=12):
+    """Mapa de pydeck con un punto por marcador: sin el HTML y JS de folium"""
+    import pydeck as pdk
+    puntos = [{'latitud': lat_pac, 'longitud': lon_pac, 'tooltip': "Tu casa", 'popup': "", 'color': [25, 118, 210]}]
+    puntos += [dict(marcador, color=[211, 47, 47]) for marcador in marcadores]
+    capa = pdk.Layer(
+        "ScatterplotLayer",
+        data=puntos,
+        get_position="[longitud, latitud]",
+        get_fill_color="color",
+        get_radius=120,
+        radius_min_pixels=6,
+        pickable=True,
+    )
+    return pdk.Deck(
+        layers=[capa],
+        initial_view_state=pdk.ViewState(latitude=lat_pac, longitude=lon_pac, zoom=zoom),
+        tooltip={'html': "<b>{tooltip}</b><br>{popup}"},
+    )
+
+
+def clave_mapa(lat_pac, lon_pac, marcadores):
+    """Clave por contenido: ubicación del paciente y marcadores, en orden"""
+    contenido = [
+        round(float(lat_pac), 6), round(float(lon_pac), 6),
+        [(round(float(m['latitud']), 6), round(float(m['longitud']), 6), str(m['tooltip']), str(m['popup']))
+         for m in marcadores],
+    ]
+    return hashlib.sha1(json.dumps(contenido, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _desde_cache(clave, construir):
+    with _lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+    valor = construir()
+    with _lock:
+        _cache[clave] = valor
+        while len(_cache) > MAPAS_CACHE_MAX:
+            _cache.popitem(last=False)
+    return valor
+
+
+def mostrar_mapa(lat_pac, lon_pac, marcadores, width=700, height=400, modo=None):
+    """
+    Dibuja el mapa de resultados en la página. El mapa renderizado se reutiliza
+    mientras la ubicación y los resultados sean los mismos.
+    """
+    modo = modo or MAPA_MODO
+    clave = (modo, clave_mapa(lat_pac, lon_pac, marcadores))
+    if modo == "liviano":
+        deck = _desde_cache(clave, lambda: construir_mapa_liviano(float(lat_pac), float(lon_pac), marcadores))
+        st.pydeck_chart(deck, height=height)
+    else:
+        import streamlit.components.v1 as components
+        # HTML estático: no hay ida y vuelta con el servidor al mover o hacer zoom
+        html = _desde_cache(clave, lambda: construir_mapa(lat_pac, lon_pac, marcadores).get_root().render())
+        components.html(html, width=width, height=height)
+
+
+def marcadores_desde_filas(filas, columna_nombre, limite=5):
+    """Marcadores de los primeros hospitales con coordenadas de un DataFrame ordenado"""
+    marcadores = []
+    for _, row in filas.head(limite).iterrows():
+        if row['latitud'] and row['longitud']:
+            marcadores.append({
+                'latitud': float(row['latitud']),
+                'longitud': float(row['longitud']),
+                'tooltip': row[columna_nombre],
+                'popup': f"{row['ciudad']}<br>{row['calle']} {row['altura']}",
+            })
+    return marcadores
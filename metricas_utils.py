@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+import psycopg2.extensions
+
+# Umbral (ms) a partir del cual una consulta se escribe en el log de consultas lentas
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "slow_queries.log")
+# Cantidad de duraciones recientes que se guardan por consulta para los percentiles
+MUESTRAS_POR_CONSULTA = 1000
+# Cantidad máxima de pares (consulta, origen) en memoria; se descartan los menos usados recientemente
+METRICAS_MAX = int(os.getenv("METRICAS_MAX", 500))
+
+_DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+# Frames que no cuentan como origen: este módulo, los helpers de consultas y el driver
+_ARCHIVOS_IGNORADOS = (
+    os.path.abspath(__file__),
+    os.path.join(_DIRECTORIO, "functions.py"),
+    os.path.join(_DIRECTORIO, "coalescencia_utils.py"),
+    os.sep + "psycopg2" + os.sep,
+    os.sep + "pandas" + os.sep,
+)
+
+_metricas = OrderedDict()
+_lock = threading.Lock()
+
+_log_lentas = logging.getLogger("infomed.consultas_lentas")
+if not _log_lentas.handlers:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8", delay=True)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _log_lentas.addHandler(_handler)
+    _log_lentas.setLevel(logging.INFO)
+    _log_lentas.propagate = False
+
+
+def _normalizar_consulta(query):
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    return " ".join(str(query).split())
+
+
+def _origen():
+    """Página y función que originó la consulta (primer frame fuera de los helpers y el driver)"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        archivo = os.path.abspath(frame.f_code.co_filename)
+        if not any(ignorado in archivo for ignorado in _ARCHIVOS_IGNORADOS):
+            return f"{os.path.basename(archivo)}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "desconocido"
+
+
+def _tamaño_filas(filas):
+    """Estimación de los bytes recibidos: largo de textos y binarios, 8 bytes para el resto"""
+    total = 0
+    for fila in filas:
+        for valor in fila:
+            if isinstance(valor, (str, bytes, memoryview)):
+                total += len(valor)
+            elif valor is not None:
+                total += 8
+    return total
+
+
+def registrar_consulta(query, origen, duracion_ms, filas, error=None):
+    """Agrega una ejecución a las métricas en memoria y al log de consultas lentas"""
+    consulta = _normalizar_consulta(query)
+    clave = (consulta, origen)
+    with _lock:
+        metrica = _metricas.get(clave)
+        if metrica is None:
+            metrica = _metricas[clave] = {
+                'consulta': consulta,
+                'origen': origen,
+                'ejecuciones': 0,
+                'errores': 0,
+                'tiempo_total_ms': 0.0,
+                'filas': 0,
+                'bytes': 0,
+                'lentas': 0,
+                'duraciones': deque(maxlen=MUESTRAS_POR_CONSULTA),
+            }
+            while len(_metricas) > METRICAS_MAX:
+                _metricas.popitem(last=False)
+        else:
+            _metricas.move_to_end(clave)
+        metrica['ejecuciones'] += 1
+        metrica['tiempo_total_ms'] += duracion_ms
+        metrica['filas'] += max(filas, 0)
+        metrica['duraciones'].append(duracion_ms)
+        if error is not None:
+            metrica['errores'] += 1
+        lenta = duracion_ms >= SLOW_QUERY_MS
+        if lenta:
+            metrica['lentas'] += 1
+
+    if lenta:
+        _log_lentas.info(json.dumps({
+            'ts': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'duracion_ms': round(duracion_ms, 2),
+            'filas': filas,
+            'origen': origen,
+            'consulta': consulta,
+            'error': error,
+        }, ensure_ascii=False))
+    return clave
+
+
+def _sumar_bytes(clave, cantidad):
+    with _lock:
+        metrica = _metricas.get(clave)
+        if metrica is not None:
+            metrica['bytes'] += cantidad
+
+
+class CursorInstrumentado(psycopg2.extensions.cursor):
+    """
+    Cursor de psycopg2 que mide cada consulta: tiempo, filas, bytes recibidos
+    y la página/función que la ejecutó. Se activa con cursor_factory al conectar.
+    """
+
+    _clave_metrica = None
+
+    def execute(self, query, vars=None):
+        origen = _origen()
+        inicio = time.perf_counter()
+        try:
+            resultado = super().execute(query, vars)
+        except Exception as e:
+            registrar_consulta(query, origen, (time.perf_counter() - inicio) * 1000, 0, error=str(e).strip())
+            raise
+        self._clave_metrica = registrar_consulta(query, origen, (time.perf_counter() - inicio) * 1000, self.rowcount)
+        return resultado
+
+    def fetchone(self):
+        fila = super().fetchone()
+        if fila is not None and self._clave_metrica:
+            _sumar_bytes(self._clave_metrica, _tamaño_filas([fila]))
+        return fila
+
+    def fetchmany(self, size=None):
+        filas = super().fetchmany(size) if size is not None else super().fetchmany()
+        if self._clave_metrica:
+            _sumar_bytes(self._clave_metrica, _tamaño_filas(filas))
+        return filas
+
+    def fetchall(self):
+        filas = super().fetchall()
+        if self._clave_metrica:
+            _sumar_bytes(self._clave_metrica, _tamaño_filas(filas))
+        return filas
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def obtener_resumen():
+    """
+    Métricas agregadas por consulta y origen, ordenadas por tiempo total.
+
+    Returns:
+        list: dicts con ejecuciones, errores, filas, bytes, p50/p95/p99 y tiempo total
+    """
+    with _lock:
+        copias = [dict(m, duraciones=sorted(m['duraciones'])) for m in _metricas.values()]
+    resumen = []
+    for m in copias:
+        duraciones = m.pop('duraciones')
+        m['p50_ms'] = round(_percentil(duraciones, 50), 2)
+        m['p95_ms'] = round(_percentil(duraciones, 95), 2)
+        m['p99_ms'] = round(_percentil(duraciones, 99), 2)
+        m['tiempo_total_ms'] = round(m['tiempo_total_ms'], 2)
+        resumen.append(m)
+    resumen.sort(key=lambda m: m['tiempo_total_ms'], reverse=True)
+    return resumen
+
+
+def leer_consultas_lentas(limite=100):
+    """Últimas entradas del log de consultas lentas"""
+    if not os.path.exists(SLOW_QUERY_LOG):
+        return []
+    with open(SLOW_QUERY_LOG, encoding="utf-8") as archivo:
+        lineas = deque(archivo, maxlen=limite)
+    entradas = []
+    for linea in reversed(lineas):
+        try:
+            entradas.append(json.loads(linea))
+        except ValueError:
+            continue
+    return entradas
+
+
+def reiniciar_metricas():
+    """Borra las métricas acumuladas en memoria"""
+    with _lock:
+        _metricas.clear()
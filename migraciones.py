@@ -0,0 +1,112 @@
+import os
+import threading
+
+# Archivos .sql que se aplican en orden alfabético, una sola vez cada uno
+DIRECTORIO_MIGRACIONES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+_capacidades = None
+_lock = threading.Lock()
+
+
+def listar_migraciones():
+    """Retorna (nombre, ruta) de cada migración en orden de aplicación"""
+    if not os.path.isdir(DIRECTORIO_MIGRACIONES):
+        return []
+    return [
+        (nombre, os.path.join(DIRECTORIO_MIGRACIONES, nombre))
+        for nombre in sorted(os.listdir(DIRECTORIO_MIGRACIONES))
+        if nombre.endswith(".sql")
+    ]
+
+
+def aplicar_migraciones(conn):
+    """
+    Aplica las migraciones pendientes, cada una en su propia transacción.
+    Una migración que falla (por ejemplo, una extensión no disponible) se
+    revierte y se reintenta en el próximo arranque sin bloquear a las demás.
+
+    Returns:
+        dict: {'aplicadas': [...], 'fallidas': [...]}
+    """
+    resultado = {'aplicadas': [], 'fallidas': []}
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migraciones (
+                nombre text PRIMARY KEY,
+                aplicada_en timestamptz NOT NULL DEFAULT now()
+            )
+        """)
+    conn.commit()
+
+    for nombre, ruta in listar_migraciones():
+        try:
+            with conn.cursor() as cursor:
+                # Evita que dos procesos apliquen la misma migración a la vez
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migraciones'))")
+                cursor.execute("SELECT 1 FROM schema_migraciones WHERE nombre = %s", (nombre,))
+                if cursor.fetchone():
+                    conn.rollback()
+                    continue
+                with open(ruta, encoding="utf-8") as archivo:
+                    cursor.execute(archivo.read())
+                cursor.execute("INSERT INTO schema_migraciones (nombre) VALUES (%s)", (nombre,))
+            conn.commit()
+            resultado['aplicadas'].append(nombre)
+            print(f"Migración aplicada: {nombre}")
+        except Exception as e:
+            conn.rollback()
+            resultado['fallidas'].append(nombre)
+            print(f"Error aplicando la migración {nombre}: {e}")
+    return resultado
+
+
+def detectar_capacidades(conn):
+    """Detecta qué funcionalidades opcionales ofrece la base"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        pg_trgm = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT column_default
+            FROM information_schema.columns
+            WHERE table_name = 'hospital' AND column_name = 'id_hospital'
+        """)
+        default_info = cursor.fetchone()
+        secuencia_hospital = bool(default_info and default_info[0] and 'nextval' in str(default_info[0]))
+    return {'pg_trgm': pg_trgm, 'secuencia_hospital': secuencia_hospital}
+
+
+def obtener_capacidades(conectar, tareas_iniciales=()):
+    """
+    Aplica las migraciones y detecta las capacidades del esquema una sola vez
+    por proceso. Si no hay conexión no se guarda nada y se reintenta luego.
+
+    Args:
+        conectar (callable): función que retorna una conexión psycopg2 o None
+        tareas_iniciales (iterable): funciones de migración adicionales que se
+            ejecutan después de los archivos .sql y antes de detectar capacidades
+    """
+    global _capacidades
+    with _lock:
+        if _capacidades is not None:
+            return _capacidades
+        conn = conectar()
+        if not conn:
+            return capacidades_por_defecto()
+        try:
+            aplicar_migraciones(conn)
+            for tarea in tareas_iniciales:
+                resultado = tarea()
+                if isinstance(resultado, dict) and not resultado.get('success', True):
+                    print(f"Error en la migración {tarea.__name__}: {resultado.get('error')}")
+            _capacidades = detectar_capacidades(conn)
+            return _capacidades
+        except Exception as e:
+            print(f"Error detectando capacidades del esquema: {e}")
+            return capacidades_por_defecto()
+        finally:
+            conn.close()
+
+
+def capacidades_por_defecto():
+    """Capacidades asumidas cuando no se pudo inspeccionar la base"""
+    return {'pg_trgm': False, 'secuencia_hospital': False}
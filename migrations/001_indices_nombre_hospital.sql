@@ -0,0 +1,8 @@
+-- Índices funcionales para buscar hospitales por nombre sin distinguir mayúsculas.
+-- El primero resuelve la igualdad exacta de buscar_hospital_por_nombre y el
+-- segundo las búsquedas por prefijo (LIKE 'texto%') cuando no hay pg_trgm.
+CREATE INDEX IF NOT EXISTS idx_hospital_desc_lower
+    ON hospital (lower(desc_hospital));
+
+CREATE INDEX IF NOT EXISTS idx_hospital_desc_lower_patron
+    ON hospital (lower(desc_hospital) text_pattern_ops);
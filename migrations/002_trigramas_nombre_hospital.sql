@@ -0,0 +1,8 @@
+-- Búsqueda difusa de hospitales con pg_trgm.
+-- El índice GIN acelera tanto el operador de similitud (%) como LIKE '%texto%'.
+-- Si la extensión no está disponible esta migración falla y la aplicación
+-- usa el modo de búsqueda sin trigramas.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_hospital_desc_trgm
+    ON hospital USING gin (lower(desc_hospital) gin_trgm_ops);
@@ -0,0 +1,7 @@
+-- Caja envolvente de la búsqueda por cercanía (latitud/longitud BETWEEN ...)
+CREATE INDEX IF NOT EXISTS idx_hospital_latitud_longitud
+    ON hospital (latitud, longitud);
+
+-- Hospitales de una especialidad sin recorrer toda la tabla puente
+CREATE INDEX IF NOT EXISTS idx_hospital_especialidades_especialidad
+    ON hospital_especialidades (id_especialidad, id_hospital);
@@ -0,0 +1,171 @@
+-- Los k hospitales más cercanos de cada especialidad, precalculados por paciente.
+-- La búsqueda por especialidad los lee con la clave primaria.
+CREATE TABLE IF NOT EXISTS paciente_hospitales_cercanos (
+    id_paciente bigint NOT NULL,
+    id_especialidad integer NOT NULL,
+    orden integer NOT NULL,
+    id_hospital integer NOT NULL,
+    distancia_km double precision NOT NULL,
+    PRIMARY KEY (id_paciente, id_especialidad, orden)
+);
+
+CREATE INDEX IF NOT EXISTS idx_paciente_hospitales_cercanos_hospital
+    ON paciente_hospitales_cercanos (id_hospital);
+
+-- Pacientes con listas calculadas, con las coordenadas y el k usados
+CREATE TABLE IF NOT EXISTS paciente_cercanos_calculado (
+    id_paciente bigint PRIMARY KEY,
+    latitud double precision NOT NULL,
+    longitud double precision NOT NULL,
+    k integer NOT NULL,
+    calculado_en timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION distancia_km(lat1 double precision, lon1 double precision,
+                                        lat2 double precision, lon2 double precision)
+RETURNS double precision LANGUAGE sql IMMUTABLE AS $$
+    SELECT 2 * 6371 * asin(least(1, sqrt(
+        power(sin(radians(lat2 - lat1) / 2), 2) +
+        cos(radians(lat1)) * cos(radians(lat2)) * power(sin(radians(lon2 - lon1) / 2), 2)
+    )))
+$$;
+
+-- Recalcula las listas de un paciente: todas, o solo la de una especialidad.
+-- Sin k se usa el de su cálculo anterior.
+CREATE OR REPLACE FUNCTION refrescar_cercanos_paciente(p_id_paciente bigint, p_k integer DEFAULT NULL,
+                                                       p_especialidad integer DEFAULT NULL)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    v_lat double precision;
+    v_lon double precision;
+    v_k integer;
+BEGIN
+    SELECT latitud, longitud INTO v_lat, v_lon FROM paciente WHERE id_paciente = p_id_paciente;
+    SELECT coalesce(p_k, (SELECT k FROM paciente_cercanos_calculado WHERE id_paciente = p_id_paciente), 20) INTO v_k;
+
+    DELETE FROM paciente_hospitales_cercanos
+    WHERE id_paciente = p_id_paciente AND (p_especialidad IS NULL OR id_especialidad = p_especialidad);
+    IF v_lat IS NULL OR v_lon IS NULL THEN
+        DELETE FROM paciente_cercanos_calculado WHERE id_paciente = p_id_paciente;
+        RETURN;
+    END IF;
+
+    INSERT INTO paciente_hospitales_cercanos (id_paciente, id_especialidad, orden, id_hospital, distancia_km)
+    SELECT p_id_paciente, id_especialidad, orden, id_hospital, distancia
+    FROM (
+        SELECT he.id_especialidad, h.id_hospital, d.distancia,
+               row_number() OVER (PARTITION BY he.id_especialidad ORDER BY d.distancia, h.id_hospital) AS orden
+        FROM hospital h
+        INNER JOIN hospital_especialidades he ON he.id_hospital = h.id_hospital
+        CROSS JOIN LATERAL (SELECT distancia_km(v_lat, v_lon, h.latitud, h.longitud) AS distancia) d
+        WHERE h.latitud IS NOT NULL AND h.longitud IS NOT NULL
+          AND (p_especialidad IS NULL OR he.id_especialidad = p_especialidad)
+    ) ranking
+    WHERE orden <= v_k;
+
+    IF p_especialidad IS NULL THEN
+        INSERT INTO paciente_cercanos_calculado (id_paciente, latitud, longitud, k)
+        VALUES (p_id_paciente, v_lat, v_lon, v_k)
+        ON CONFLICT (id_paciente) DO UPDATE
+            SET latitud = EXCLUDED.latitud, longitud = EXCLUDED.longitud, k = EXCLUDED.k, calculado_en = now();
+    END IF;
+END
+$$;
+
+-- Recalcula solo las listas que un cambio del hospital puede alterar: las que
+-- ya lo contienen y aquellas a las que entraría (incompletas o con el último
+-- hospital más lejos que él)
+CREATE OR REPLACE FUNCTION refrescar_cercanos_hospital(p_id_hospital integer, p_especialidades integer[])
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT id_paciente, id_especialidad
+        FROM paciente_hospitales_cercanos
+        WHERE id_hospital = p_id_hospital AND id_especialidad = ANY (p_especialidades)
+        UNION
+        SELECT c.id_paciente, e.id_especialidad
+        FROM paciente_cercanos_calculado c
+        CROSS JOIN unnest(p_especialidades) AS e (id_especialidad)
+        INNER JOIN hospital h ON h.id_hospital = p_id_hospital
+        LEFT JOIN paciente_hospitales_cercanos ultimo
+               ON ultimo.id_paciente = c.id_paciente
+              AND ultimo.id_especialidad = e.id_especialidad
+              AND ultimo.orden = c.k
+        WHERE h.latitud IS NOT NULL AND h.longitud IS NOT NULL
+          AND (ultimo.id_paciente IS NULL
+               OR distancia_km(c.latitud, c.longitud, h.latitud, h.longitud) <= ultimo.distancia_km)
+    LOOP
+        PERFORM refrescar_cercanos_paciente(r.id_paciente, NULL, r.id_especialidad);
+    END LOOP;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION trg_cercanos_hospital() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM refrescar_cercanos_hospital(OLD.id_hospital, ARRAY(
+            SELECT DISTINCT id_especialidad FROM paciente_hospitales_cercanos WHERE id_hospital = OLD.id_hospital
+        ));
+        RETURN OLD;
+    END IF;
+    PERFORM refrescar_cercanos_hospital(NEW.id_hospital, ARRAY(
+        SELECT id_especialidad FROM hospital_especialidades WHERE id_hospital = NEW.id_hospital
+        UNION
+        SELECT id_especialidad FROM paciente_hospitales_cercanos WHERE id_hospital = NEW.id_hospital
+    ));
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION trg_cercanos_hospital_especialidades() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM refrescar_cercanos_hospital(OLD.id_hospital, ARRAY[OLD.id_especialidad]);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refrescar_cercanos_hospital(NEW.id_hospital, ARRAY[NEW.id_especialidad]);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- Un cambio de coordenadas del paciente invalida sus listas; se recalculan al
+-- geocodificar la dirección nueva o en la próxima búsqueda
+CREATE OR REPLACE FUNCTION trg_cercanos_paciente() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM paciente_hospitales_cercanos WHERE id_paciente = OLD.id_paciente;
+    DELETE FROM paciente_cercanos_calculado WHERE id_paciente = OLD.id_paciente;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS cercanos_hospital_coordenadas ON hospital;
+CREATE TRIGGER cercanos_hospital_coordenadas
+    AFTER UPDATE OF latitud, longitud ON hospital
+    FOR EACH ROW
+    WHEN (OLD.latitud IS DISTINCT FROM NEW.latitud OR OLD.longitud IS DISTINCT FROM NEW.longitud)
+    EXECUTE FUNCTION trg_cercanos_hospital();
+
+DROP TRIGGER IF EXISTS cercanos_hospital_baja ON hospital;
+CREATE TRIGGER cercanos_hospital_baja
+    AFTER DELETE ON hospital
+    FOR EACH ROW EXECUTE FUNCTION trg_cercanos_hospital();
+
+DROP TRIGGER IF EXISTS cercanos_hospital_especialidades ON hospital_especialidades;
+CREATE TRIGGER cercanos_hospital_especialidades
+    AFTER INSERT OR UPDATE OR DELETE ON hospital_especialidades
+    FOR EACH ROW EXECUTE FUNCTION trg_cercanos_hospital_especialidades();
+
+DROP TRIGGER IF EXISTS cercanos_paciente_coordenadas ON paciente;
+CREATE TRIGGER cercanos_paciente_coordenadas
+    AFTER UPDATE OF latitud, longitud ON paciente
+    FOR EACH ROW
+    WHEN (OLD.latitud IS DISTINCT FROM NEW.latitud OR OLD.longitud IS DISTINCT FROM NEW.longitud)
+    EXECUTE FUNCTION trg_cercanos_paciente();
+
+DROP TRIGGER IF EXISTS cercanos_paciente_baja ON paciente;
+CREATE TRIGGER cercanos_paciente_baja
+    AFTER DELETE ON paciente
+    FOR EACH ROW EXECUTE FUNCTION trg_cercanos_paciente();
@@ -0,0 +1,35 @@
+-- Contador que cambia con cada escritura en las tablas de las búsquedas. El
+-- cache de resultados compartido entre sesiones (resultados_utils) lo compara
+-- para descartar resultados de datos viejos, también desde otros procesos.
+CREATE TABLE IF NOT EXISTS version_datos_busqueda (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    version bigint NOT NULL DEFAULT 0
+);
+
+INSERT INTO version_datos_busqueda (id, version) VALUES (true, 0)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION trg_version_datos_busqueda() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE version_datos_busqueda SET version = version + 1;
+    RETURN NULL;
+END
+$$;
+
+-- Una vez por sentencia: un UPDATE de muchas filas cuenta como un solo cambio
+DO $$
+DECLARE
+    tabla text;
+BEGIN
+    FOREACH tabla IN ARRAY ARRAY[
+        'hospital', 'especialidades', 'hospital_especialidades', 'sintoma',
+        'patologia', 'patologia_especialidades', 'patologia_hospital'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS version_datos_busqueda ON %I', tabla);
+        EXECUTE format(
+            'CREATE TRIGGER version_datos_busqueda AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION trg_version_datos_busqueda()', tabla
+        );
+    END LOOP;
+END
+$$;
@@ -0,0 +1,132 @@
+-- Las listas de hospitales cercanos guardan solo los hospitales dentro de un
+-- radio (el máximo de la búsqueda). Así una lista incompleta abarca ese radio y
+-- no todo el país, y un cambio de un hospital recalcula solo las listas de los
+-- pacientes a los que llega. Las listas sin radio (de la migración 004) se
+-- recalculan en la próxima búsqueda del paciente.
+ALTER TABLE paciente_cercanos_calculado ADD COLUMN IF NOT EXISTS radio_km double precision;
+
+-- Pacientes cerca de un hospital, para la caja envolvente del trigger, y el
+-- radio más grande, que define esa caja
+CREATE INDEX IF NOT EXISTS idx_paciente_cercanos_calculado_coordenadas
+    ON paciente_cercanos_calculado (latitud, longitud);
+CREATE INDEX IF NOT EXISTS idx_paciente_cercanos_calculado_radio
+    ON paciente_cercanos_calculado (radio_km);
+
+-- La versión anterior no tenía radio; se reemplaza para que las llamadas con
+-- tres argumentos no resulten ambiguas
+DROP FUNCTION IF EXISTS refrescar_cercanos_paciente(bigint, integer, integer);
+
+-- Recalcula las listas de un paciente: todas, o solo la de una especialidad.
+-- Sin k ni radio se usan los de su cálculo anterior. El lock serializa los
+-- recálculos del mismo paciente: sin él, dos recálculos a la vez borran e
+-- insertan la misma lista y uno falla por la clave primaria.
+CREATE FUNCTION refrescar_cercanos_paciente(p_id_paciente bigint, p_k integer DEFAULT NULL,
+                                            p_especialidad integer DEFAULT NULL,
+                                            p_radio_km double precision DEFAULT NULL)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    v_lat double precision;
+    v_lon double precision;
+    v_k integer;
+    v_radio double precision;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('paciente_hospitales_cercanos'), hashint8(p_id_paciente));
+
+    SELECT latitud, longitud INTO v_lat, v_lon FROM paciente WHERE id_paciente = p_id_paciente;
+    SELECT coalesce(p_k, c.k, 20), coalesce(p_radio_km, c.radio_km, 'infinity')
+    INTO v_k, v_radio
+    FROM (SELECT 1) uno
+    LEFT JOIN paciente_cercanos_calculado c ON c.id_paciente = p_id_paciente;
+
+    DELETE FROM paciente_hospitales_cercanos
+    WHERE id_paciente = p_id_paciente AND (p_especialidad IS NULL OR id_especialidad = p_especialidad);
+    IF v_lat IS NULL OR v_lon IS NULL THEN
+        DELETE FROM paciente_cercanos_calculado WHERE id_paciente = p_id_paciente;
+        RETURN;
+    END IF;
+
+    INSERT INTO paciente_hospitales_cercanos (id_paciente, id_especialidad, orden, id_hospital, distancia_km)
+    SELECT p_id_paciente, id_especialidad, orden, id_hospital, distancia
+    FROM (
+        SELECT he.id_especialidad, h.id_hospital, d.distancia,
+               row_number() OVER (PARTITION BY he.id_especialidad ORDER BY d.distancia, h.id_hospital) AS orden
+        FROM hospital h
+        INNER JOIN hospital_especialidades he ON he.id_hospital = h.id_hospital
+        CROSS JOIN LATERAL (SELECT distancia_km(v_lat, v_lon, h.latitud, h.longitud) AS distancia) d
+        WHERE h.latitud IS NOT NULL AND h.longitud IS NOT NULL
+          AND d.distancia <= v_radio
+          AND (p_especialidad IS NULL OR he.id_especialidad = p_especialidad)
+    ) ranking
+    WHERE orden <= v_k;
+
+    IF p_especialidad IS NULL THEN
+        INSERT INTO paciente_cercanos_calculado (id_paciente, latitud, longitud, k, radio_km)
+        VALUES (p_id_paciente, v_lat, v_lon, v_k, v_radio)
+        ON CONFLICT (id_paciente) DO UPDATE
+            SET latitud = EXCLUDED.latitud, longitud = EXCLUDED.longitud, k = EXCLUDED.k,
+                radio_km = EXCLUDED.radio_km, calculado_en = now();
+    END IF;
+END
+$$;
+
+-- Recalcula solo las listas que un cambio del hospital puede alterar: las que
+-- ya lo contienen y aquellas a las que entraría. Una lista completa alcanza
+-- hasta su último hospital y una incompleta hasta el radio del paciente; los
+-- pacientes fuera de la caja envolvente de ese radio no se revisan. Se recorren
+-- en orden de paciente para que dos cambios a la vez tomen los locks en el
+-- mismo orden.
+CREATE OR REPLACE FUNCTION refrescar_cercanos_hospital(p_id_hospital integer, p_especialidades integer[])
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    r record;
+    v_lat double precision;
+    v_lon double precision;
+    v_radio double precision;
+    v_delta_lon double precision;
+BEGIN
+    SELECT latitud, longitud INTO v_lat, v_lon FROM hospital WHERE id_hospital = p_id_hospital;
+    -- Caja envolvente del radio más grande (como busqueda_utils.caja_envolvente);
+    -- si quedan listas sin radio se revisan todos los pacientes
+    IF EXISTS (SELECT 1 FROM paciente_cercanos_calculado WHERE radio_km IS NULL) THEN
+        v_radio := 'infinity';
+    ELSE
+        SELECT max(radio_km) INTO v_radio FROM paciente_cercanos_calculado;
+    END IF;
+    v_delta_lon := CASE
+        WHEN cos(radians(v_lat)) < 1e-6 THEN 180
+        ELSE least(180, v_radio / (111.045 * cos(radians(v_lat))))
+    END;
+
+    FOR r IN
+        SELECT id_paciente, id_especialidad
+        FROM paciente_hospitales_cercanos
+        WHERE id_hospital = p_id_hospital AND id_especialidad = ANY (p_especialidades)
+        UNION
+        SELECT c.id_paciente, e.id_especialidad
+        FROM paciente_cercanos_calculado c
+        CROSS JOIN unnest(p_especialidades) AS e (id_especialidad)
+        LEFT JOIN paciente_hospitales_cercanos ultimo
+               ON ultimo.id_paciente = c.id_paciente
+              AND ultimo.id_especialidad = e.id_especialidad
+              AND ultimo.orden = c.k
+        WHERE v_lat IS NOT NULL AND v_lon IS NOT NULL
+          AND c.latitud BETWEEN v_lat - v_radio / 111.045 AND v_lat + v_radio / 111.045
+          AND (v_delta_lon >= 180 OR c.longitud BETWEEN v_lon - v_delta_lon AND v_lon + v_delta_lon)
+          AND distancia_km(c.latitud, c.longitud, v_lat, v_lon)
+              <= coalesce(ultimo.distancia_km, c.radio_km, 'infinity')
+        ORDER BY 1, 2
+    LOOP
+        PERFORM refrescar_cercanos_paciente(r.id_paciente, NULL, r.id_especialidad);
+    END LOOP;
+END
+$$;
+
+-- Con el mismo lock que los recálculos del paciente
+CREATE OR REPLACE FUNCTION trg_cercanos_paciente() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('paciente_hospitales_cercanos'), hashint8(OLD.id_paciente));
+    DELETE FROM paciente_hospitales_cercanos WHERE id_paciente = OLD.id_paciente;
+    DELETE FROM paciente_cercanos_calculado WHERE id_paciente = OLD.id_paciente;
+    RETURN NULL;
+END
+$$;
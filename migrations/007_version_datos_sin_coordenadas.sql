@@ -0,0 +1,40 @@
+-- Guardar las coordenadas de un hospital (geocodificación en la página o en
+-- segundo plano) ya no cambia la versión de los datos: cada escritura tomaba el
+-- lock de la única fila de version_datos_busqueda, vaciaba el cache de
+-- resultados de todos los procesos y reconstruía el índice de síntomas. Las
+-- búsquedas ubican a los hospitales sin coordenadas, así que un resultado
+-- guardado con coordenadas viejas sigue siendo válido hasta el TTL del cache.
+DROP TRIGGER IF EXISTS version_datos_busqueda ON hospital;
+CREATE TRIGGER version_datos_busqueda
+    AFTER INSERT OR DELETE OR TRUNCATE ON hospital
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_version_datos_busqueda();
+
+DROP TRIGGER IF EXISTS version_datos_busqueda_cambios ON hospital;
+CREATE TRIGGER version_datos_busqueda_cambios
+    AFTER UPDATE OF id_hospital, desc_hospital, provincia, ciudad, calle, altura, telefono ON hospital
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_version_datos_busqueda();
+
+-- Versión propia del índice de síntomas (sintomas_utils), que solo lee sintoma
+-- y patologia: los cambios de hospitales y especialidades no lo reconstruyen
+ALTER TABLE version_datos_busqueda ADD COLUMN IF NOT EXISTS version_sintomas bigint NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION trg_version_datos_sintomas() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE version_datos_busqueda SET version = version + 1, version_sintomas = version_sintomas + 1;
+    RETURN NULL;
+END
+$$;
+
+DO $$
+DECLARE
+    tabla text;
+BEGIN
+    FOREACH tabla IN ARRAY ARRAY['sintoma', 'patologia'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS version_datos_busqueda ON %I', tabla);
+        EXECUTE format(
+            'CREATE TRIGGER version_datos_busqueda AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION trg_version_datos_sintomas()', tabla
+        );
+    END LOOP;
+END
+$$;
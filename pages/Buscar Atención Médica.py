@@ -1,13 +1,18 @@
 import streamlit as st
 import sys
 import os
+import math
 import pandas as pd
-import psycopg2
 from geo_utils import geocode_address, haversine
-import folium
-from streamlit_folium import st_folium
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from functions import execute_query, connect_to_supabase
+from functions import execute_query
+import perfil_utils
+import perfilado_utils
+import busqueda_utils
+import geocodificacion_utils
+import mapas_utils
+import resultados_utils
+import sintomas_utils
 
 
 # --- Page Configuration ---
@@ -16,6 +21,10 @@ st.set_page_config(
     page_icon="🔍",
     layout="wide"
 )
+perfilado_utils.iniciar_rerun("Buscar Atención Médica")
+
+# Cantidad de tarjetas por página en los resultados de búsqueda
+RESULTADOS_POR_PAGINA = int(os.getenv("RESULTADOS_POR_PAGINA", 10))
 
 def solo_paciente_autenticado():
     """
@@ -37,33 +46,110 @@ def solo_paciente_autenticado():
         st.stop()
 
 # --- RESTRICCIÓN DE ACCESO ---
-solo_paciente_autenticado()
+with perfilado_utils.fase("verificación de acceso"):
+    solo_paciente_autenticado()
 
 
 
 def get_or_update_latlon_paciente(paciente_row):
     if paciente_row.get('latitud') and paciente_row.get('longitud'):
         return paciente_row['latitud'], paciente_row['longitud']
-    address = f"{paciente_row['calle']} {paciente_row['altura']}, {paciente_row['ciudad']}, {paciente_row['provincia']}, Argentina"
-    lat, lon = geocode_address(address)
+    # La dirección se geocodifica al registrarse o al cambiarla: esperar esa
+    # geocodificación o leer lo que ya guardó, antes de geocodificar acá
+    coords = geocodificacion_utils.esperar_coordenadas('paciente', paciente_row['id_paciente'])
+    if coords is None:
+        query = "SELECT latitud, longitud FROM paciente WHERE id_paciente = %s AND latitud IS NOT NULL AND longitud IS NOT NULL"
+        # Sin coalescer: una lectura ya en curso pudo empezar antes de que se guardaran
+        df = execute_query(query, params=(paciente_row['id_paciente'],), coalesce=False)
+        if not df.empty:
+            coords = (float(df.iloc[0]['latitud']), float(df.iloc[0]['longitud']))
+    if coords is not None:
+        perfil_utils.actualizar_coordenadas(*coords)
+        return coords
+    address = geocodificacion_utils.direccion_geocodificable(
+        paciente_row['provincia'], paciente_row['ciudad'], paciente_row['calle'], paciente_row['altura']
+    )
+    with perfilado_utils.fase("geocodificación"):
+        lat, lon = geocode_address(address)
     if lat and lon:
         query = "UPDATE paciente SET latitud=%s, longitud=%s WHERE id_paciente=%s"
         execute_query(query, params=(lat, lon, paciente_row['id_paciente']), is_select=False)
+        perfil_utils.actualizar_coordenadas(lat, lon)
         return lat, lon
     return None, None
 
 def get_or_update_latlon_hospital(hospital_row):
     if hospital_row.get('latitud') and hospital_row.get('longitud'):
         return hospital_row['latitud'], hospital_row['longitud']
-    address = f"{hospital_row['calle']} {hospital_row['altura']}, {hospital_row['ciudad']}, {hospital_row['provincia']}, Argentina"
-    lat, lon = geocode_address(address)
+    address = geocodificacion_utils.direccion_geocodificable(
+        hospital_row['provincia'], hospital_row['ciudad'], hospital_row['calle'], hospital_row['altura']
+    )
+    with perfilado_utils.fase("geocodificación"):
+        lat, lon = geocode_address(address)
     if lat and lon:
         query = "UPDATE hospital SET latitud=%s, longitud=%s WHERE id_hospital=%s"
         execute_query(query, params=(lat, lon, hospital_row['id_hospital']), is_select=False)
         return lat, lon
     return None, None
 
+def leer_version_datos():
+    """(versión de los datos de búsqueda, versión del índice de síntomas), o None"""
+    df = execute_query(busqueda_utils.SQL_VERSION_DATOS_BUSQUEDA)
+    return None if df.empty else (int(df.iloc[0]['version']), int(df.iloc[0]['version_sintomas']))
+
+def texto_distancia(distancia_km):
+    """Distancia para las tarjetas; los hospitales que todavía no se pudieron ubicar no tienen una"""
+    if distancia_km is None or pd.isna(distancia_km) or not math.isfinite(distancia_km):
+        return "Distancia: sin ubicar"
+    return f"Distancia: {distancia_km:.2f} km"
+
+def mostrar_resultados_paginados(filas, tarjeta_html, clave):
+    """
+    Muestra una página de resultados como un único bloque HTML, con controles
+    para cambiar de página y de tamaño de página.
+
+    Args:
+        filas (DataFrame): resultados ya ordenados
+        tarjeta_html (callable): función que recibe una fila y retorna su HTML
+        clave (str): identifica la búsqueda; cada búsqueda recuerda su página
+    """
+    opciones = sorted({RESULTADOS_POR_PAGINA, 10, 20, 50})
+    por_pagina = st.selectbox(
+        "Resultados por página:",
+        opciones,
+        index=opciones.index(RESULTADOS_POR_PAGINA),
+        key="resultados_por_pagina"
+    )
+    total_paginas = max(1, -(-len(filas) // por_pagina))
+    clave_pagina = f"pagina_{clave}"
+    pagina = min(st.session_state.get(clave_pagina, 1), total_paginas)
+
+    inicio = (pagina - 1) * por_pagina
+    html = "".join(tarjeta_html(fila) for _, fila in filas.iloc[inicio:inicio + por_pagina].iterrows())
+    st.markdown(html, unsafe_allow_html=True)
+
+    if total_paginas > 1:
+        col_ant, col_info, col_sig = st.columns([1, 2, 1])
+        with col_ant:
+            if st.button("⬅️ Anterior", disabled=pagina <= 1, key=f"anterior_{clave}", use_container_width=True):
+                st.session_state[clave_pagina] = pagina - 1
+                st.rerun()
+        with col_info:
+            st.markdown(
+                f"<div style='text-align: center; color: #666;'>Página {pagina} de {total_paginas} "
+                f"({inicio + 1}-{min(inicio + por_pagina, len(filas))} de {len(filas)})</div>",
+                unsafe_allow_html=True
+            )
+        with col_sig:
+            if st.button("Siguiente ➡️", disabled=pagina >= total_paginas, key=f"siguiente_{clave}", use_container_width=True):
+                st.session_state[clave_pagina] = pagina + 1
+                st.rerun()
+
 def get_paciente_completo(id_paciente):
+    # Leer desde el perfil de la sesión sin tocar la base
+    perfil = perfil_utils.obtener_perfil()
+    if perfil is not None and perfil.tipo == 'paciente' and perfil.id_usuario == id_paciente:
+        return perfil.direccion()
     query = "SELECT id_paciente, provincia, ciudad, calle, altura, latitud, longitud FROM paciente WHERE id_paciente = %s"
     df = execute_query(query, params=(id_paciente,))
     if not df.empty:
@@ -187,33 +273,101 @@ def buscar_por_especialidad():
     # Funciones auxiliares
     def obtener_especialidades():
         """Obtiene todas las especialidades de la base de datos"""
-        query = """
-        SELECT id_especialidad, desc_especialidad 
-        FROM especialidades 
-        ORDER BY desc_especialidad
-        """
         try:
-            return execute_query(query)
+            return execute_query(busqueda_utils.SQL_ESPECIALIDADES)
         except Exception as e:
             st.error(f"Error al obtener especialidades: {str(e)}")
             return pd.DataFrame()
     
     def obtener_hospitales_por_especialidad(id_especialidad):
-        query = """
-        SELECT DISTINCT h.id_hospital, h.desc_hospital, h.provincia, h.ciudad, h.calle, h.altura, h.telefono, h.latitud, h.longitud
-        FROM hospital h
-        INNER JOIN hospital_especialidades he ON h.id_hospital = he.id_hospital
-        WHERE he.id_especialidad = %s
-        ORDER BY h.desc_hospital
+        """Hospitales de la especialidad, compartidos entre sesiones (sin distancias)"""
+        try:
+            return resultados_utils.obtener(
+                resultados_utils.clave_especialidad(id_especialidad),
+                lambda: execute_query(busqueda_utils.SQL_HOSPITALES_POR_ESPECIALIDAD, (id_especialidad,)),
+                leer_version_datos
+            )
+        except Exception as e:
+            st.error(f"Error al obtener hospitales: {str(e)}")
+            return pd.DataFrame()
+
+    def obtener_hospitales_cercanos(id_especialidad, lat_pac, lon_pac, radio_km):
+        """
+        Hospitales de la especialidad a menos de radio_km, ordenados por distancia.
+        La base filtra con la caja envolvente (índice de la migración 003) y calcula
+        las distancias; los que no tienen coordenadas van al final (unos pocos) para
+        geocodificarlos. El resultado se comparte entre sesiones con la misma ubicación.
         """
         try:
-            return execute_query(query, (id_especialidad,))
+            return resultados_utils.obtener(
+                resultados_utils.clave_cercania(id_especialidad, lat_pac, lon_pac, radio_km),
+                lambda: execute_query(busqueda_utils.SQL_HOSPITALES_CERCANOS_POR_ESPECIALIDAD,
+                                      busqueda_utils.parametros_cercania(
+                                          id_especialidad, lat_pac, lon_pac, radio_km, busqueda_utils.BUSQUEDA_LIMITE
+                                      )),
+                leer_version_datos
+            )
         except Exception as e:
             st.error(f"Error al obtener hospitales: {str(e)}")
             return pd.DataFrame()
-    
-    def mostrar_hospital_card(hospital_row):
-        """Muestra una tarjeta individual de hospital"""
+
+    def obtener_hospitales_precalculados(id_paciente, id_especialidad, lat_pac, lon_pac, radio_km):
+        """
+        Hospitales de la lista precalculada del paciente (migración 004), dentro del
+        radio, más unos pocos sin coordenadas para geocodificarlos.
+        Retorna None si las listas no se pudieron calcular.
+        """
+        params = {
+            'id_paciente': id_paciente,
+            'id_especialidad': int(id_especialidad),
+            'radio_km': radio_km,
+            'limite': busqueda_utils.BUSQUEDA_LIMITE,
+            'limite_sin_coordenadas': 5,
+        }
+
+        def asegurar():
+            ok = execute_query(busqueda_utils.SQL_ASEGURAR_CERCANOS_PACIENTE,
+                               busqueda_utils.parametros_cercanos_paciente(id_paciente), is_select=False)
+            st.session_state["cercanos_calculados"] = (id_paciente, lat_pac, lon_pac) if ok else None
+            return ok
+
+        # Se verifica una vez por sesión y ubicación; después es una sola lectura
+        recien_calculadas = st.session_state.get("cercanos_calculados") != (id_paciente, lat_pac, lon_pac)
+        if recien_calculadas and not asegurar():
+            return None
+        # Después de calcular las listas se leen sin sumarse a una lectura anterior
+        hospitales = execute_query(busqueda_utils.SQL_HOSPITALES_CERCANOS_PRECALCULADOS, params,
+                                   coalesce=not recien_calculadas)
+        if (hospitales.empty or hospitales['distancia_km'].isna().all()) and asegurar():
+            # Las listas pudieron invalidarse desde otra sesión
+            hospitales = execute_query(busqueda_utils.SQL_HOSPITALES_CERCANOS_PRECALCULADOS, params, coalesce=False)
+        return hospitales
+
+    def completar_distancias(hospitales, lat_pac, lon_pac, radio_km):
+        """
+        Geocodifica los hospitales que todavía no tienen coordenadas, calcula su
+        distancia y retorna los resultados ordenados y recortados al límite.
+        Los que no se pueden ubicar quedan al final con distancia infinita.
+        """
+        if 'distancia_km' not in hospitales.columns:
+            hospitales['distancia_km'] = None
+        hospitales = hospitales.astype({'latitud': object, 'longitud': object, 'distancia_km': object})
+        for idx, row in hospitales[hospitales['distancia_km'].isna()].iterrows():
+            lat, lon = get_or_update_latlon_hospital(row)
+            hospitales.at[idx, 'latitud'] = lat
+            hospitales.at[idx, 'longitud'] = lon
+            if lat and lon and lat_pac and lon_pac:
+                hospitales.at[idx, 'distancia_km'] = haversine(lat_pac, lon_pac, lat, lon)
+            else:
+                hospitales.at[idx, 'distancia_km'] = float('inf')
+        hospitales['distancia_km'] = hospitales['distancia_km'].astype(float)
+        if lat_pac and lon_pac:
+            # Los recién geocodificados pueden quedar fuera del radio
+            hospitales = hospitales[(hospitales['distancia_km'] <= radio_km) | (hospitales['distancia_km'] == float('inf'))]
+        return hospitales.sort_values('distancia_km').head(busqueda_utils.BUSQUEDA_LIMITE)
+    
+    def tarjeta_hospital_html(hospital_row):
+        """HTML de la tarjeta de un hospital, precedida por su distancia"""
         # Convertir fila de DataFrame a diccionario si es necesario
         if hasattr(hospital_row, 'to_dict'):
             hospital = hospital_row.to_dict()
@@ -235,25 +389,17 @@ def buscar_por_especialidad():
         if pd.isna(telefono):
             telefono = 'No disponible'
         
-        st.markdown(f"""
-        <div class="hospital-card-especialidad">
-            <div class="hospital-name-especialidad">
-                <span class="hospital-icon-especialidad">🏥</span>
-                {hospital['desc_hospital']}
-            </div>
-            <div class="hospital-info-especialidad">
-                <span class="hospital-icon-especialidad">📍</span>
-                <strong>Dirección:</strong> &nbsp; {direccion}
-            </div>
-            <div class="hospital-info-especialidad">
-                <span class="hospital-icon-especialidad">📞</span>
-                <strong>Teléfono:</strong> &nbsp; {telefono}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        return (
+            f"<div style='color:#888; font-size:0.95rem;'>{texto_distancia(hospital['distancia_km'])}</div>"
+            f"<div class='hospital-card-especialidad'>"
+            f"<div class='hospital-name-especialidad'><span class='hospital-icon-especialidad'>🏥</span>{hospital['desc_hospital']}</div>"
+            f"<div class='hospital-info-especialidad'><span class='hospital-icon-especialidad'>📍</span><strong>Dirección:</strong> &nbsp; {direccion}</div>"
+            f"<div class='hospital-info-especialidad'><span class='hospital-icon-especialidad'>📞</span><strong>Teléfono:</strong> &nbsp; {telefono}</div>"
+            f"</div>"
+        )
     
     # Obtener especialidades
-    with st.spinner("🔄 Cargando especialidades..."):
+    with st.spinner("🔄 Cargando especialidades..."), perfilado_utils.fase("catálogo de especialidades"):
         especialidades = obtener_especialidades()
     
     # Verificar si hay especialidades
@@ -285,49 +431,43 @@ def buscar_por_especialidad():
                 break
         
         if id_especialidad:
+            radio_km = st.select_slider(
+                "📏 Distancia máxima (km):",
+                options=busqueda_utils.BUSQUEDA_RADIOS_KM,
+                value=busqueda_utils.BUSQUEDA_RADIO_KM,
+                key="radio_busqueda"
+            )
             with st.spinner(f"🔍 Buscando hospitales para **{especialidad_seleccionada}**..."):
-                hospitales = obtener_hospitales_por_especialidad(id_especialidad)
-                if not hospitales.empty:
-                    conn = connect_to_supabase()
-                    # 2. Obtener paciente completo desde la base
-                    paciente_id = st.session_state.usuario_autenticado['id_paciente']
-                    paciente = get_paciente_completo(paciente_id)
-                    if not paciente:
-                        st.error("No se pudo obtener la información de dirección del paciente.")
-                        conn.close()
-                        return
-                    # 3. Obtener lat/lon del paciente
+                # 1. Obtener paciente completo y su ubicación
+                paciente_id = st.session_state.usuario_autenticado['id_paciente']
+                paciente = get_paciente_completo(paciente_id)
+                if not paciente:
+                    st.error("No se pudo obtener la información de dirección del paciente.")
+                    return
+                with perfilado_utils.fase("ubicación del paciente"):
                     lat_pac, lon_pac = get_or_update_latlon_paciente(paciente)
-                    # 4. Para cada hospital, obtener/actualizar lat/lon y calcular distancia
-                    hospitales['latitud'] = None
-                    hospitales['longitud'] = None
-                    hospitales['distancia_km'] = None
-                    for idx, row in hospitales.iterrows():
-                        lat, lon = get_or_update_latlon_hospital(row)
-                        hospitales.at[idx, 'latitud'] = lat
-                        hospitales.at[idx, 'longitud'] = lon
-                        if lat and lon and lat_pac and lon_pac:
-                            hospitales.at[idx, 'distancia_km'] = haversine(lat_pac, lon_pac, lat, lon)
-                        else:
-                            hospitales.at[idx, 'distancia_km'] = float('inf')
-                    # 5. Ordenar hospitales por distancia
-                    hospitales = hospitales.sort_values('distancia_km')
-                    # 6. Mostrar mapa con los 5 más cercanos
+                # 2. Con ubicación, se leen los más cercanos ya calculados para el paciente;
+                # si no están disponibles, la base filtra por radio y ordena por distancia
+                with perfilado_utils.fase("búsqueda de hospitales"):
+                    if lat_pac and lon_pac:
+                        hospitales = obtener_hospitales_precalculados(paciente_id, id_especialidad, lat_pac, lon_pac, radio_km)
+                        if hospitales is None:
+                            hospitales = obtener_hospitales_cercanos(id_especialidad, lat_pac, lon_pac, radio_km)
+                    else:
+                        hospitales = obtener_hospitales_por_especialidad(id_especialidad)
+                if hospitales.empty:
+                    st.info(f"No se encontraron hospitales que ofrezcan {especialidad_seleccionada} a menos de {radio_km:g} km.")
+                else:
+                    with perfilado_utils.fase("ranking por distancia"):
+                        hospitales = completar_distancias(hospitales, lat_pac, lon_pac, radio_km)
+                    # 3. Mostrar mapa con los 5 más cercanos
                     if lat_pac and lon_pac:
-                        m = folium.Map(location=[lat_pac, lon_pac], zoom_start=13)
-                        folium.Marker([lat_pac, lon_pac], tooltip="Tu casa", icon=folium.Icon(color="blue")).add_to(m)
-                        for i, row in hospitales.head(5).iterrows():
-                            if row['latitud'] and row['longitud']:
-                                folium.Marker(
-                                    [row['latitud'], row['longitud']],
-                                    tooltip=row['desc_hospital'],
-                                    popup=folium.Popup(f"{row['ciudad']}<br>{row['calle']} {row['altura']}", max_width=400),
-                                    icon=folium.Icon(color="red")
-                                ).add_to(m)
-                        st_folium(m, width=700, height=400)
+                        with perfilado_utils.fase("construcción del mapa"):
+                            marcadores = mapas_utils.marcadores_desde_filas(hospitales, 'desc_hospital')
+                            mapas_utils.mostrar_mapa(lat_pac, lon_pac, marcadores)
                     else:
                         st.warning("No se pudo determinar la ubicación del paciente para mostrar el mapa.")
-                    # 7. Mostrar listado ordenado (pero por distancia)
+                    # 4. Mostrar listado ordenado por distancia
                     st.markdown(f"""
                     <div class="results-counter" style="margin-top: 1rem; margin-bottom: 0.5rem;">
                         <h4 style="margin: 0; color: #2E7D32;">
@@ -337,16 +477,14 @@ def buscar_por_especialidad():
                     </div>
                     """, unsafe_allow_html=True)
                     st.markdown("### 🏥 Resultados de la búsqueda (ordenados por cercanía)")
-                    for idx, hospital in hospitales.iterrows():
-                        st.markdown(f"<div style='color:#888; font-size:0.95rem;'>Distancia: {hospital['distancia_km']:.2f} km</div>", unsafe_allow_html=True)
-                        mostrar_hospital_card(hospital)
+                    with perfilado_utils.fase("tarjetas de resultados"):
+                        mostrar_resultados_paginados(hospitales, tarjeta_hospital_html, f"especialidad_{id_especialidad}_{radio_km:g}")
                     st.markdown("---")
                     st.markdown("""
                     <div style='text-align: center; color: #666; padding: 1rem;'>
                         <p>💡 <strong>Consejo:</strong> Te recomendamos llamar antes de concurrir para confirmar horarios y disponibilidad.</p>
                     </div>
                     """, unsafe_allow_html=True)
-                    conn.close()
         else:
             st.error("❌ No se pudo obtener el ID de la especialidad seleccionada.")
     
@@ -512,16 +650,15 @@ def buscar_por_sintomas():
     st.markdown("""
     <div class="sintomas-header">
         <div class="sintomas-title">🩺 Buscar por Síntomas</div>
-        <div class="sintomas-subtitle">Selecciona dos síntomas y te ayudamos a encontrar la especialidad</div>
+        <div class="sintomas-subtitle">Selecciona tus síntomas y te ayudamos a encontrar la especialidad</div>
     </div>
     """, unsafe_allow_html=True)
     
     # Funciones auxiliares locales
     def obtener_sintomas_local():
         """Obtiene todos los síntomas disponibles en la base de datos"""
-        query = "SELECT desc_sintoma FROM sintoma ORDER BY desc_sintoma;"
         try:
-            df_sintomas = execute_query(query)
+            df_sintomas = execute_query(busqueda_utils.SQL_SINTOMAS)
             if not df_sintomas.empty:
                 return df_sintomas['desc_sintoma'].tolist()
             else:
@@ -530,72 +667,47 @@ def buscar_por_sintomas():
             st.error(f"Error al obtener síntomas: {str(e)}")
             return []
 
-    def buscar_por_sintomas_local(sintoma_a, sintoma_b):
-        """Busca especialidades y hospitales basados en dos síntomas dados - VERSIÓN COMPLETA"""
-        query = """
-        -- Buscar hospitales por especialidad (patología -> especialidad -> hospital)
-        SELECT DISTINCT 
-            e.desc_especialidad as especialidad,
-            h.desc_hospital as hospital,
-            h.provincia,
-            h.ciudad,
-            h.calle,
-            h.altura,
-            h.telefono,
-            'Por Especialidad' as tipo_atencion
-        FROM patologia p
-        INNER JOIN sintoma s1 ON (p.id_sintoma_1 = s1.id_sintoma OR p.id_sintoma_2 = s1.id_sintoma)
-        INNER JOIN sintoma s2 ON (p.id_sintoma_1 = s2.id_sintoma OR p.id_sintoma_2 = s2.id_sintoma)
-        INNER JOIN patologia_especialidades pe ON p.id_patologia = pe.id_patologia
-        INNER JOIN especialidades e ON pe.id_especialidad = e.id_especialidad
-        INNER JOIN hospital_especialidades he ON e.id_especialidad = he.id_especialidad
-        INNER JOIN hospital h ON he.id_hospital = h.id_hospital
-        WHERE (
-            (s1.desc_sintoma = %s AND s2.desc_sintoma = %s) OR 
-            (s1.desc_sintoma = %s AND s2.desc_sintoma = %s)
+    def cargar_indice_sintomas():
+        """Índice de bitmaps síntoma -> patologías, o None si falla la consulta"""
+        df_sintomas = execute_query(busqueda_utils.SQL_INDICE_SINTOMAS)
+        df_patologias = execute_query(busqueda_utils.SQL_INDICE_PATOLOGIAS)
+        if df_sintomas.empty or df_patologias.empty:
+            return None
+        return sintomas_utils.IndiceSintomas(
+            list(df_sintomas[['id_sintoma', 'desc_sintoma']].itertuples(index=False, name=None)),
+            list(df_patologias[['id_patologia', 'id_sintoma_1', 'id_sintoma_2']].itertuples(index=False, name=None))
         )
-        AND s1.id_sintoma != s2.id_sintoma
-        
-        UNION
-        
-        -- Buscar hospitales que atienden la patología directamente
-        SELECT DISTINCT 
-            CONCAT('Atención directa: ', p.desc_patologia) as especialidad,
-            h.desc_hospital as hospital,
-            h.provincia,
-            h.ciudad,
-            h.calle,
-            h.altura,
-            h.telefono,
-            'Por Patología' as tipo_atencion
-        FROM patologia p
-        INNER JOIN sintoma s1 ON (p.id_sintoma_1 = s1.id_sintoma OR p.id_sintoma_2 = s1.id_sintoma)
-        INNER JOIN sintoma s2 ON (p.id_sintoma_1 = s2.id_sintoma OR p.id_sintoma_2 = s2.id_sintoma)
-        INNER JOIN patologia_hospital ph ON p.id_patologia = ph.id_patologia
-        INNER JOIN hospital h ON ph.id_hospital = h.id_hospital
-        WHERE (
-            (s1.desc_sintoma = %s AND s2.desc_sintoma = %s) OR 
-            (s1.desc_sintoma = %s AND s2.desc_sintoma = %s)
-        )
-        AND s1.id_sintoma != s2.id_sintoma
-        
-        ORDER BY especialidad, hospital;
+
+    def buscar_por_sintomas_local(sintomas):
         """
-        
+        Especialidades y hospitales (con sus coordenadas) para uno o más síntomas,
+        con cuántos de ellos cubre cada resultado. Las patologías salen del índice
+        en memoria y sus hospitales, de una sola consulta. El resultado se comparte
+        entre sesiones y no depende del orden de los síntomas.
+        """
+        sintomas = sorted(sintomas)
+
+        def cargar():
+            indice = sintomas_utils.obtener_indice(cargar_indice_sintomas, leer_version_datos)
+            if indice is None:
+                return pd.DataFrame()
+            ids_patologia, mascaras, _ = indice.coincidencias(sintomas)
+            if not len(ids_patologia):
+                return pd.DataFrame()
+            filas = execute_query(busqueda_utils.SQL_HOSPITALES_POR_PATOLOGIAS,
+                                  params={'patologias': [int(i) for i in ids_patologia]})
+            if filas.empty:
+                return filas
+            return sintomas_utils.agrupar_coincidencias(filas, ids_patologia, mascaras, sintomas)
+
         try:
-            # Pasar los parámetros para ambas partes del UNION: (A,B,B,A) + (A,B,B,A)
-            df_results = execute_query(query, params=(sintoma_a, sintoma_b, sintoma_b, sintoma_a, 
-                                                    sintoma_a, sintoma_b, sintoma_b, sintoma_a))
-            if not df_results.empty:
-                return df_results.to_dict('records')
-            else:
-                return []
+            return resultados_utils.obtener(resultados_utils.clave_sintomas(sintomas), cargar, leer_version_datos)
         except Exception as e:
             st.error(f"Error en la búsqueda: {str(e)}")
-            return []
+            return pd.DataFrame()
 
-    def mostrar_resultado_sintomas(resultado):
-        """Muestra una tarjeta de resultado con especialidad y hospital"""
+    def tarjeta_sintomas_html(resultado):
+        """HTML de la tarjeta de un resultado con especialidad y hospital, precedida por su distancia"""
         provincia = resultado.get('provincia', '')
         ciudad = resultado.get('ciudad', '')
         calle = resultado.get('calle', '')
@@ -609,133 +721,91 @@ def buscar_por_sintomas():
         telefono = resultado.get('telefono', 'No disponible')
         if pd.isna(telefono):
             telefono = 'No disponible'
-        st.markdown(f"""
-        <div class="hospital-card-sintomas">
-            <div style="margin-bottom: 1rem;">
-                <span class="specialty-tag">{resultado['especialidad']}</span>
-            </div>
-            <div class="hospital-name-especialidad">
-                <span class="hospital-icon-especialidad">🏥</span>
-                {resultado['hospital']}
-            </div>
-            <div class="hospital-info-especialidad">
-                <span class="hospital-icon-especialidad">📍</span>
-                <strong>Dirección:</strong> &nbsp; {direccion}
-            </div>
-            <div class="hospital-info-especialidad">
-                <span class="hospital-icon-especialidad">📞</span>
-                <strong>Teléfono:</strong> &nbsp; {telefono}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        return (
+            f"<div style='color:#888; font-size:0.95rem;'>{texto_distancia(resultado['distancia_km'])}</div>"
+            f"<div class='hospital-card-sintomas'>"
+            f"<div style='margin-bottom: 1rem;'><span class='specialty-tag'>{resultado['especialidad']}</span>"
+            f"<span style='color:#888; font-size:0.9rem;'>Coincide con {resultado['coincidencias']} de "
+            f"{resultado['sintomas_elegidos']} síntomas: {resultado['sintomas_coincidentes']}</span></div>"
+            f"<div class='hospital-name-especialidad'><span class='hospital-icon-especialidad'>🏥</span>{resultado['hospital']}</div>"
+            f"<div class='hospital-info-especialidad'><span class='hospital-icon-especialidad'>📍</span><strong>Dirección:</strong> &nbsp; {direccion}</div>"
+            f"<div class='hospital-info-especialidad'><span class='hospital-icon-especialidad'>📞</span><strong>Teléfono:</strong> &nbsp; {telefono}</div>"
+            f"</div>"
+        )
     
     # Obtener síntomas
-    with st.spinner("🔄 Cargando síntomas..."):
+    with st.spinner("🔄 Cargando síntomas..."), perfilado_utils.fase("catálogo de síntomas"):
         sintomas_disponibles = obtener_sintomas_local()
     
     if not sintomas_disponibles:
         st.error("❌ No se pudieron cargar los síntomas.")
         return
     
-    # Crear selectboxes
-    st.markdown("### 🔍 Seleccione dos síntomas")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        opciones_sintoma_a = ["-- Seleccione el primer síntoma --"] + sintomas_disponibles
-        sintoma_a = st.selectbox(
-            "Síntoma A:",
-            opciones_sintoma_a,
-            key="sintoma_a_select",
-            help="Seleccione el primer síntoma"
-        )
-    
-    with col2:
-        if sintoma_a and sintoma_a != "-- Seleccione el primer síntoma --":
-            sintomas_b_filtrados = [s for s in sintomas_disponibles if s != sintoma_a]
-            opciones_sintoma_b = ["-- Seleccione el segundo síntoma --"] + sintomas_b_filtrados
-        else:
-            opciones_sintoma_b = ["-- Primero seleccione el síntoma A --"]
-        
-        sintoma_b = st.selectbox(
-            "Síntoma B:",
-            opciones_sintoma_b,
-            key="sintoma_b_select",
-            help="Seleccione el segundo síntoma"
-        )
-    
-    # Si se seleccionaron ambos síntomas
-    if (sintoma_a and sintoma_a != "-- Seleccione el primer síntoma --" and
-        sintoma_b and sintoma_b != "-- Seleccione el segundo síntoma --" and
-        sintoma_b != "-- Primero seleccione el síntoma A --"):
-        
-        with st.spinner(f"🔍 Buscando especialidades para **{sintoma_a}** y **{sintoma_b}**..."):
-            resultados = buscar_por_sintomas_local(sintoma_a, sintoma_b)
+    # Selección de síntomas
+    st.markdown("### 🔍 Seleccione sus síntomas")
+
+    sintomas = st.multiselect(
+        "Síntomas:",
+        sintomas_disponibles,
+        key="sintomas_select",
+        max_selections=sintomas_utils.SINTOMAS_MAXIMOS,
+        help="Se buscan patologías con todos los síntomas elegidos, o con dos de ellos si se eligen más"
+    )
+    descripcion_sintomas = ", ".join(f"**{s}**" for s in sintomas)
+
+    if sintomas:
+        with st.spinner(f"🔍 Buscando especialidades para {descripcion_sintomas}..."):
+            with perfilado_utils.fase("búsqueda por síntomas"):
+                resultados = buscar_por_sintomas_local(sintomas)
         
-        if resultados:
-            import pandas as pd
-            import folium
-            from streamlit_folium import st_folium
-            from geo_utils import haversine
-            from functions import connect_to_supabase
-            conn = connect_to_supabase()
+        if not resultados.empty:
             # 2. Obtener paciente completo desde la base
             paciente_id = st.session_state.usuario_autenticado['id_paciente']
             paciente = get_paciente_completo(paciente_id)
             if not paciente:
                 st.error("No se pudo obtener la información de dirección del paciente.")
-                conn.close()
                 return
-            lat_pac, lon_pac = get_or_update_latlon_paciente(paciente)
-            # 3. Convertir resultados a DataFrame para facilitar el manejo
-            df_resultados = pd.DataFrame(resultados)
-            # 4. Para cada hospital, obtener/actualizar lat/lon y calcular distancia
-            df_resultados['latitud'] = None
-            df_resultados['longitud'] = None
-            df_resultados['distancia_km'] = None
-            # Necesitamos el id_hospital para actualizar, pero los resultados no lo traen
-            # Así que buscamos el hospital por nombre para obtener el id y actualizar lat/lon
-            for idx, row in df_resultados.iterrows():
-                # Buscar hospital por nombre exacto
-                cur = conn.cursor()
-                cur.execute("SELECT id_hospital, latitud, longitud, calle, altura, ciudad, provincia FROM hospital WHERE desc_hospital = %s LIMIT 1", (row['hospital'],))
-                h = cur.fetchone()
-                if h:
-                    id_hospital, lat, lon, calle, altura, ciudad, provincia = h
-                    if not lat or not lon:
-                        # Geocodificar si falta
-                        address = f"{calle} {altura}, {ciudad}, {provincia}, Argentina"
-                        lat, lon = geocode_address(address)
-                        if lat and lon:
-                            cur.execute("UPDATE hospital SET latitud=%s, longitud=%s WHERE id_hospital=%s", (lat, lon, id_hospital))
-                            conn.commit()
-                    df_resultados.at[idx, 'latitud'] = lat
-                    df_resultados.at[idx, 'longitud'] = lon
-                    if lat and lon and lat_pac and lon_pac:
-                        df_resultados.at[idx, 'distancia_km'] = haversine(lat_pac, lon_pac, lat, lon)
-                    else:
-                        df_resultados.at[idx, 'distancia_km'] = float('inf')
+            with perfilado_utils.fase("ubicación del paciente"):
+                lat_pac, lon_pac = get_or_update_latlon_paciente(paciente)
+            with perfilado_utils.fase("ranking por distancia"):
+                # 3. Los resultados ya traen las coordenadas de cada hospital. De los
+                # que no las tienen se geocodifican ahora unos pocos del grupo con más
+                # coincidencias; el resto se encola y aparece ubicado en otra búsqueda
+                df_resultados = resultados.astype({'latitud': object, 'longitud': object})
+                sin_coordenadas = df_resultados['latitud'].isna() | df_resultados['longitud'].isna()
+                faltantes = df_resultados[sin_coordenadas].drop_duplicates('id_hospital')
+                en_linea = faltantes[
+                    faltantes['coincidencias'] == df_resultados['coincidencias'].max()
+                ].head(busqueda_utils.BUSQUEDA_GEOCODIFICAR_EN_LINEA)
+                for _, row in en_linea.iterrows():
+                    lat, lon = get_or_update_latlon_hospital(row)
+                    mismo_hospital = df_resultados['id_hospital'] == row['id_hospital']
+                    df_resultados.loc[mismo_hospital, 'latitud'] = lat
+                    df_resultados.loc[mismo_hospital, 'longitud'] = lon
+                for _, row in faltantes.drop(en_linea.index).iterrows():
+                    if not geocodificacion_utils.geocodificacion_pendiente('hospital', row['id_hospital']):
+                        geocodificacion_utils.encolar_geocodificacion(
+                            'hospital', row['id_hospital'], row['provincia'], row['ciudad'], row['calle'], row['altura']
+                        )
+                # 4. Distancias desde el paciente, en una sola operación
+                if lat_pac and lon_pac:
+                    df_resultados['distancia_km'] = resultados_utils.distancias_km(
+                        df_resultados['latitud'], df_resultados['longitud'], lat_pac, lon_pac
+                    )
                 else:
-                    df_resultados.at[idx, 'distancia_km'] = float('inf')
-            # 5. Ordenar por distancia
-            df_resultados = df_resultados.sort_values('distancia_km')
+                    df_resultados['distancia_km'] = float('nan')
+                # 5. Ordenar por síntomas cubiertos y después por distancia: los que
+                # no se pudieron ubicar, al final de su grupo
+                df_resultados['distancia_km'] = df_resultados['distancia_km'].fillna(float('inf'))
+                df_resultados['sintomas_elegidos'] = len(sintomas)
+                df_resultados = df_resultados.sort_values(
+                    ['coincidencias', 'distancia_km'], ascending=[False, True], kind='stable'
+                )
             # 6. Mostrar mapa con los 5 más cercanos
             if lat_pac and lon_pac:
-                m = folium.Map(location=[lat_pac, lon_pac], zoom_start=13)
-                folium.Marker([lat_pac, lon_pac], tooltip="Tu casa",
-                            icon=folium.Icon(color="blue")).add_to(m)
-                for i, row in df_resultados.head(5).iterrows():
-                    if row['latitud'] and row['longitud']:
-                        folium.Marker(
-                            [row['latitud'], row['longitud']],
-                            tooltip=row['hospital'],
-                            popup=folium.Popup(f"{row['ciudad']}<br>{row['calle']} {row['altura']}", max_width=400),
-                            icon=folium.Icon(color="red")
-                        ).add_to(m)
-                        
-                # Mostrar el mapa
-                st_folium(m, width=700, height=400)
+                with perfilado_utils.fase("construcción del mapa"):
+                    marcadores = mapas_utils.marcadores_desde_filas(df_resultados, 'hospital')
+                    mapas_utils.mostrar_mapa(lat_pac, lon_pac, marcadores)
                 
                 # CSS mejorado para mantener espaciado natural
                 st.markdown("""
@@ -761,24 +831,22 @@ def buscar_por_sintomas():
                 st.warning("No se pudo determinar la ubicación del paciente para mostrar el mapa.")
             # Resto del código sin cambios...
 
-            st.markdown("### 🏥 Resultados de la búsqueda (ordenados por cercanía)")
-            for idx, resultado in df_resultados.iterrows():
-                st.markdown(f"<div style='color:#888; font-size:0.95rem;'>Distancia: {resultado['distancia_km']:.2f} km</div>", unsafe_allow_html=True)
-                mostrar_resultado_sintomas(resultado)
+            st.markdown("### 🏥 Resultados de la búsqueda (por síntomas coincidentes y cercanía)")
+            with perfilado_utils.fase("tarjetas de resultados"):
+                mostrar_resultados_paginados(df_resultados, tarjeta_sintomas_html, f"sintomas_{'_'.join(sorted(sintomas))}")
             st.markdown("---")
             st.markdown("""
             <div style='text-align: center; color: #666; padding: 1rem;'>
                 <p>💡 <strong>Consejo:</strong> Estos resultados son orientativos. Te recomendamos consultar con el especialista para un diagnóstico preciso.</p>
             </div>
             """, unsafe_allow_html=True)
-            conn.close()
         else:
             st.markdown(f"""
             <div class="no-results-especialidad">
                 <h3 style="color: #FF6B6B; margin-bottom: 1rem;">😔 No se encontraron resultados</h3>
                 <p style="font-size: 1.1rem; margin-bottom: 1rem;">
-                    No hay especialidades u hospitales disponibles para la combinación de 
-                    <strong>{sintoma_a}</strong> y <strong>{sintoma_b}</strong>
+                    No hay especialidades u hospitales disponibles para
+                    <strong>{", ".join(sintomas)}</strong>
                 </p>
                 <p style="color: #888;">
                     • Intenta con otros síntomas<br>
@@ -788,7 +856,7 @@ def buscar_por_sintomas():
             </div>
             """, unsafe_allow_html=True)
     else:
-        st.info("👆 Selecciona dos síntomas diferentes para ver las especialidades y hospitales recomendados.")
+        st.info("👆 Selecciona uno o más síntomas para ver las especialidades y hospitales recomendados.")
 
 
 
@@ -941,4 +1009,6 @@ st.markdown(
     </div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+perfilado_utils.mostrar_perfil()
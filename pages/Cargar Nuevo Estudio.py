@@ -9,7 +9,11 @@ import sys
 import re
 import unicodedata
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from supabase import create_client, Client
+import perfil_utils
+import almacenamiento_utils
+from metricas_utils import CursorInstrumentado
+import estudios_utils
+import perfilado_utils
 
 # Configuración de la página
 st.set_page_config(
@@ -17,6 +21,7 @@ st.set_page_config(
     page_icon="🏥",
     layout="wide"
 )
+perfilado_utils.iniciar_rerun("Cargar Nuevo Estudio")
 
 # Cargar variables de entorno
 load_dotenv()
@@ -39,31 +44,24 @@ def solo_medico_autenticado():
         st.stop()
 
 
-# Obtener el DNI del médico autenticado
-medico_autenticado = st.session_state.get("usuario_autenticado")
-if medico_autenticado is None:
-    st.error("🔐 Debes iniciar sesión como médico para acceder a esta página")
-    if st.button("🏠 Ir a la página principal"):
-        st.switch_page("Inicio.py")
-    st.stop()
+with perfilado_utils.fase("verificación de acceso"):
+    # Obtener el DNI del médico autenticado
+    medico_autenticado = st.session_state.get("usuario_autenticado")
+    if medico_autenticado is None:
+        st.error("🔐 Debes iniciar sesión como médico para acceder a esta página")
+        if st.button("🏠 Ir a la página principal"):
+            st.switch_page("Inicio.py")
+        st.stop()
 
-# Verificar que el usuario sea un médico
-if st.session_state.get("tipo_usuario") != "medico":
-    st.error("❌ Solo los médicos pueden acceder a esta página.")
-    if st.button("🔙 Volver al perfil"):
-        st.switch_page("Inicio.py")
-    st.stop()
+    # Verificar que el usuario sea un médico
+    if st.session_state.get("tipo_usuario") != "medico":
+        st.error("❌ Solo los médicos pueden acceder a esta página.")
+        if st.button("🔙 Volver al perfil"):
+            st.switch_page("Inicio.py")
+        st.stop()
 
 DNI_MEDICO_AUTENTICADO = str(medico_autenticado.get('id_medico', ''))
 
-# NUEVO: Configuración de Supabase Storage
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-SUPABASE_BUCKET = "estudios"
-
-def get_supabase_client():
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
-
 def connect_to_supabase():
     """
     Connects to the Supabase PostgreSQL database using transaction pooler details
@@ -91,7 +89,8 @@ def connect_to_supabase():
             user=user,
             password=password,
             sslmode='require',  # Add SSL mode for Supabase
-            connect_timeout=10  # Add connection timeout
+            connect_timeout=10,  # Add connection timeout
+            cursor_factory=CursorInstrumentado
         )
         return conn
     except psycopg2.Error as e:
@@ -243,7 +242,8 @@ def buscar_paciente_por_dni(dni_paciente):
     """Busca un paciente por DNI y retorna sus datos"""
     try:
         query = "SELECT id_paciente, nombre, apellido, provincia, ciudad, calle, altura FROM paciente WHERE id_paciente = %s"
-        df = execute_query(query, params=(dni_paciente,), is_select=True)
+        with perfilado_utils.fase("búsqueda de paciente"):
+            df = execute_query(query, params=(dni_paciente,), is_select=True)
         
         if not df.empty:
             return {
@@ -270,7 +270,8 @@ def buscar_medico_por_dni(dni_medico):
         LEFT JOIN hospital h ON m.id_hospital = h.id_hospital
         WHERE m.id_medico = %s
         """
-        df = execute_query(query, params=(dni_medico,), is_select=True)
+        with perfilado_utils.fase("búsqueda de médico"):
+            df = execute_query(query, params=(dni_medico,), is_select=True)
         
         if not df.empty:
             sexo = str(df.iloc[0]['sexo']).upper()  # Convertir a mayúscula para comparar
@@ -294,11 +295,24 @@ def buscar_medico_por_dni(dni_medico):
         st.error(f"Error buscando médico: {e}")
         return None
 
+def obtener_medico_autenticado():
+    """Datos del médico autenticado leídos desde el perfil de la sesión, sin consultar la base"""
+    perfil = perfil_utils.obtener_perfil()
+    if perfil is None or perfil.tipo != 'medico':
+        return buscar_medico_por_dni(DNI_MEDICO_AUTENTICADO)
+    return {
+        'id_medico': int(perfil.id_usuario),
+        'nombre': str(perfil.nombre),
+        'apellido': str(perfil.apellido),
+        'sexo': str(perfil.sexo).upper(),
+        'titulo': perfil.titulo,
+        'hospital': str(perfil.desc_hospital) if perfil.desc_hospital else "Hospital no asignado"
+    }
+
 def obtener_siguiente_id_estudio():
     """Obtiene el siguiente ID disponible para un nuevo estudio"""
     try:
-        query = "SELECT COALESCE(MAX(id_estudio), 0) + 1 as siguiente_id FROM estudio_medico"
-        df = execute_query(query, is_select=True)
+        df = execute_query(estudios_utils.SQL_SIGUIENTE_ID_ESTUDIO, is_select=True)
         
         if not df.empty:
             return int(df.iloc[0]['siguiente_id'])
@@ -310,17 +324,14 @@ def obtener_siguiente_id_estudio():
 def guardar_estudio(id_paciente, id_medico, desc_estudio, fecha_estudio, resultado, archivo_url=None):
     """Guarda el estudio médico en la base de datos"""
     try:
-        # Obtener el siguiente ID
-        siguiente_id = obtener_siguiente_id_estudio()
-        if siguiente_id is None:
-            return False
-        
-        # NUEVO: Incluir archivo_url en el insert
-        query = """
-        INSERT INTO estudio_medico (id_estudio, id_paciente, id_medico, desc_estudio, fecha_estudio, resultado, archivo_url)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        return execute_query(query, params=(siguiente_id, id_paciente, id_medico, desc_estudio, fecha_estudio, resultado, archivo_url), is_select=False)
+        with perfilado_utils.fase("guardado del estudio"):
+            # Obtener el siguiente ID
+            siguiente_id = obtener_siguiente_id_estudio()
+            if siguiente_id is None:
+                return False
+            
+            # NUEVO: Incluir archivo_url en el insert
+            return execute_query(estudios_utils.SQL_INSERTAR_ESTUDIO, params=(siguiente_id, id_paciente, id_medico, desc_estudio, fecha_estudio, resultado, archivo_url), is_select=False)
     except Exception as e:
         st.error(f"Error guardando estudio: {e}")
         return False
@@ -447,7 +458,7 @@ if st.session_state.step == 'form':
                                 st.success("Paciente placeholder creado. Continúe con la carga del estudio.")
                                 paciente = buscar_paciente_por_dni(dni_paciente.strip())
                                 # Buscar médico (ya autenticado)
-                                medico = buscar_medico_por_dni(DNI_MEDICO_AUTENTICADO)
+                                medico = obtener_medico_autenticado()
                                 if not medico:
                                     st.error(f"❌ No se encontró un médico con el DNI: {DNI_MEDICO_AUTENTICADO}")
                                     st.info("💡 Verifique que su usuario esté correctamente registrado como médico en el sistema")
@@ -455,16 +466,15 @@ if st.session_state.step == 'form':
                                     # NUEVO: Subir archivo si existe
                                     archivo_url = None
                                     if archivo is not None:
-                                        supabase = get_supabase_client()
                                         timestamp = int(time.time())
                                         nombre_archivo = f"{dni_paciente.strip()}_{fecha_estudio}_{timestamp}_{archivo.name}"
                                         nombre_archivo = limpiar_nombre_archivo(nombre_archivo)
                                         data = archivo.read()
                                         try:
-                                            res = supabase.storage.from_(SUPABASE_BUCKET).upload(nombre_archivo, data, {"content-type": archivo.type})
-                                            archivo_url = supabase.storage.from_(SUPABASE_BUCKET).get_public_url(nombre_archivo)
+                                            with perfilado_utils.fase("subida del archivo"):
+                                                archivo_url = almacenamiento_utils.subir_archivo(nombre_archivo, data, archivo.type)
                                         except Exception as e:
-                                            st.error(f"Error subiendo el archivo a Supabase Storage: {e}")
+                                            st.error(f"Error subiendo el archivo: {e}")
                                             archivo_url = None
                                     st.session_state.paciente_data = paciente
                                     st.session_state.medico_data = medico
@@ -487,7 +497,7 @@ if st.session_state.step == 'form':
                             st.info("💡 Si el paciente aún no está registrado, puede crearlo como placeholder para asociar el estudio a su DNI usando el botón de abajo.")
                     else:
                         # Buscar médico (ya autenticado)
-                        medico = buscar_medico_por_dni(DNI_MEDICO_AUTENTICADO)
+                        medico = obtener_medico_autenticado()
                         if not medico:
                             st.error(f"❌ No se encontró un médico con el DNI: {DNI_MEDICO_AUTENTICADO}")
                             st.info("💡 Verifique que su usuario esté correctamente registrado como médico en el sistema")
@@ -495,16 +505,15 @@ if st.session_state.step == 'form':
                             # NUEVO: Subir archivo si existe
                             archivo_url = None
                             if archivo is not None:
-                                supabase = get_supabase_client()
                                 timestamp = int(time.time())
                                 nombre_archivo = f"{dni_paciente.strip()}_{fecha_estudio}_{timestamp}_{archivo.name}"
                                 nombre_archivo = limpiar_nombre_archivo(nombre_archivo)
                                 data = archivo.read()
                                 try:
-                                    res = supabase.storage.from_(SUPABASE_BUCKET).upload(nombre_archivo, data, {"content-type": archivo.type})
-                                    archivo_url = supabase.storage.from_(SUPABASE_BUCKET).get_public_url(nombre_archivo)
+                                    with perfilado_utils.fase("subida del archivo"):
+                                        archivo_url = almacenamiento_utils.subir_archivo(nombre_archivo, data, archivo.type)
                                 except Exception as e:
-                                    st.error(f"Error subiendo el archivo a Supabase Storage: {e}")
+                                    st.error(f"Error subiendo el archivo: {e}")
                                     archivo_url = None
                             st.session_state.paciente_data = paciente
                             st.session_state.medico_data = medico
@@ -584,7 +593,7 @@ elif st.session_state.step == 'dni_correction':
                         st.info("💡 Verifique que el DNI sea correcto y que el paciente esté registrado en el sistema")
                     else:
                         # Buscar médico (ya autenticado)
-                        medico = buscar_medico_por_dni(DNI_MEDICO_AUTENTICADO)
+                        medico = obtener_medico_autenticado()
                         if not medico:
                             st.error(f"❌ No se encontró un médico con el DNI: {DNI_MEDICO_AUTENTICADO}")
                             st.info("💡 Verifique que su usuario esté correctamente registrado como médico en el sistema")
@@ -712,4 +721,6 @@ st.markdown("""
     <p>InfoMed - Sistema de Gestión Médica</p>
     <p>Desarrollado para facilitar la atención médica 🏥</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+perfilado_utils.mostrar_perfil()
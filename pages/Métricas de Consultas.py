@@ -0,0 +1,95 @@
+import streamlit as st
+import sys
+import os
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metricas_utils
+import functions
+
+# --- Page Configuration ---
+st.set_page_config(
+    page_title="InfoMed - Métricas de Consultas",
+    page_icon="📊",
+    layout="wide"
+)
+
+# Emails con acceso a esta página, separados por coma
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+def solo_administrador():
+    """
+    Permite el acceso solo si el usuario autenticado tiene un email de ADMIN_EMAILS.
+    Si no, muestra un mensaje y detiene la ejecución de la página.
+    """
+    usuario = st.session_state.get("usuario_autenticado")
+    if not usuario:
+        st.error("🔐 Debes iniciar sesión para acceder a esta página")
+        if st.button("🏠 Ir a la página principal"):
+            st.switch_page("Inicio.py")
+        st.stop()
+    if str(usuario.get('email', '')).lower() not in ADMIN_EMAILS:
+        st.error("❌ Solo los administradores pueden acceder a esta página.")
+        if st.button("🔙 Volver al perfil"):
+            st.switch_page("Inicio.py")
+        st.stop()
+
+# --- RESTRICCIÓN DE ACCESO ---
+solo_administrador()
+
+st.markdown(
+    """
+    <div style='text-align: center; margin-bottom: 30px;'>
+        <h1 style='color: #0077b6; margin-bottom: 10px;'>📊 Métricas de Consultas</h1>
+        <p style='color: #666; font-size: 18px;'>Tiempos de las consultas a la base de datos en este proceso</p>
+    </div>
+    """,
+    unsafe_allow_html=True
+)
+
+resumen = metricas_utils.obtener_resumen()
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("Consultas distintas", len(resumen))
+with col2:
+    st.metric("Ejecuciones", sum(m['ejecuciones'] for m in resumen))
+with col3:
+    st.metric("Tiempo total (s)", round(sum(m['tiempo_total_ms'] for m in resumen) / 1000, 2))
+with col4:
+    st.metric(f"Lentas (≥ {metricas_utils.SLOW_QUERY_MS:.0f} ms)", sum(m['lentas'] for m in resumen))
+
+lecturas = functions.coalesced_reads_stats()
+st.caption(
+    f"🔀 Lecturas idénticas simultáneas que esperaron a otra en curso: {lecturas['compartidas']} "
+    f"(lecturas ejecutadas: {lecturas['ejecutadas']})"
+)
+
+st.subheader("⏱️ Consultas por tiempo total")
+if resumen:
+    df = pd.DataFrame(resumen)[[
+        'origen', 'ejecuciones', 'tiempo_total_ms', 'p50_ms', 'p95_ms', 'p99_ms',
+        'filas', 'bytes', 'lentas', 'errores', 'consulta'
+    ]]
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    st.download_button(
+        label="📄 Descargar métricas (JSON)",
+        data=df.to_json(orient="records", force_ascii=False, indent=2),
+        file_name="metricas_consultas.json",
+        mime="application/json"
+    )
+else:
+    st.info("Todavía no se registraron consultas en este proceso.")
+
+st.subheader("🐢 Últimas consultas lentas")
+lentas = metricas_utils.leer_consultas_lentas()
+if lentas:
+    st.dataframe(pd.DataFrame(lentas), use_container_width=True, hide_index=True)
+else:
+    st.info("No hay consultas lentas registradas.")
+
+if st.button("🗑️ Reiniciar métricas"):
+    metricas_utils.reiniciar_metricas()
+    st.rerun()
+
+if st.button("🔙 Volver al perfil"):
+    st.switch_page("Inicio.py")
@@ -4,6 +4,9 @@ import os
 import psycopg2
 # Agregar el directorio padre al path para importar funciones
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metricas_utils import CursorInstrumentado
+import estudios_utils
+import perfilado_utils
 
 # Configuración de la página (debe ser la primera llamada de Streamlit)
 st.set_page_config(
@@ -11,20 +14,21 @@ st.set_page_config(
     page_icon="📋",
     layout="wide"
 )
+perfilado_utils.iniciar_rerun("Ver mis Estudios")
 
 
 DB_CONFIG = {
-    'host': 'aws-0-us-east-1.pooler.supabase.com',
-    'port': 6543,
-    'database': 'postgres',
-    'user': 'postgres.ihguxvmtprnyhyhstvdp',
-    'password': 'Csdatos2025!'
+    'host': os.getenv("SUPABASE_DB_HOST", 'aws-0-us-east-1.pooler.supabase.com'),
+    'port': int(os.getenv("SUPABASE_DB_PORT", 6543)),
+    'database': os.getenv("SUPABASE_DB_NAME", 'postgres'),
+    'user': os.getenv("SUPABASE_DB_USER", 'postgres.ihguxvmtprnyhyhstvdp'),
+    'password': os.getenv("SUPABASE_DB_PASSWORD", 'Csdatos2025!')
 }
 
 def get_db_connection():
     """Obtiene una conexión a PostgreSQL"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = psycopg2.connect(**DB_CONFIG, cursor_factory=CursorInstrumentado)
         return conn
     except Exception as e:
         print(f"Error conectando a la base de datos: {e}")
@@ -93,25 +97,7 @@ def obtener_estudios_paciente(id_paciente):
     """
     Obtiene todos los estudios de un paciente específico con información completa
     """
-    query = """
-    SELECT 
-        e.id_estudio,
-        e.desc_estudio,
-        e.fecha_estudio,
-        e.resultado,
-        e.archivo_url,
-        m.nombre || ' ' || m.apellido as nombre_medico,
-        h.desc_hospital as hospital,
-        p.nombre || ' ' || p.apellido as nombre_paciente
-    FROM estudio_medico e
-    JOIN medico m ON e.id_medico = m.id_medico
-    JOIN hospital h ON m.id_hospital = h.id_hospital
-    JOIN paciente p ON e.id_paciente = p.id_paciente
-    WHERE e.id_paciente = %s
-    ORDER BY e.fecha_estudio DESC
-    """
-    
-    return execute_query_simple(query, params=(id_paciente,))
+    return execute_query_simple(estudios_utils.SQL_ESTUDIOS_PACIENTE, params=(id_paciente,))
 
 def obtener_medicos_paciente(id_paciente):
     """
@@ -449,29 +435,30 @@ def generar_html_todos_estudios(estudios_df, nombre_paciente, dni_paciente):
     return html
 
 def main():
-    # Verificar autenticación usando el nuevo sistema
-    if not verificar_autenticacion():
-        st.error("🔐 Debes iniciar sesión para acceder a esta página")
-        st.info("Por favor, regresa a la página principal e inicia sesión.")
-        if st.button("🏠 Ir a la página principal"):
-            st.switch_page("Inicio.py")
-        st.stop()
+    with perfilado_utils.fase("verificación de acceso"):
+        # Verificar autenticación usando el nuevo sistema
+        if not verificar_autenticacion():
+            st.error("🔐 Debes iniciar sesión para acceder a esta página")
+            st.info("Por favor, regresa a la página principal e inicia sesión.")
+            if st.button("🏠 Ir a la página principal"):
+                st.switch_page("Inicio.py")
+            st.stop()
     
-    # Verificar que el usuario es un paciente
-    if st.session_state.get("tipo_usuario") != "paciente":
-        st.error("❌ Solo los pacientes pueden acceder a esta página.")
-        if st.button("🔙 Volver al perfil"):
-            st.switch_page("Inicio.py")
-        st.stop()
+        # Verificar que el usuario es un paciente
+        if st.session_state.get("tipo_usuario") != "paciente":
+            st.error("❌ Solo los pacientes pueden acceder a esta página.")
+            if st.button("🔙 Volver al perfil"):
+                st.switch_page("Inicio.py")
+            st.stop()
     
-    # Obtener información del paciente desde el session state de forma segura
-    usuario = st.session_state.get("usuario_autenticado")
-    if usuario is None:
-        st.error("🔐 Debes iniciar sesión para acceder a esta página")
-        st.info("Por favor, regresa a la página principal e inicia sesión.")
-        if st.button("🏠 Ir a la página principal"):
-            st.switch_page("Inicio.py")
-        st.stop()
+        # Obtener información del paciente desde el session state de forma segura
+        usuario = st.session_state.get("usuario_autenticado")
+        if usuario is None:
+            st.error("🔐 Debes iniciar sesión para acceder a esta página")
+            st.info("Por favor, regresa a la página principal e inicia sesión.")
+            if st.button("🏠 Ir a la página principal"):
+                st.switch_page("Inicio.py")
+            st.stop()
     
     # Obtener el ID del paciente correctamente
     id_paciente = usuario.get('id_paciente') or usuario.get('dni') or usuario.get('id')
@@ -552,7 +539,8 @@ def main():
     
     # Obtener estudios del paciente con manejo de errores
     try:
-        estudios_df = obtener_estudios_paciente(id_paciente)
+        with perfilado_utils.fase("listado de estudios"):
+            estudios_df = obtener_estudios_paciente(id_paciente)
         
         if estudios_df.empty:
             st.markdown("""
@@ -579,7 +567,8 @@ def main():
         with col1:
             # Filtro por médico
             try:
-                medicos_df = obtener_medicos_paciente(id_paciente)
+                with perfilado_utils.fase("filtros"):
+                    medicos_df = obtener_medicos_paciente(id_paciente)
                 if not medicos_df.empty:
                     medicos_options = ["Todos los médicos"] + medicos_df['nombre_medico'].tolist()
                 else:
@@ -592,7 +581,8 @@ def main():
         with col2:
             # Filtro por fecha
             try:
-                fechas_df = obtener_fechas_estudios_paciente(id_paciente)
+                with perfilado_utils.fase("filtros"):
+                    fechas_df = obtener_fechas_estudios_paciente(id_paciente)
                 if not fechas_df.empty:
                     fechas_options = ["Todas las fechas"] + [str(fecha) for fecha in fechas_df['fecha_estudio'].tolist()]
                 else:
@@ -629,49 +619,51 @@ def main():
         return
     
     # Mostrar estudios como tarjetas usando Streamlit nativo
-    for index, estudio in estudios_filtrados.iterrows():
-        # Formatear fecha
-        fecha_formatted = estudio['fecha_estudio'].strftime("%d/%m/%Y") if pd.notna(estudio['fecha_estudio']) else "Fecha no disponible"
+    with perfilado_utils.fase("tarjetas de estudios"):
+        for index, estudio in estudios_filtrados.iterrows():
+            # Formatear fecha
+            fecha_formatted = estudio['fecha_estudio'].strftime("%d/%m/%Y") if pd.notna(estudio['fecha_estudio']) else "Fecha no disponible"
         
-        # Crear expander para cada estudio (actúa como frame)
-        with st.expander(f"📋 {estudio['desc_estudio']} - 📅 {fecha_formatted}", expanded=False):
-            # Información del paciente
-            st.info(f"👤 **Paciente:** {estudio['nombre_paciente']}")
+            # Crear expander para cada estudio (actúa como frame)
+            with st.expander(f"📋 {estudio['desc_estudio']} - 📅 {fecha_formatted}", expanded=False):
+                # Información del paciente
+                st.info(f"👤 **Paciente:** {estudio['nombre_paciente']}")
             
-            # Información del médico y hospital
-            st.success(f"👨‍⚕️ **Médico:** {estudio['nombre_medico']} | 🏥 **Hospital:** {estudio['hospital']}")
+                # Información del médico y hospital
+                st.success(f"👨‍⚕️ **Médico:** {estudio['nombre_medico']} | 🏥 **Hospital:** {estudio['hospital']}")
             
-            # Resultados
-            if pd.notna(estudio['resultado']) and estudio['resultado']:
-                st.markdown("**📋 Resultados:**")
-                st.markdown(f"*{estudio['resultado']}*")
-            else:
-                st.warning("📋 **Resultados:** No disponibles")
-            
-            # NUEVO: Mostrar archivo adjunto si existe
-            if 'archivo_url' in estudio and estudio['archivo_url']:
-                url = estudio['archivo_url']
-                if url.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    st.image(url, caption="Imagen adjunta del estudio", use_column_width=True)
+                # Resultados
+                if pd.notna(estudio['resultado']) and estudio['resultado']:
+                    st.markdown("**📋 Resultados:**")
+                    st.markdown(f"*{estudio['resultado']}*")
                 else:
-                    st.markdown(f"[Descargar archivo adjunto]({url})")
+                    st.warning("📋 **Resultados:** No disponibles")
+            
+                # NUEVO: Mostrar archivo adjunto si existe
+                if 'archivo_url' in estudio and estudio['archivo_url']:
+                    url = estudio['archivo_url']
+                    if url.lower().endswith(('.png', '.jpg', '.jpeg')):
+                        st.image(url, caption="Imagen adjunta del estudio", use_column_width=True)
+                    else:
+                        st.markdown(f"[Descargar archivo adjunto]({url})")
             
-            # Botones de descarga individual
-            # Generar HTML para este estudio individual
-            html_individual = generar_html_estudio_individual(estudio, nombre_paciente, dni_paciente)
-            st.download_button(
-                label="📄 Descargar Estudio",
-                data=html_individual,
-                file_name=f"estudio_{estudio['desc_estudio'].replace(' ', '_')}_{fecha_formatted.replace('/', '')}.html",
-                mime="text/html",
-                key=f"html_{index}"
-            )
+                # Botones de descarga individual
+                # Generar HTML para este estudio individual
+                html_individual = generar_html_estudio_individual(estudio, nombre_paciente, dni_paciente)
+                st.download_button(
+                    label="📄 Descargar Estudio",
+                    data=html_individual,
+                    file_name=f"estudio_{estudio['desc_estudio'].replace(' ', '_')}_{fecha_formatted.replace('/', '')}.html",
+                    mime="text/html",
+                    key=f"html_{index}"
+                )
     
     # Sección de descarga completa
     st.markdown("---")
     
     # Descargar todos como HTML
-    html_completo = generar_html_todos_estudios(estudios_filtrados, nombre_paciente, dni_paciente)
+    with perfilado_utils.fase("descarga completa"):
+        html_completo = generar_html_todos_estudios(estudios_filtrados, nombre_paciente, dni_paciente)
     st.download_button(
         label="📄 Descargar todos los estudios",
         data=html_completo,
@@ -708,4 +700,5 @@ def main():
         st.switch_page("Inicio.py")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    perfilado_utils.mostrar_perfil()
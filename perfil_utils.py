@@ -0,0 +1,126 @@
+from dataclasses import dataclass, fields
+from datetime import date
+from typing import Optional
+
+import streamlit as st
+
+# Clave de session_state donde vive el perfil del usuario autenticado
+CLAVE_PERFIL = "perfil_usuario"
+
+
+@dataclass
+class PerfilUsuario:
+    """
+    Perfil del usuario autenticado (paciente o médico) guardado en la sesión.
+    Evita volver a consultar la base en cada rerun de las páginas.
+    """
+    tipo: str
+    id_usuario: int
+    nombre: str = ""
+    apellido: str = ""
+    sexo: Optional[str] = None
+    email: Optional[str] = None
+    # Paciente
+    fecha_de_nacimiento: Optional[date] = None
+    provincia: Optional[str] = None
+    ciudad: Optional[str] = None
+    calle: Optional[str] = None
+    altura: Optional[str] = None
+    obra_social: Optional[str] = None
+    latitud: Optional[float] = None
+    longitud: Optional[float] = None
+    # Médico
+    telefono: Optional[str] = None
+    id_hospital: Optional[int] = None
+    desc_hospital: Optional[str] = None
+    hospital: Optional[dict] = None
+
+    @classmethod
+    def desde_fila(cls, tipo, fila):
+        """Construye el perfil a partir de una fila de paciente o medico"""
+        id_usuario = fila.get('id_paciente') if tipo == 'paciente' else fila.get('id_medico')
+        campos = {c.name for c in fields(cls)} - {'tipo', 'id_usuario', 'hospital'}
+        return cls(tipo=tipo, id_usuario=id_usuario, **{k: v for k, v in fila.items() if k in campos})
+
+    @property
+    def nombre_completo(self):
+        return f"{self.nombre} {self.apellido}"
+
+    @property
+    def titulo(self):
+        """Dr. o Dra. según el sexo del médico"""
+        return "Dr." if str(self.sexo).upper() == 'M' else "Dra."
+
+    def direccion(self):
+        """Datos de dirección del paciente con el formato de get_paciente_completo"""
+        return {
+            'id_paciente': self.id_usuario,
+            'provincia': self.provincia,
+            'ciudad': self.ciudad,
+            'calle': self.calle,
+            'altura': self.altura,
+            'latitud': self.latitud,
+            'longitud': self.longitud,
+        }
+
+
+def guardar_perfil(tipo, fila):
+    """Guarda en la sesión el perfil recién autenticado"""
+    perfil = PerfilUsuario.desde_fila(tipo, fila)
+    st.session_state[CLAVE_PERFIL] = perfil
+    return perfil
+
+
+def obtener_perfil():
+    """Retorna el perfil de la sesión o None si no hay usuario autenticado"""
+    perfil = st.session_state.get(CLAVE_PERFIL)
+    if perfil is None and st.session_state.get("usuario_autenticado") and st.session_state.get("tipo_usuario"):
+        # Sesiones iniciadas antes de existir el cache de perfil
+        perfil = guardar_perfil(st.session_state.tipo_usuario, st.session_state.usuario_autenticado)
+    return perfil
+
+
+def actualizar_perfil(fila):
+    """
+    Write-through: refresca el perfil con la fila devuelta por un UPDATE ... RETURNING *.
+    Conserva los datos del hospital si el médico no cambió de hospital.
+    """
+    perfil = obtener_perfil()
+    if perfil is None:
+        return None
+    nuevo = PerfilUsuario.desde_fila(perfil.tipo, fila)
+    if nuevo.id_hospital == perfil.id_hospital:
+        nuevo.desc_hospital = nuevo.desc_hospital or perfil.desc_hospital
+        nuevo.hospital = perfil.hospital
+    st.session_state[CLAVE_PERFIL] = nuevo
+    return nuevo
+
+
+def actualizar_coordenadas(latitud, longitud):
+    """Guarda en el perfil las coordenadas geocodificadas del paciente"""
+    perfil = obtener_perfil()
+    if perfil is not None:
+        perfil.latitud = latitud
+        perfil.longitud = longitud
+
+
+def obtener_hospital_perfil(cargar_hospital):
+    """
+    Retorna los datos del hospital del médico, consultándolos una sola vez por sesión.
+
+    Args:
+        cargar_hospital (callable): función que recibe id_hospital y retorna el hospital
+    """
+    perfil = obtener_perfil()
+    if perfil is None or perfil.id_hospital is None:
+        return None
+    if perfil.hospital is None:
+        perfil.hospital = cargar_hospital(perfil.id_hospital)
+        if perfil.hospital:
+            perfil.desc_hospital = perfil.hospital.get('desc_hospital')
+    return perfil.hospital
+
+
+def limpiar_perfil():
+    """Elimina el perfil de la sesión (logout)"""
+    st.session_state.pop(CLAVE_PERFIL, None)
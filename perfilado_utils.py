@@ -0,0 +1,117 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+# El perfilado es opcional: PERFILAR_RERUNS=1 o ?perfilar=1 en la URL
+PERFILAR_RERUNS = os.getenv("PERFILAR_RERUNS", "0") == "1"
+HISTORIAL_MAXIMO = 20
+
+_CLAVE_ACTIVO = "_perfilado_activo"
+_CLAVE_PILA = "_perfilado_pila"
+_CLAVE_HISTORIAL = "_perfilado_historial"
+
+
+def perfilado_activo():
+    """Indica si el perfilado está activo para esta sesión"""
+    if _CLAVE_ACTIVO not in st.session_state:
+        try:
+            parametro = st.query_params.get("perfilar")
+        except Exception:
+            parametro = None
+        st.session_state[_CLAVE_ACTIVO] = PERFILAR_RERUNS or parametro == "1"
+    return st.session_state[_CLAVE_ACTIVO]
+
+
+def _nodo(nombre):
+    return {'nombre': nombre, 'inicio': time.perf_counter(), 'duracion_ms': 0.0, 'llamadas': 0, 'hijos': []}
+
+
+def iniciar_rerun(pagina):
+    """Abre la fase raíz del rerun actual; llamar al comienzo de cada página"""
+    if not perfilado_activo():
+        return
+    st.session_state[_CLAVE_PILA] = [_nodo(pagina)]
+
+
+@contextmanager
+def fase(nombre):
+    """
+    Mide una fase con nombre dentro del rerun actual. Las fases se pueden anidar;
+    las llamadas repetidas a una misma fase dentro del mismo padre se acumulan.
+
+        with perfilado_utils.fase("geocodificación"):
+            ...
+    """
+    pila = st.session_state.get(_CLAVE_PILA) if perfilado_activo() else None
+    if not pila:
+        yield
+        return
+    nodo = next((h for h in pila[-1]['hijos'] if h['nombre'] == nombre), None)
+    if nodo is None:
+        nodo = _nodo(nombre)
+        pila[-1]['hijos'].append(nodo)
+    pila.append(nodo)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        nodo['duracion_ms'] += (time.perf_counter() - inicio) * 1000
+        nodo['llamadas'] += 1
+        if pila and pila[-1] is nodo:
+            pila.pop()
+
+
+def _exportable(nodo):
+    return {
+        'nombre': nodo['nombre'],
+        'duracion_ms': round(nodo['duracion_ms'], 3),
+        'llamadas': nodo['llamadas'],
+        'hijos': [_exportable(h) for h in nodo['hijos']],
+    }
+
+
+def _html_llamas(nodo, total_ms, profundidad=0):
+    """Barra por fase, indentada según la anidación y con ancho proporcional al rerun"""
+    duracion = nodo['duracion_ms']
+    porcentaje = 100 * duracion / total_ms if total_ms else 0
+    llamadas = f" × {nodo['llamadas']}" if nodo['llamadas'] > 1 else ""
+    html = f"""
+    <div style="margin-left: {profundidad * 16}px; margin-bottom: 2px;">
+        <div style="background: linear-gradient(90deg, #ff8a65 {porcentaje:.1f}%, #f5f5f5 {porcentaje:.1f}%);
+                    border-radius: 4px; padding: 2px 6px; font-size: 0.85rem; white-space: nowrap;">
+            {nodo['nombre']}{llamadas} — {duracion:.1f} ms ({porcentaje:.0f}%)
+        </div>
+    </div>
+    """
+    for hijo in nodo['hijos']:
+        html += _html_llamas(hijo, total_ms, profundidad + 1)
+    return html
+
+
+def mostrar_perfil():
+    """Cierra el rerun actual y muestra el desglose por fases; llamar al final de la página"""
+    pila = st.session_state.get(_CLAVE_PILA) if perfilado_activo() else None
+    if not pila:
+        return
+    raiz = pila[0]
+    raiz['duracion_ms'] = (time.perf_counter() - raiz['inicio']) * 1000
+    raiz['llamadas'] = 1
+    st.session_state[_CLAVE_PILA] = []
+
+    historial = st.session_state.setdefault(_CLAVE_HISTORIAL, [])
+    historial.append({'fecha': datetime.now().isoformat(timespec="seconds"), **_exportable(raiz)})
+    del historial[:-HISTORIAL_MAXIMO]
+
+    with st.expander(f"⏱️ Perfil del rerun: {raiz['duracion_ms']:.1f} ms", expanded=False):
+        st.markdown(_html_llamas(raiz, raiz['duracion_ms']), unsafe_allow_html=True)
+        st.download_button(
+            label="📄 Exportar perfiles (JSON)",
+            data=json.dumps(historial, indent=2, ensure_ascii=False),
+            file_name=f"perfil_reruns_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            key="perfilado_exportar"
+        )
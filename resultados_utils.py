@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import hospitales_utils
+
+# Resultados de búsqueda compartidos por todas las sesiones del proceso. Se
+# guardan sin distancias (no dependen de la ubicación del paciente); cada
+# sesión los ordena por cercanía después.
+RESULTADOS_CACHE_MAX = int(os.getenv("RESULTADOS_CACHE_MAX", 1024))
+# Vigencia máxima de un resultado, aunque no cambie la versión de los datos
+RESULTADOS_CACHE_TTL = float(os.getenv("RESULTADOS_CACHE_TTL", 600))
+# Segundos entre lecturas de version_datos_busqueda (migración 005)
+RESULTADOS_VERIFICACION = float(os.getenv("RESULTADOS_VERIFICACION", 5))
+
+_cache = OrderedDict()
+_version = None
+_verificado_en = None
+_lock = threading.Lock()
+
+
+def clave_sintomas(sintomas):
+    """Clave de una búsqueda por síntomas: sin importar el orden ni la escritura"""
+    return ('sintomas',) + tuple(sorted({hospitales_utils.normalizar_nombre(s) for s in sintomas}))
+
+
+def clave_especialidad(id_especialidad):
+    return ('especialidad', int(id_especialidad))
+
+
+def clave_cercania(id_especialidad, latitud, longitud, radio_km):
+    """Clave de una búsqueda por radio: las distancias dependen de la ubicación exacta"""
+    return ('cercania', int(id_especialidad), float(latitud), float(longitud), float(radio_km))
+
+
+def version_vigente(leer_version):
+    """Versión de los datos, consultada a la base como mucho cada RESULTADOS_VERIFICACION segundos"""
+    global _version, _verificado_en
+    with _lock:
+        if _verificado_en is not None and time.monotonic() - _verificado_en < RESULTADOS_VERIFICACION:
+            return _version
+    version = leer_version()
+    with _lock:
+        _version, _verificado_en = version, time.monotonic()
+    return version
+
+
+def obtener(clave, cargar, leer_version):
+    """
+    Resultado de una búsqueda desde el cache o, si no está o es de otra versión
+    de los datos, desde cargar(). Retorna una copia que la sesión puede modificar.
+
+    Args:
+        cargar (callable): función que ejecuta la búsqueda y retorna un DataFrame
+        leer_version (callable): función que retorna la versión actual de los datos (o None)
+    """
+    version = version_vigente(leer_version)
+    with _lock:
+        entrada = _cache.get(clave)
+        if entrada and entrada[0] == version and time.monotonic() - entrada[1] < RESULTADOS_CACHE_TTL:
+            _cache.move_to_end(clave)
+            return entrada[2].copy()
+    resultado = cargar()
+    # No guardar un resultado vacío: puede ser un error de conexión
+    if resultado is not None and not resultado.empty:
+        with _lock:
+            _cache[clave] = (version, time.monotonic(), resultado)
+            while len(_cache) > RESULTADOS_CACHE_MAX:
+                _cache.popitem(last=False)
+        return resultado.copy()
+    return resultado
+
+
+def invalidar():
+    """Descarta los resultados guardados (cambios hechos desde este proceso)"""
+    global _verificado_en
+    with _lock:
+        _cache.clear()
+        _verificado_en = None
+
+
+def distancias_km(latitudes, longitudes, latitud, longitud):
+    """Distancia haversine vectorizada desde (latitud, longitud); NaN donde faltan coordenadas"""
+    lat1, lon1 = np.radians(float(latitud)), np.radians(float(longitud))
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lon2 = np.radians(np.asarray(longitudes, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * np.arcsin(np.sqrt(np.minimum(1.0, a)))
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+import hospitales_utils
+import resultados_utils
+
+# Máximo de síntomas por búsqueda: la máscara de coincidencias de cada patología
+# es un entero de 64 bits, un bit por síntoma elegido
+SINTOMAS_MAXIMOS = min(64, int(os.getenv("SINTOMAS_MAXIMOS", 8)))
+
+
+class IndiceSintomas:
+    """
+    Índice de bitmaps en memoria: un bitset por síntoma sobre todas las
+    patologías (bit j = la patología j tiene ese síntoma). Las coincidencias
+    de una búsqueda se calculan con operaciones de bits sobre las filas de los
+    síntomas elegidos, sin consultar Postgres.
+    """
+
+    def __init__(self, sintomas, patologias):
+        """
+        Args:
+            sintomas (list): tuplas (id_sintoma, desc_sintoma)
+            patologias (list): tuplas (id_patologia, id_sintoma_1, id_sintoma_2)
+        """
+        posicion = {id_sintoma: i for i, (id_sintoma, _) in enumerate(sintomas)}
+        self._fila = {}
+        for i, (_, desc) in enumerate(sintomas):
+            self._fila.setdefault(hospitales_utils.normalizar_nombre(desc), i)
+        self.ids_patologia = np.array([p[0] for p in patologias], dtype=np.int64)
+
+        filas, columnas = [], []
+        for j, (_, id_sintoma_1, id_sintoma_2) in enumerate(patologias):
+            for id_sintoma in {id_sintoma_1, id_sintoma_2}:
+                if id_sintoma in posicion:
+                    filas.append(posicion[id_sintoma])
+                    columnas.append(j)
+        filas = np.array(filas, dtype=np.int64)
+        columnas = np.array(columnas, dtype=np.uint64)
+        palabras = max(1, (len(patologias) + 63) // 64)
+        self._bits = np.zeros((len(sintomas), palabras), dtype=np.uint64)
+        np.bitwise_or.at(
+            self._bits,
+            (filas, (columnas >> np.uint64(6)).astype(np.int64)),
+            np.uint64(1) << (columnas & np.uint64(63))
+        )
+
+    def coincidencias(self, sintomas):
+        """
+        Patologías con todos los síntomas elegidos o, como cada patología tiene dos
+        síntomas, con dos de ellos cuando se eligen más. Los resultados que cubren
+        más síntomas salen de combinar varias patologías (agrupar_coincidencias).
+
+        Returns:
+            tuple: (ids_patologia, mascaras, cantidades) como arrays de numpy. El
+                bit i de la máscara indica que la patología tiene el síntoma sintomas[i]
+        """
+        sintomas = list(sintomas)[:SINTOMAS_MAXIMOS]
+        vacio = np.array([], dtype=np.int64)
+        if not sintomas or not len(self.ids_patologia):
+            return vacio, vacio.astype(np.uint64), vacio
+
+        bits = np.zeros((len(sintomas), self._bits.shape[1]), dtype=np.uint64)
+        for i, s in enumerate(sintomas):
+            # Un síntoma que no está en el índice no coincide con ninguna patología
+            fila = self._fila.get(hospitales_utils.normalizar_nombre(s))
+            if fila is not None:
+                bits[i] = self._bits[fila]
+        # Candidatas: la unión de los bitsets de los síntomas elegidos
+        union = np.bitwise_or.reduce(bits, axis=0)
+        candidatas = np.flatnonzero(_desempaquetar(union[np.newaxis, :], len(self.ids_patologia))[0])
+
+        # Un bit por síntoma elegido para cada candidata
+        presentes = _desempaquetar(bits, len(self.ids_patologia))[:, candidatas]
+        pesos = np.uint64(1) << np.arange(len(sintomas), dtype=np.uint64)
+        mascaras = np.bitwise_or.reduce(presentes.astype(np.uint64) * pesos[:, np.newaxis], axis=0)
+        cantidades = presentes.sum(axis=0)
+
+        completas = cantidades >= min(2, len(sintomas))
+        return self.ids_patologia[candidatas][completas], mascaras[completas], cantidades[completas]
+
+
+def _desempaquetar(bits, columnas):
+    """Matriz booleana (filas, columnas) de los bitsets de 64 bits"""
+    bytes_ = np.ascontiguousarray(bits.astype('<u8')).view(np.uint8)
+    return np.unpackbits(bytes_, axis=1, bitorder='little')[:, :columnas].astype(bool)
+
+
+def contar_bits(mascaras):
+    """Cantidad de bits en 1 de cada máscara de 64 bits"""
+    mascaras = np.asarray(mascaras, dtype=np.uint64).reshape(-1, 1)
+    return _desempaquetar(mascaras, 64).sum(axis=1)
+
+
+def agrupar_coincidencias(filas, ids_patologia, mascaras, sintomas):
+    """
+    Une las filas de hospitales (una por patología que las trae) en una fila por
+    resultado, con los síntomas que cubren entre todas sus patologías.
+
+    Args:
+        filas (DataFrame): resultado de SQL_HOSPITALES_POR_PATOLOGIAS
+        sintomas (list): síntomas en el orden usado para las máscaras
+
+    Returns:
+        DataFrame: sin id_patologia y con las columnas 'coincidencias' y 'sintomas_coincidentes'
+    """
+    mascara_por_patologia = dict(zip(ids_patologia.tolist(), mascaras.tolist()))
+    filas = filas.copy()
+    filas['mascara'] = filas['id_patologia'].map(mascara_por_patologia).astype(np.uint64)
+    claves = ['tipo_atencion', 'especialidad', 'id_hospital']
+    por_resultado = filas.groupby(claves)['mascara'].agg(lambda m: np.bitwise_or.reduce(m.to_numpy()))
+    resultado = filas.drop_duplicates(claves).drop(columns=['id_patologia', 'mascara'])
+    resultado = resultado.join(por_resultado, on=claves)
+    resultado['coincidencias'] = contar_bits(resultado['mascara'].to_numpy())
+    resultado['sintomas_coincidentes'] = [
+        ', '.join(s for i, s in enumerate(sintomas) if int(m) >> i & 1) for m in resultado['mascara']
+    ]
+    return resultado.drop(columns=['mascara']).reset_index(drop=True)
+
+
+_indice = None
+_version_indice = None
+_cargado_en = 0.0
+_lock = threading.Lock()
+
+
+def obtener_indice(cargar, leer_version):
+    """
+    Índice compartido por todas las sesiones del proceso. Se reconstruye cuando
+    cambian los síntomas o las patologías (version_sintomas, migración 007) o
+    vence el TTL del cache de resultados.
+
+    Args:
+        cargar (callable): función que retorna un IndiceSintomas (o None si falla)
+        leer_version (callable): función que retorna (versión de los datos, versión
+            de los síntomas), o None
+    """
+    global _indice, _version_indice, _cargado_en
+    versiones = resultados_utils.version_vigente(leer_version)
+    version = None if versiones is None else versiones[1]
+    with _lock:
+        if (_indice is not None and _version_indice == version
+                and time.monotonic() - _cargado_en < resultados_utils.RESULTADOS_CACHE_TTL):
+            return _indice
+    indice = cargar()
+    if indice is None:
+        return None
+    with _lock:
+        _indice, _version_indice, _cargado_en = indice, version, time.monotonic()
+    return indice
+
+
+def invalidar():
+    """Fuerza la reconstrucción del índice en el próximo acceso"""
+    global _indice
+    with _lock:
+        _indice = None